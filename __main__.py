@@ -1,66 +1,96 @@
 import argparse
-import time
-import coloredlogs
 import logging
-import ast
-import astpretty
+import time
+
+from api import Builder, check_paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="punity",
+        description="Python -> C# transpiler developed with Unity in mind"
+    )
+
+    parser.add_argument("source", nargs="?")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("-w", "--watch", action="store_true")
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("-f", "--force", action="store_true", help="ignore the build cache and transpile every file")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes, 0 uses every core (default 1, every core with --check)")
+    parser.add_argument("--check", action="store_true", help="report every unsupported construct without transpiling or writing anything, exits with 1 if any is found")
+    parser.add_argument("--profile", nargs="?", const="pynet-profile.json", metavar="REPORT", help="time every visitor and file, print a summary and save a JSON report")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="source files to transpile, *.py by default (repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", help="files or directories to skip on top of the defaults, a leading / anchors to the source root (repeatable)")
+    parser.add_argument("--changes", metavar="MANIFEST", help="after every run, write the written and deleted .cs files to this JSON file")
+    parser.add_argument("--debounce", type=float, default=0.2, help="seconds to collect watch events before rebuilding")
+    parser.add_argument("--serve", action="store_true", help="run as a daemon answering JSON-lines requests on stdin/stdout, source is the project root for requests that don't name one")
+    parser.add_argument("--socket", metavar="PATH", help="with --serve, listen on this Unix socket instead of stdin/stdout")
 
-from pathlib import Path
-from watchdog.observers import Observer
-from watcher import Watcher
-from transpiler import Transpiler
+    args = parser.parse_args(argv)
 
-coloredlogs.install(fmt="%(asctime)s - %(levelname)s - %(message)s")
+    if args.source is None and not args.serve:
+        parser.error("the following arguments are required: source")
 
-parser = argparse.ArgumentParser(
-    prog="punity",
-    description="Python -> C# transpiler developed with Unity in mind"
-)
+    import coloredlogs
+    coloredlogs.install(fmt="%(asctime)s - %(levelname)s - %(message)s")
 
-parser.add_argument("source")
-parser.add_argument("-o", "--output")
-parser.add_argument("-w", "--watch", action="store_true")
-parser.add_argument("-d", "--debug", action="store_true")
+    if args.check:
+        results = check_paths([args.source], jobs=args.jobs or 0, include=args.include, exclude=args.exclude)
+        if any(result.diagnostics for result in results):
+            raise SystemExit(1)
+        return
 
-args = parser.parse_args()
+    if args.jobs is None:
+        args.jobs = 1
 
-source_directory = args.source
-debug = args.debug
+    if args.serve:
+        serve(args)
+        return
 
-def transpile():
-    logging.info(f"Transpiling {source_directory}...")
-    for source_file in Path(source_directory).rglob("*.py"):
-        transpile_file(source_file)
-    logging.info("Transpiled successfully.")
+    profile = None
+    if args.profile:
+        from profiler import Profile
+        profile = Profile()
 
-def transpile_file(source_file):
-    logging.info(f"Transpiling {source_file}...")
-    with open(source_file) as f:
-        try:
-            tree = ast.parse(f.read())
+    builder = Builder(
+        args.source, jobs=args.jobs, force=args.force, debug=args.debug,
+        profile=profile, changes_manifest=args.changes, include=args.include, exclude=args.exclude
+    )
+    builder.transpile()
 
-            if debug:
-                astpretty.pprint(tree)
+    if profile:
+        print(profile.summary())
+        profile.save(args.profile)
+        logging.info(f"Profile report saved to {args.profile}.")
 
-            transpiled = Transpiler().transpile(tree)
-            dest_file = source_file.with_suffix(".cs")
+    if args.watch:
+        watch(builder, args.debounce)
 
-            with open(dest_file, "w") as dest:
-                dest.write(transpiled)
-        except Exception as e:
-            logging.exception(f"Caught error while transpiling {source_file}:", exc_info=e)
+def serve(args):
+    from server import Server, serve_stdio, serve_unix
+
+    server = Server(jobs=args.jobs, debug=args.debug, root=args.source)
+    try:
+        if args.socket:
+            serve_unix(server, args.socket)
         else:
-            logging.info(f"{source_file} has been transpiled.")
+            serve_stdio(server)
+    finally:
+        server.close()
 
-transpile()
+def watch(builder, debounce):
+    from watchdog.observers import Observer
+    from watcher import Watcher
 
-if args.watch:
     observer = Observer()
-    observer.schedule(Watcher(transpile), source_directory, True)
+    observer.schedule(Watcher(builder.transpile_changed, debounce), builder.source_directory, recursive=True)
     observer.start()
     try:
         while True:
             time.sleep(1)
     finally:
         observer.stop()
-        observer.join()
\ No newline at end of file
+        observer.join()
+
+# Worker processes started with spawn re-import this module, they must not run the build
+if __name__ == "__main__":
+    main()
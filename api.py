@@ -0,0 +1,291 @@
+# Library entry points, importing this module does no work by itself
+
+import ast
+import json
+import logging
+import os
+import build
+
+from functools import partial
+from pathlib import Path
+from cache import BuildCache
+from checker import check_file
+from discovery import SourceDiscovery
+from transpiler import Transpiler
+from util import atomic_write
+
+def transpile_source(source: str) -> str:
+    return Transpiler().transpile(ast.parse(source))
+
+def transpile_paths(paths, root=None, jobs=1, force=False, debug=False, profile=None, changes_manifest=None, include=None, exclude=None):
+    # Directories are searched for sources, the build cache lives in `root`,
+    # which defaults to the directory shared by all paths
+    paths = [Path(path) for path in paths]
+    builder = Builder(
+        root or common_root(paths), jobs=jobs, force=force, debug=debug,
+        profile=profile, changes_manifest=changes_manifest, include=include, exclude=exclude
+    )
+    results = builder.transpile_files(discover(paths, include, exclude))
+    builder.cache.save()
+    return results
+
+def check_paths(paths, jobs=1, include=None, exclude=None):
+    # Validation only, nothing is written and the build cache is left alone
+    source_files = discover([Path(path) for path in paths], include, exclude)
+    jobs = jobs or os.cpu_count()
+
+    if jobs > 1 and len(source_files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(source_files) // (jobs * 4))
+        with ProcessPoolExecutor(jobs) as executor:
+            results = list(executor.map(check_file, source_files, chunksize=chunksize))
+    else:
+        results = list(map(check_file, source_files))
+
+    report_diagnostics(results)
+    return results
+
+def common_root(paths):
+    return os.path.commonpath([path if path.is_dir() else path.parent for path in paths])
+
+def discover(paths, include=None, exclude=None):
+    source_files = []
+    for path in paths:
+        if path.is_dir():
+            source_files.extend(SourceDiscovery(path, include, exclude).scan().files)
+        else:
+            source_files.append(path)
+
+    return source_files
+
+class Builder:
+    def __init__(self, source_directory, jobs=1, force=False, debug=False, profile=None, changes_manifest=None, include=None, exclude=None, executor=None):
+        self.source_directory = source_directory
+        self.jobs = jobs or os.cpu_count()
+        # A process pool outliving this builder, e.g. the daemon's, otherwise
+        # one is started per parallel run
+        self.executor = executor
+        self.debug = debug
+        self.profile = profile
+        self.changes_manifest = changes_manifest
+        # Outputs deleted since the last change report
+        self.deleted = []
+
+        # Output doesn't depend on any option yet, extend when one does
+        self.cache = BuildCache(source_directory, options={})
+        if not force:
+            self.cache.load()
+
+        self.discovery = SourceDiscovery(source_directory, include, exclude, self.cache.snapshot)
+
+    def transpile(self):
+        logging.info(f"Transpiling {self.source_directory}...")
+
+        scan = self.discovery.scan()
+        self.cache.update_snapshot(self.discovery.snapshot)
+
+        removed_symbols = set()
+        for source_file in scan.removed:
+            removed_symbols |= self.remove_output(source_file)
+
+        # Sources with the same mtime and size as last time aren't even read
+        # when their output is still there, profiling needs every file though
+        source_files = []
+        unchanged = []
+        for source_file in scan.files:
+            if (
+                not self.profile and source_file in scan.unchanged and self.cache.get(source_file)
+                and source_file.with_suffix(".cs").exists()
+            ):
+                unchanged.append(source_file)
+            else:
+                source_files.append(source_file)
+
+        results = self.transpile_files(source_files, removed_symbols, unchanged)
+        self.cache.save()
+        return results
+
+    def transpile_changed(self, source_files):
+        source_files = {source_file for source_file in source_files if self.discovery.matches(source_file)}
+        if not source_files:
+            return []
+
+        logging.info(f"Detected changes in {len(source_files)} file(s)...")
+        existing = []
+        removed_symbols = set()
+        for source_file in sorted(source_files):
+            if source_file.exists():
+                existing.append(source_file)
+            else:
+                removed_symbols |= self.remove_output(source_file)
+
+        results = self.transpile_files(existing, removed_symbols)
+        self.cache.save()
+        return results
+
+    def remove_output(self, source_file):
+        # Returns the symbols the removed module used to define
+        self.cache.discard(source_file)
+        removed_symbols = self.cache.index.remove(self.cache.key(source_file))
+
+        dest_file = source_file.with_suffix(".cs")
+        try:
+            dest_file.unlink()
+        except FileNotFoundError:
+            return removed_symbols
+
+        self.deleted.append(dest_file)
+        if source_file.exists():
+            logging.warning(f"{source_file} is no longer matched by the include/exclude patterns, deleted {dest_file}.")
+        else:
+            logging.warning(f"{source_file} has been removed, deleted {dest_file}.")
+        return removed_symbols
+
+    def transpile_files(self, source_files, changed_symbols=(), unchanged=()):
+        # Profiling rebuilds everything, cached files would have no timings
+        structs = self.cache.index.struct_sizes()
+        readonly_structs = self.cache.index.readonly_structs()
+        results = self.run(source_files, force=bool(self.profile))
+        changed = set(changed_symbols) | self.record(results)
+
+        # Modules referencing a symbol whose definition changed are rebuilt
+        # too, until no rebuilt module changes a definition of its own
+        done = {self.cache.key(source_file) for source_file in source_files}
+
+        # Modules of this batch may have been emitted with a struct's old size
+        resized = structs.items() ^ self.cache.index.struct_sizes().items()
+        resized = {name for name, _ in resized} | (readonly_structs ^ self.cache.index.readonly_structs())
+        done -= set(self.cache.index.dependents(resized))
+        while changed:
+            dependents = []
+            for key in self.cache.index.dependents(changed):
+                source_file = self.cache.root / key
+                if key in done:
+                    continue
+                elif source_file.exists():
+                    dependents.append(source_file)
+                else:
+                    self.cache.index.remove(key)
+
+            if not dependents:
+                break
+
+            logging.info(f"Rebuilding {len(dependents)} module(s) depending on {', '.join(sorted(changed))}...")
+            done.update(self.cache.key(source_file) for source_file in dependents)
+
+            dependent_results = self.run(dependents, force=True)
+            changed = self.record(dependent_results)
+            results.extend(dependent_results)
+
+        # Files known to be unchanged from their stat alone, unless a changed
+        # dependency got them rebuilt above
+        results.extend(
+            build.FileResult(source_file, status="up-to-date", digest=self.cache.get(source_file))
+            for source_file in unchanged if self.cache.key(source_file) not in done
+        )
+
+        report(results)
+        self.report_changes(results)
+        return results
+
+    def run(self, source_files, force=False):
+        # Struct sizes decide how they're passed, see Transpiler.by_reference_parameters
+        structs = self.cache.index.struct_sizes()
+        readonly_structs = self.cache.index.readonly_structs()
+
+        # Forced files skip the content hash check
+        if force:
+            cached_digests = [None] * len(source_files)
+        else:
+            cached_digests = [self.cache.get(source_file) for source_file in source_files]
+
+        if self.jobs > 1 and len(source_files) > 1:
+            worker = partial(
+                build.transpile_file_captured, debug=self.debug, profile=bool(self.profile),
+                structs=structs, readonly_structs=readonly_structs
+            )
+            if self.executor is not None:
+                results = self.run_parallel(self.executor, worker, source_files, cached_digests)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(self.jobs, initializer=build.init_worker) as executor:
+                    results = self.run_parallel(executor, worker, source_files, cached_digests)
+        else:
+            worker = partial(
+                build.transpile_file, debug=self.debug, profile=bool(self.profile),
+                structs=structs, readonly_structs=readonly_structs
+            )
+            results = list(map(worker, source_files, cached_digests))
+
+        return results
+
+    def run_parallel(self, executor, worker, source_files, cached_digests):
+        chunksize = max(1, len(source_files) // (self.jobs * 4))
+        results = []
+
+        # map() yields in submission order, so replayed logs are deterministic
+        for result in executor.map(worker, source_files, cached_digests, chunksize=chunksize):
+            for record in result.records:
+                logging.getLogger(record.name).handle(record)
+            results.append(result)
+
+        return results
+
+    def record(self, results):
+        # Updates the cache and project index, returns the changed symbols
+        changed = set()
+
+        for result in results:
+            if result.status == "failed":
+                self.cache.discard(result.source_file)
+            else:
+                self.cache.update(result.source_file, result.digest)
+
+            if result.module is not None:
+                changed |= self.cache.index.update(self.cache.key(result.source_file), result.module)
+
+            if result.profile:
+                self.profile.merge(result.profile)
+
+        return changed
+
+    def report_changes(self, results):
+        # Lets editor tooling refresh exactly the outputs that changed, e.g.
+        # with a single AssetDatabase.Refresh in Unity
+        written = [result.source_file.with_suffix(".cs") for result in results if result.written]
+        deleted, self.deleted = self.deleted, []
+
+        logging.info(f"{len(written)} output file(s) written, {len(deleted)} deleted.")
+
+        if self.changes_manifest:
+            with atomic_write(self.changes_manifest) as f:
+                json.dump({"written": [str(path) for path in written], "deleted": [str(path) for path in deleted]}, f, indent=2)
+
+def report(results):
+    failed = [result for result in results if result.status == "failed"]
+    up_to_date = sum(result.status == "up-to-date" for result in results)
+    transpiled = len(results) - len(failed) - up_to_date
+
+    summary = f"{transpiled} transpiled, {up_to_date} up to date, {len(failed)} failed."
+    if not failed:
+        logging.info(f"Transpiled successfully: {summary}")
+        return
+
+    logging.error(f"Transpilation finished with errors: {summary}")
+    for result in failed:
+        logging.error(f"  {result.source_file}: {result.error}")
+
+def report_diagnostics(results):
+    failed = [result for result in results if result.diagnostics]
+    problems = sum(len(result.diagnostics) for result in failed)
+
+    for result in failed:
+        for diagnostic in result.diagnostics:
+            logging.error(f"{result.source_file}:{diagnostic.line}:{diagnostic.column}: {diagnostic.message}")
+
+    if failed:
+        logging.error(f"Check failed: {problems} problem(s) in {len(failed)} of {len(results)} file(s).")
+    else:
+        logging.info(f"Check passed: {len(results)} file(s), no unsupported constructs.")
@@ -0,0 +1,6 @@
+# Transpiler benchmarks, run from the repository root:
+#
+#   python -m benchmarks --size medium --files 100 --output result.json
+#   python -m benchmarks --baseline result.json --threshold 0.1
+#
+#   python -m benchmarks.startup    # import time against STARTUP_BUDGET_MS
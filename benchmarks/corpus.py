@@ -0,0 +1,164 @@
+# Synthetic Unity script corpus, exercising the constructs pynet supports
+
+import random
+
+from pathlib import Path
+
+SIZES = {
+    "small": {"classes": 1, "methods": 4, "statements": 8},
+    "medium": {"classes": 3, "methods": 8, "statements": 16},
+    "large": {"classes": 6, "methods": 16, "statements": 32},
+}
+
+class ModuleGenerator:
+    def __init__(self, rng: random.Random, index: int):
+        self.rng = rng
+        self.index = index
+        self.lines = []
+        self.counter = 0
+
+    def emit(self, depth: int, line: str):
+        self.lines.append("    " * depth + line if line else "")
+
+    def unique(self, prefix: str):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def generate(self, classes: int, methods: int, statements: int):
+        self.emit(0, "import UnityEngine")
+        self.emit(0, "")
+
+        for class_index in range(classes):
+            self.generate_class(f"Component{self.index}x{class_index}", methods, statements)
+
+        return "\n".join(self.lines) + "\n"
+
+    def generate_class(self, name: str, methods: int, statements: int):
+        self.emit(0, f"@namespace(\"Game.Module{self.index}\")")
+        self.emit(0, "@field(\"private\", int, \"counter\", value=0)")
+        self.emit(0, "@field(List(generic(int)), \"items\")")
+        self.emit(0, "@attribute(Serializable)")
+        self.emit(0, "@implements(IUpdatable)")
+        self.emit(0, "@public")
+        self.emit(0, f"class {name}(MonoBehaviour):")
+        self.emit(1, "speed: int = 3")
+        self.emit(1, "")
+
+        for method_index in range(methods):
+            if method_index % 4 == 3:
+                self.generate_factory(name, method_index)
+            else:
+                self.generate_method(method_index, statements)
+
+    def generate_factory(self, class_name: str, method_index: int):
+        self.emit(1, "@public")
+        self.emit(1, "@static")
+        self.emit(1, f"def Create{method_index}(count: int) -> {class_name}:")
+        self.emit(2, f"instance = new({class_name}())")
+        self.emit(2, "instance.counter = count")
+        self.emit(2, "return instance")
+        self.emit(1, "")
+
+    def generate_method(self, method_index: int, statements: int):
+        self.emit(1, "@public")
+        if method_index % 2 == 1:
+            self.emit(1, "@override")
+        self.emit(1, f"def Method{method_index}(self, value: int, scale: int) -> int:")
+        self.emit(2, "total: int = value")
+
+        for _ in range(statements):
+            self.generate_statement(2)
+
+        self.emit(2, "return total")
+        self.emit(1, "")
+
+    def generate_statement(self, depth: int, nested: bool = False):
+        choices = [
+            self.arithmetic, self.expression, self.augmented, self.field_assign, self.call,
+            self.cast, self.generic_call,
+        ]
+        if not nested:
+            choices += [self.branch, self.range_loop, self.foreach_loop, self.match]
+
+        self.rng.choice(choices)(depth)
+
+    def arithmetic(self, depth: int):
+        self.emit(depth, "total = total + value * scale - 3")
+
+    def expression(self, depth: int):
+        # Mixed precedence, only some of the grouping is needed in C#
+        self.emit(depth, self.rng.choice([
+            "total = (value + scale) * (total - 1) - value * scale % 7",
+            "total = total - (value - scale) + (total << 2 | value & 255)",
+            "total = -(value * scale) + (total + value) * (scale + 1) // 2",
+        ]))
+
+    def augmented(self, depth: int):
+        self.emit(depth, f"total += self.counter % {self.rng.randint(2, 9)}")
+
+    def field_assign(self, depth: int):
+        self.emit(depth, "self.counter = self.counter + self.speed")
+
+    def call(self, depth: int):
+        if self.rng.random() < 0.5:
+            self.emit(depth, f"Debug.Log(\"tick {self.rng.randint(0, 999)}\")")
+        else:
+            self.emit(depth, "Debug.Log(f\"total {total} at scale {scale:05d}\")")
+
+    def cast(self, depth: int):
+        name = self.unique("converted")
+        self.emit(depth, f"{name} = cast(total, int)")
+        self.emit(depth, f"total = total - {name}")
+
+    def generic_call(self, depth: int):
+        name = self.unique("body")
+        self.emit(depth, f"{name} = GetComponent(generic(Rigidbody))")
+        self.emit(depth, f"{name}.mass = scale")
+
+    def branch(self, depth: int):
+        self.emit(depth, f"if total > {self.rng.randint(0, 100)} and value < scale:")
+        self.generate_statement(depth + 1, True)
+        self.emit(depth, "elif total == 0:")
+        self.generate_statement(depth + 1, True)
+        self.emit(depth, "else:")
+        self.generate_statement(depth + 1, True)
+
+    def range_loop(self, depth: int):
+        name = self.unique("i")
+        if self.rng.random() < 0.5:
+            self.emit(depth, f"for {name} in range(value):")
+        else:
+            self.emit(depth, f"for {name} in range(1, scale):")
+        self.emit(depth + 1, f"total += {name}")
+        self.generate_statement(depth + 1, True)
+
+    def foreach_loop(self, depth: int):
+        name = self.unique("item")
+        self.emit(depth, f"for {name} in self.items:")
+        self.emit(depth + 1, f"total += {name}")
+
+    def match(self, depth: int):
+        self.emit(depth, "match value:")
+        for case in range(self.rng.randint(1, 3)):
+            self.emit(depth + 1, f"case {case}:")
+            self.generate_statement(depth + 2, True)
+            self.emit(depth + 2, "break")
+        self.emit(depth + 1, "case _:")
+        self.emit(depth + 2, "total = 0")
+        self.emit(depth + 2, "break")
+
+def generate_module(index: int, size: str = "medium", seed: int = 0):
+    rng = random.Random(f"{seed}:{index}")
+    return ModuleGenerator(rng, index).generate(**SIZES[size])
+
+def write_corpus(directory, files: int, size: str = "medium", seed: int = 0):
+    directory = Path(directory)
+    paths = []
+
+    for index in range(files):
+        path = directory / f"package{index % 10}" / f"module{index}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(generate_module(index, size, seed))
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,177 @@
+import argparse
+import ast
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from benchmarks.corpus import SIZES, write_corpus
+from benchmarks.startup import measure_import_time
+from transpiler import TRANSPILER_VERSION, Transpiler
+from util import atomic_write
+
+# Metrics compared against a baseline, all of them lower is better
+COMPARED_METRICS = ["stages.parse", "stages.transpile", "stages.write", "total", "peak_memory_bytes", "output_bytes", "output_parentheses", "import_ms"]
+
+def count_nodes(tree: ast.AST):
+    return sum(1 for _ in ast.walk(tree))
+
+def run_stages(source_files: list[Path]):
+    timings = {}
+
+    start = time.perf_counter()
+    sources = [source_file.read_bytes() for source_file in source_files]
+    trees = [ast.parse(source) for source in sources]
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = [Transpiler().transpile(tree) for tree in trees]
+    timings["transpile"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for source_file, output in zip(source_files, outputs):
+        with atomic_write(source_file.with_suffix(".cs")) as dest:
+            dest.write(output)
+    timings["write"] = time.perf_counter() - start
+
+    return timings, trees, outputs
+
+def copy_corpus(corpus: Path, directory: Path):
+    # Outputs are written next to the copies, the user's sources and their
+    # .cs files (and mtimes) are left alone
+    source_files = []
+    for source_file in sorted(corpus.rglob("*.py")):
+        copy = directory / source_file.relative_to(corpus)
+        copy.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source_file, copy)
+        source_files.append(copy)
+
+    return source_files
+
+def transpilable(source_files: list[Path]):
+    # Files the transpiler rejects are reported and left out of the timings
+    accepted, failed = [], []
+    for source_file in source_files:
+        try:
+            Transpiler().transpile(ast.parse(source_file.read_bytes()))
+        except Exception as e:
+            print(f"skipping {source_file}: {e}", file=sys.stderr)
+            failed.append(source_file)
+        else:
+            accepted.append(source_file)
+
+    return accepted, failed
+
+def measure_peak_memory(source_files: list[Path]):
+    # Separate pass, tracemalloc slows allocation down too much to time with it
+    tracemalloc.start()
+    try:
+        for source_file in source_files:
+            Transpiler().transpile(ast.parse(source_file.read_bytes()))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark(source_files: list[Path], repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        timings, trees, outputs = run_stages(source_files)
+        if best is None:
+            best = timings
+        else:
+            best = {stage: min(best[stage], timings[stage]) for stage in best}
+
+    total = sum(best.values())
+    nodes = sum(count_nodes(tree) for tree in trees)
+
+    return {
+        "transpiler_version": TRANSPILER_VERSION,
+        "python": platform.python_version(),
+        "files": len(source_files),
+        "nodes": nodes,
+        "output_bytes": sum(len(output.encode()) for output in outputs),
+        "output_parentheses": sum(output.count("(") for output in outputs),
+        "stages": best,
+        "total": total,
+        "files_per_sec": len(source_files) / total,
+        "nodes_per_sec": nodes / best["transpile"],
+        "peak_memory_bytes": measure_peak_memory(source_files),
+        "import_ms": measure_import_time(),
+    }
+
+def get_metric(result: dict, metric: str):
+    value = result
+    for key in metric.split("."):
+        value = value[key]
+    return value
+
+def compare(result: dict, baseline: dict, threshold: float):
+    regressions = []
+
+    for metric in COMPARED_METRICS:
+        try:
+            old, new = get_metric(baseline, metric), get_metric(result, metric)
+        except KeyError:
+            continue
+
+        if old and new > old * (1 + threshold):
+            regressions.append(f"{metric}: {old:.6g} -> {new:.6g} (+{(new / old - 1) * 100:.1f}%)")
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmarks",
+        description="Benchmarks pynet on a synthetic or existing corpus"
+    )
+
+    parser.add_argument("--corpus", help="benchmark an existing source directory instead of a synthetic corpus")
+    parser.add_argument("--size", choices=SIZES, default="medium")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also save the result to this file")
+    parser.add_argument("--baseline", help="fail when a metric regressed compared to this result")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression, 0.1 = 10%%")
+
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="pynet-bench-") as temp_directory:
+        if args.corpus:
+            source_files = copy_corpus(Path(args.corpus), Path(temp_directory))
+        else:
+            source_files = write_corpus(temp_directory, args.files, args.size, args.seed)
+
+        source_files, failed = transpilable(source_files)
+        if not source_files:
+            sys.exit("no file of the corpus could be transpiled")
+
+        result = benchmark(source_files, args.repeat)
+        result["failed_files"] = len(failed)
+
+    result["config"] = {
+        "corpus": args.corpus,
+        "size": args.size,
+        "files": args.files,
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+    report = json.dumps(result, indent=2)
+    print(report)
+
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,64 @@
+# Startup time budget. Editor tooling starts pynet many times a day, so
+# importing the library API (which the CLI imports too) has to stay under
+# STARTUP_BUDGET_MS. Measured with `python -X importtime` on warm bytecode
+# caches, taking the best of several runs to filter out noise.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from pathlib import Path
+
+STARTUP_BUDGET_MS = 80
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def measure_import_time(module: str = "api", runs: int = 5):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    best = None
+    # The first run only populates __pycache__
+    for _ in range(runs + 1):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+
+        # Lines look like "import time: self [us] | cumulative | name"
+        for line in completed.stderr.splitlines():
+            _, _, fields = line.partition(":")
+            parts = [part.strip() for part in fields.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative = int(parts[1]) / 1000
+                break
+        else:
+            raise RuntimeError(f"no importtime entry for {module}")
+
+        best = cumulative if best is None else min(best, cumulative)
+
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.startup",
+        description="Checks pynet's import time against the startup budget"
+    )
+
+    parser.add_argument("--module", default="api")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="budget in milliseconds")
+
+    args = parser.parse_args(argv)
+
+    import_ms = measure_import_time(args.module, args.runs)
+    print(json.dumps({"module": args.module, "import_ms": import_ms, "budget_ms": args.budget}, indent=2))
+
+    if import_ms > args.budget:
+        print(f"Importing {args.module} took {import_ms:.1f} ms, over the {args.budget:g} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import ast
+import logging
+import sys
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from cache import content_hash
+from folding import fold_constants
+from project import index_module
+from transpiler import Transpiler
+from util import atomic_write
+
+@dataclass
+class FileResult:
+    source_file: Path
+    status: str = "transpiled"
+    digest: str | None = None
+    error: str | None = None
+    records: list[logging.LogRecord] = field(default_factory=list)
+    profile: "Profile | None" = None
+    module: dict | None = None
+    written: bool = False
+
+# Parsed trees, already folded, with their project index entry and decorator
+# metadata. Long-running processes keep them warm between builds, keyed by
+# source content hash, a rebuild of unchanged content then skips parsing and
+# analysis entirely
+
+@dataclass
+class ParsedModule:
+    tree: ast.Module
+    module: dict
+    metadata: dict = field(default_factory=dict)
+
+warm_modules = None
+warm_limit = 0
+
+def keep_warm(limit: int):
+    global warm_modules, warm_limit
+
+    warm_modules = OrderedDict() if limit else None
+    warm_limit = limit
+
+def parse_module(source: bytes, digest: str):
+    if warm_modules is not None and digest in warm_modules:
+        warm_modules.move_to_end(digest)
+        return warm_modules[digest]
+
+    tree = fold_constants(ast.parse(source))
+    parsed = ParsedModule(tree, index_module(tree))
+
+    if warm_modules is not None:
+        warm_modules[digest] = parsed
+        if len(warm_modules) > warm_limit:
+            warm_modules.popitem(last=False)
+
+    return parsed
+
+def transpile_file(source_file: Path, cached_digest=None, debug=False, profile=False, structs=None, readonly_structs=None):
+    result = FileResult(source_file)
+
+    try:
+        source = source_file.read_bytes()
+        result.digest = content_hash(source)
+        dest_file = source_file.with_suffix(".cs")
+
+        if result.digest == cached_digest and dest_file.exists():
+            result.status = "up-to-date"
+            logging.info(f"{source_file} is up to date.")
+            return result
+
+        logging.info(f"Transpiling {source_file}...")
+
+        if profile:
+            tree = profile_file(result, source, dest_file, structs, readonly_structs)
+            result.module = index_module(tree)
+        else:
+            parsed = parse_module(source, result.digest)
+
+            if debug:
+                # stdout may be the daemon's protocol stream
+                import astpretty
+                print(astpretty.pformat(parsed.tree), file=sys.stderr)
+
+            # Identical output is not rewritten, a new mtime would make Unity
+            # reimport the script and reload the domain for nothing
+            writer = atomic_write(dest_file, only_if_changed=True)
+            with writer as dest:
+                Transpiler(dest, structs, parsed.metadata, readonly_structs).transpile(parsed.tree)
+            result.written = writer.changed
+            result.module = parsed.module
+    except Exception as e:
+        result.status = "failed"
+        result.error = str(e)
+        logging.exception(f"Caught error while transpiling {source_file}:", exc_info=e)
+    else:
+        if result.written:
+            logging.info(f"{source_file} has been transpiled.")
+        else:
+            logging.info(f"{source_file} has been transpiled, output unchanged.")
+
+    return result
+
+def profile_file(result: FileResult, source: bytes, dest_file: Path, structs=None, readonly_structs=None):
+    # Emits into memory instead of streaming so emission and writing can be
+    # timed separately
+    from profiler import FileTimings, Profile, ProfilingTranspiler
+
+    profile = result.profile = Profile()
+    timings = FileTimings(str(result.source_file))
+    profile.files.append(timings)
+
+    start = perf_counter()
+    tree = ast.parse(source)
+    timings.parse = perf_counter() - start
+
+    start = perf_counter()
+    transpiled = ProfilingTranspiler(profile=profile, structs=structs, readonly_structs=readonly_structs).transpile(tree)
+    timings.emit = perf_counter() - start
+    timings.nodes = sum(profile.nodes.values())
+
+    start = perf_counter()
+    writer = atomic_write(dest_file, only_if_changed=True)
+    with writer as dest:
+        dest.write(transpiled)
+    result.written = writer.changed
+    timings.write = perf_counter() - start
+
+    return tree
+
+# Process pool workers buffer their log records and ship them back with the
+# result, the parent replays them in submission order so output stays stable
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Tracebacks and args don't pickle reliably, render them up front
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.append(record)
+
+capture_handler = None
+
+def init_worker(warm: int = 0):
+    global capture_handler
+
+    keep_warm(warm)
+
+    capture_handler = CaptureHandler()
+    root = logging.getLogger()
+    root.handlers = [capture_handler]
+    root.setLevel(logging.INFO)
+
+def transpile_file_captured(source_file: Path, cached_digest=None, debug=False, profile=False, structs=None, readonly_structs=None):
+    capture_handler.records = []
+    result = transpile_file(source_file, cached_digest, debug, profile, structs, readonly_structs)
+    result.records = capture_handler.records
+    return result
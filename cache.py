@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+
+from pathlib import Path
+from project import ProjectIndex
+from transpiler import TRANSPILER_VERSION
+from util import atomic_write
+
+CACHE_FILE = ".pynet-cache"
+
+# Modules whose code determines the generated C#, hashed into the fingerprint
+# so that a changed transpiler never reuses stale entries
+TOOL_MODULES = ["checker.py", "csast.py", "cstypes.py", "cswriter.py", "folding.py", "metadata.py", "precedence.py", "project.py", "symbols.py", "transpiler.py", "util.py"]
+
+def content_hash(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+def tool_fingerprint(options: dict):
+    digest = hashlib.sha256(TRANSPILER_VERSION.encode())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+
+    tool_directory = Path(__file__).parent
+    for module in TOOL_MODULES:
+        digest.update((tool_directory / module).read_bytes())
+
+    return digest.hexdigest()
+
+class BuildCache:
+    def __init__(self, root, options: dict):
+        self.root = Path(root)
+        self.path = self.root / CACHE_FILE
+        self.fingerprint = tool_fingerprint(options)
+        self.entries = {}
+        self.index = ProjectIndex()
+        self.snapshot = None
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable build cache {self.path}: {e}")
+            return
+
+        if manifest.get("fingerprint") != self.fingerprint:
+            logging.info("Transpiler or options changed, build cache invalidated.")
+            self.dirty = True
+            return
+
+        self.entries = manifest.get("files", {})
+        self.index = ProjectIndex(manifest.get("modules", {}))
+        self.snapshot = manifest.get("snapshot")
+
+    def save(self):
+        if not self.dirty and not self.index.dirty:
+            return
+
+        manifest = {
+            "fingerprint": self.fingerprint,
+            "files": self.entries,
+            "modules": self.index.modules,
+            "snapshot": self.snapshot,
+        }
+        with atomic_write(self.path) as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+        self.dirty = False
+        self.index.dirty = False
+
+    def key(self, source_file):
+        return Path(os.path.relpath(source_file, self.root)).as_posix()
+
+    def update_snapshot(self, snapshot):
+        if snapshot != self.snapshot:
+            self.snapshot = snapshot
+            self.dirty = True
+
+    def get(self, source_file):
+        return self.entries.get(self.key(source_file))
+
+    def update(self, source_file, digest):
+        key = self.key(source_file)
+        if self.entries.get(key) != digest:
+            self.entries[key] = digest
+            self.dirty = True
+
+    def discard(self, source_file):
+        if self.entries.pop(self.key(source_file), None) is not None:
+            self.dirty = True
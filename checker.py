@@ -0,0 +1,327 @@
+# Validation of the constructs the transpiler can't emit, in a single walk
+# per file. Checks are syntactic only, anything that depends on inferred
+# types is still reported by a full transpile
+
+import ast
+
+from dataclasses import dataclass, field
+from metadata import analyze_class, definition_errors, field_def_type
+from pathlib import Path
+from util import dotnet_format, string_format
+
+# Statements and expressions with no C# emission, which would otherwise be
+# dropped or emitted incompletely
+UNSUPPORTED_NODES = {
+    ast.While: "while loops",
+    ast.Try: "try statements",
+    ast.With: "with statements",
+    ast.AsyncWith: "async with statements",
+    ast.AsyncFor: "async for loops",
+    ast.AsyncFunctionDef: "async functions",
+    ast.Delete: "del statements",
+    ast.Global: "global statements",
+    ast.Nonlocal: "nonlocal statements",
+    ast.Assert: "assert statements",
+    ast.IfExp: "conditional expressions",
+    ast.Lambda: "lambdas",
+    ast.NamedExpr: "assignment expressions",
+    ast.Await: "await expressions",
+    ast.Yield: "yield expressions",
+    ast.YieldFrom: "yield expressions",
+    ast.Starred: "starred expressions",
+    ast.MatchClass: "class patterns",
+    ast.MatchMapping: "mapping patterns",
+    ast.MatchOr: "or patterns",
+    ast.MatchSequence: "sequence patterns",
+    ast.MatchSingleton: "singleton patterns",
+    ast.MatchStar: "star patterns",
+}
+
+# try/except* only parses on Python 3.11+
+if hasattr(ast, "TryStar"):
+    UNSUPPORTED_NODES[ast.TryStar] = "try statements"
+
+# Operators with neither a C# equivalent nor a lowering
+UNSUPPORTED_OPERATORS = {ast.MatMult: "matrix multiplication"}
+
+# Imported for Python's type checkers only, nothing to emit
+ANNOTATION_MODULES = {"typing", "__future__"}
+
+# Calls the transpiler rewrites, with the argument counts it understands
+SPECIAL_CALLS = {"new": (1, 1), "cast": (2, 2)}
+LOOP_CALLS = {"range": (1, 3), "enumerate": (1, 2), "zip": (1, None)}
+
+@dataclass(slots=True)
+class Diagnostic:
+    line: int
+    column: int
+    message: str
+
+@dataclass
+class CheckResult:
+    source_file: Path
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+
+def class_violations(info):
+    # Value type rules, as of the C# version Unity compiles
+    if info.readonly and not info.struct:
+        yield f"@readonly only applies to structs, {info.name} is a class"
+
+    if not info.struct:
+        return
+
+    if info.base:
+        yield f"struct {info.name} can't inherit from {info.base}, implement interfaces with @implements"
+    elif info.static:
+        yield f"struct {info.name} can't be static"
+
+    for field_def in info.fields:
+        if field_def.value is not None and not field_def.static and not field_def.const:
+            yield f"instance fields of struct {info.name} can't have initializers"
+
+    for method in info.methods:
+        if method.constructor and not method.parameters:
+            yield f"struct {info.name} can't declare a parameterless constructor"
+        elif method.access_modifier in ("protected", "protected internal", "private protected"):
+            yield f"struct {info.name} can't have protected members"
+
+class Checker(ast.NodeVisitor):
+    def __init__(self):
+        self.diagnostics = []
+
+    def report(self, node: ast.AST, message: str):
+        self.diagnostics.append(Diagnostic(getattr(node, "lineno", 0), getattr(node, "col_offset", -1) + 1, message))
+
+    def check(self, tree: ast.Module):
+        self.visit(tree)
+        self.diagnostics.sort(key=lambda diagnostic: (diagnostic.line, diagnostic.column))
+        return self.diagnostics
+
+    def generic_visit(self, node: ast.AST):
+        description = UNSUPPORTED_NODES.get(type(node))
+        if description:
+            self.report(node, f"{description} are not supported")
+
+        super().generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module not in ANNOTATION_MODULES:
+            self.report(node, "from imports are not supported, use import")
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        if len(node.bases) > 1 or node.keywords:
+            self.report(node, "classes can only have a single base class, implement interfaces with @implements")
+
+        # Classes are only analyzed once their decorators can be read
+        errors = list(definition_errors(node))
+        for error_node, message in errors:
+            self.report(error_node, message)
+
+        if not errors:
+            info = analyze_class(node)
+            for message in class_violations(info):
+                self.report(node, message)
+
+            for field_def in info.fields:
+                if field_def.type is not None and field_def_type(field_def) is None:
+                    self.report(node, f"invalid type for field {field_def.target.id} (expected a name, a subscript or a call with generic arguments)")
+
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        for error_node, message in definition_errors(node):
+            self.report(error_node, message)
+
+        args = node.args
+        if args.defaults or args.kw_defaults:
+            self.report(node, "default parameter values are not supported")
+        if args.vararg or args.kwarg or args.kwonlyargs or args.posonlyargs:
+            self.report(node, "only positional parameters are supported")
+
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign):
+        if len(node.targets) > 1:
+            self.report(node, "chained assignments are not supported")
+
+        for target in node.targets:
+            self.check_target(target)
+
+        self.generic_visit(node)
+
+    def check_target(self, target: ast.expr):
+        if isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                if isinstance(element, ast.Starred):
+                    self.report(element, "starred unpacking targets are not supported")
+                else:
+                    self.check_target(element)
+        elif not isinstance(target, (ast.Name, ast.Attribute, ast.Subscript)):
+            self.report(target, f"forbidden assignment target: {ast.unparse(target)}")
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if not isinstance(node.target, (ast.Name, ast.Attribute)):
+            self.report(node, f"forbidden annotated assignment target: {ast.unparse(node.target)}")
+
+        self.generic_visit(node)
+
+    def visit_Starred(self, node: ast.Starred):
+        # Reported once, by the target check, when unpacked into
+        if isinstance(node.ctx, ast.Load):
+            self.generic_visit(node)
+        else:
+            super().generic_visit(node)
+
+    def visit_For(self, node: ast.For):
+        if node.orelse:
+            self.report(node.orelse[0], "for/else is not supported")
+
+        self.check_target(node.target)
+
+        match node.iter:
+            case ast.Call(func=ast.Name(id=name)) if name in LOOP_CALLS:
+                self.check_loop_call(node, name)
+
+        self.generic_visit(node)
+
+    def check_loop_call(self, node: ast.For, name: str):
+        call = node.iter
+        least, most = LOOP_CALLS[name]
+        if call.keywords or len(call.args) < least or most is not None and len(call.args) > most:
+            self.report(call, f"unknown args for {name} in for loop")
+        elif name == "range" and not isinstance(node.target, ast.Name):
+            self.report(node.target, "range loops need a single loop variable")
+        elif name == "range" and len(call.args) == 3 and is_zero(call.args[2]):
+            self.report(call.args[2], "range step can't be zero")
+
+    def visit_Call(self, node: ast.Call):
+        match node.func:
+            case ast.Name(id=name) if name in SPECIAL_CALLS:
+                least, most = SPECIAL_CALLS[name]
+                if not least <= len(node.args) <= most:
+                    self.report(node, f"forbidden argument count for {name} special function")
+                elif name == "cast" and not isinstance(node.args[1], ast.Name):
+                    self.report(node.args[1], "target cast type should be identifier")
+
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node: ast.BinOp):
+        self.check_operator(node, node.op)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.check_operator(node, node.op)
+        self.generic_visit(node)
+
+    def check_operator(self, node: ast.AST, op: ast.operator):
+        # Floor division and powers are lowered to System.Math calls
+        description = UNSUPPORTED_OPERATORS.get(type(op))
+        if description:
+            self.report(node, f"{description} is not supported")
+
+    def visit_Compare(self, node: ast.Compare):
+        # Comparisons of literals are folded before emission
+        operands = [node.left, *node.comparators]
+        if len(node.ops) > 1 and not all(isinstance(operand, ast.Constant) for operand in operands):
+            self.report(node, "chained comparisons are not supported")
+
+        for op in node.ops:
+            if isinstance(op, (ast.In, ast.NotIn)):
+                self.report(node, "membership tests are not supported, call Contains")
+
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node: ast.Subscript):
+        if isinstance(node.slice, ast.Slice):
+            self.report(node, "subslices are not supported")
+
+        self.generic_visit(node)
+
+    def visit_Tuple(self, node: ast.Tuple):
+        if not node.elts and isinstance(node.ctx, ast.Load):
+            self.report(node, "empty tuples are not supported")
+
+        self.generic_visit(node)
+
+    def visit_Dict(self, node: ast.Dict):
+        if None in node.keys:
+            self.report(node, "dict unpacking is not supported")
+
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node: ast.comprehension):
+        if node.is_async:
+            self.report(node.target, "async comprehensions are not supported")
+
+        self.generic_visit(node)
+
+    def visit_FormattedValue(self, node: ast.FormattedValue):
+        if node.conversion not in (-1, ord("s")):
+            self.report(node, f"conversion !{chr(node.conversion)} in f-strings is not supported")
+
+        if node.format_spec:
+            if not all(isinstance(value, ast.Constant) for value in node.format_spec.values):
+                self.report(node, "expressions in f-string format specs are not supported")
+            else:
+                spec = "".join(value.value for value in node.format_spec.values)
+                message = format_spec_error(node.value, spec)
+                if message:
+                    self.report(node, message)
+
+        self.visit(node.value)
+
+    def visit_MatchAs(self, node: ast.MatchAs):
+        if node.name is not None or node.pattern is not None:
+            self.report(node, "capture patterns are not supported, only `case _`")
+
+        self.generic_visit(node)
+
+def format_spec_error(value: ast.expr, spec: str):
+    # Without types, a spec is fine if it applies to numbers or to strings,
+    # string literals only take the string ones
+    try:
+        string_format(spec)
+        return None
+    except ValueError as e:
+        if isinstance(value, (ast.JoinedStr, ast.Constant)) and isinstance(getattr(value, "value", ""), str):
+            return str(e)
+
+    try:
+        dotnet_format(spec)
+    except ValueError as e:
+        return str(e)
+
+    return None
+
+def is_zero(node: ast.expr):
+    match node:
+        case ast.Constant(value=0):
+            return True
+        case ast.UnaryOp(op=ast.USub() | ast.UAdd(), operand=operand):
+            return is_zero(operand)
+
+    return False
+
+def check_source(source: str | bytes, filename: str = "<unknown>"):
+    try:
+        tree = ast.parse(source, filename)
+    except SyntaxError as e:
+        return [Diagnostic(e.lineno or 0, e.offset or 0, f"syntax error: {e.msg}")]
+
+    # A checker bug is reported for this file, it never aborts checking the others
+    try:
+        return Checker().check(tree)
+    except Exception as e:
+        return [Diagnostic(0, 0, f"internal checker error, please report it: {type(e).__name__}: {e}")]
+
+def check_file(source_file: Path):
+    result = CheckResult(source_file)
+
+    try:
+        source = source_file.read_bytes()
+    except OSError as e:
+        result.diagnostics.append(Diagnostic(0, 0, f"can't read file: {e}"))
+    else:
+        result.diagnostics = check_source(source, str(source_file))
+
+    return result
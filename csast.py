@@ -13,4 +13,6 @@ class FieldDef(AST):
     target: ast.Name
     value: ast.expr | None
     static: bool
+    # `Final` or `const=True`, emitted as const when the value allows
+    const: bool = False
 
@@ -0,0 +1,175 @@
+# C# types recovered from annotations and literals. Only as much typing as
+# emission needs, anything not understood is None and left to the caller
+
+import ast
+
+from dataclasses import dataclass
+
+# Python spellings of C# builtin types
+BUILTIN_TYPES = {"str": "string", "bool": "bool", "int": "int", "float": "float", "object": "object"}
+
+# Subscripted or generic() annotations of these become the C# collection
+COLLECTION_TYPES = {
+    "list": "List", "List": "List",
+    "dict": "Dictionary", "Dict": "Dictionary", "Dictionary": "Dictionary",
+    "set": "HashSet", "Set": "HashSet", "HashSet": "HashSet",
+}
+
+# `array[int]` or `array(generic(int))` is a C# array
+ARRAY = "[]"
+
+# `tuple[int, float]` is a ValueTuple, written (int, float)
+TUPLE = "ValueTuple"
+
+# Collections each kind of literal can initialize
+LITERAL_COLLECTIONS = {ast.List: (ARRAY, "List"), ast.Set: ("HashSet",), ast.Dict: ("Dictionary",)}
+
+@dataclass(frozen=True, slots=True)
+class CsType:
+    name: str
+    args: tuple["CsType", ...] = ()
+
+    def __str__(self):
+        if self.name == ARRAY:
+            return f"{self.args[0]}[]"
+        elif self.name == TUPLE and len(self.args) > 1:
+            return f"({', '.join(map(str, self.args))})"
+        elif self.args:
+            return f"{self.name}<{', '.join(map(str, self.args))}>"
+
+        return self.name
+
+    @property
+    def is_array(self):
+        return self.name == ARRAY
+
+    @property
+    def is_tuple(self):
+        return self.name == TUPLE
+
+    @property
+    def is_list(self):
+        return self.name == "List"
+
+    @property
+    def element(self):
+        # What iterating or indexing yields, dictionaries are indexed by key
+        if self.name in (ARRAY, "List", "HashSet"):
+            return self.args[0]
+        elif self.name == "Dictionary":
+            return self.args[1]
+
+        return None
+
+    @property
+    def pair(self):
+        # What enumerating a dictionary yields
+        if self.name == "Dictionary":
+            return CsType("KeyValuePair", self.args)
+
+        return None
+
+INT = CsType("int")
+FLOAT = CsType("float")
+# Python float literals are written as-is, which C# reads as double
+DOUBLE = CsType("double")
+BOOL = CsType("bool")
+STRING = CsType("string")
+
+NUMERIC_TYPES = [INT, FLOAT, DOUBLE]
+
+# Types C# allows as const, other constants are static readonly
+CONST_TYPES = {
+    "bool", "byte", "sbyte", "char", "short", "ushort", "int", "uint",
+    "long", "ulong", "float", "double", "decimal", "string",
+}
+
+def collection_type(name: str, args: list):
+    if None in args:
+        return None
+    elif name == "array" and len(args) == 1:
+        return CsType(ARRAY, tuple(args))
+    elif name in ("tuple", "Tuple"):
+        return CsType(TUPLE, tuple(args))
+
+    return CsType(COLLECTION_TYPES.get(name, name), tuple(args))
+
+def type_from_annotation(node):
+    match node:
+        case ast.Name(id=name):
+            return CsType(BUILTIN_TYPES.get(name, name))
+        case ast.Constant(value=None):
+            return CsType("void")
+        case ast.Constant(value=str(name)):
+            # Forward reference
+            return CsType(name)
+        case ast.Attribute():
+            return CsType(ast.unparse(node))
+        case ast.Subscript(value=ast.Name(id=name), slice=ast.Tuple(elts=elts)):
+            return collection_type(name, [type_from_annotation(elt) for elt in elts])
+        case ast.Subscript(value=ast.Name(id=name), slice=slice):
+            return collection_type(name, [type_from_annotation(slice)])
+        case ast.Call(func=ast.Name(id=name), args=args) if args and all(is_generic(arg) for arg in args):
+            # The decorator spelling, e.g. List(generic(int))
+            return collection_type(name, [type_from_annotation(arg.args[0]) for arg in args])
+
+    return None
+
+def unwrap_final(node):
+    # `Final[T]` annotates a constant T, a bare `Final` leaves the type to
+    # the value. Returns whether it was final and the inner annotation
+    match node:
+        case ast.Name(id="Final") | ast.Attribute(attr="Final"):
+            return True, None
+        case ast.Subscript(value=ast.Name(id="Final") | ast.Attribute(attr="Final"), slice=inner):
+            return True, inner
+
+    return False, node
+
+def is_generic(node):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "generic" and len(node.args) == 1
+
+def literal_type(value):
+    if isinstance(value, bool):
+        return BOOL
+    elif isinstance(value, int):
+        return INT
+    elif isinstance(value, float):
+        return DOUBLE
+    elif isinstance(value, str):
+        return STRING
+
+    return None
+
+def common_type(types):
+    # The single type all values convert to implicitly, numbers widen
+    types = set(types)
+    if None in types or not types:
+        return None
+    elif len(types) == 1:
+        return types.pop()
+    elif types <= set(NUMERIC_TYPES):
+        return max(types, key=NUMERIC_TYPES.index)
+
+    return None
+
+# Approximate sizes in bytes of common value types, enough to tell which
+# structs are worth passing by reference
+VALUE_TYPE_SIZES = {
+    "bool": 1, "byte": 1, "sbyte": 1, "char": 2, "short": 2, "ushort": 2,
+    "int": 4, "uint": 4, "float": 4, "long": 8, "ulong": 8, "double": 8, "decimal": 16,
+    "Vector2": 8, "Vector2Int": 8, "Vector3": 12, "Vector3Int": 12, "Vector4": 16,
+    "Quaternion": 16, "Color": 16, "Color32": 4, "Rect": 16, "Bounds": 24, "Matrix4x4": 64,
+}
+REFERENCE_SIZE = 8
+
+# Structs above this size are passed as `in` parameters instead of copied
+LARGE_STRUCT_SIZE = 16
+
+def type_size(cs_type: CsType | None, structs: dict[str, int]):
+    if cs_type is None:
+        return REFERENCE_SIZE
+    elif cs_type.is_tuple:
+        return sum(type_size(arg, structs) for arg in cs_type.args)
+
+    return VALUE_TYPE_SIZES.get(cs_type.name) or structs.get(cs_type.name) or REFERENCE_SIZE
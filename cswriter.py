@@ -1,18 +1,36 @@
 from contextlib import contextmanager
 
 class CSWriter:
-    def __init__(self):
-        self.text = ""
+    def __init__(self, sink=None):
+        # Output is kept as a list of chunks and joined once in build(),
+        # line/column are tracked while writing so queries don't rescan text.
+        # When a file-like sink is given, chunks are handed over on flush()
+        self.chunks = []
+        self.sink = sink
+        self.started = False
         self.indents = 0
+        self.line = 1
+        self.column = 0
 
     def write(self, text):
-        self.text += text
+        if not text:
+            return
+
+        self.chunks.append(text)
+        self.started = True
+
+        newlines = text.count("\n")
+        if newlines:
+            self.line += newlines
+            self.column = len(text) - text.rfind("\n") - 1
+        else:
+            self.column += len(text)
 
     def write_indents(self):
-        if self.text == "":
-            self.text = "    " * self.indents
+        if not self.started:
+            self.write("    " * self.indents)
         else:
-            self.text += "\n" + "    " * self.indents
+            self.write("\n" + "    " * self.indents)
 
     def write_indented(self, text):
         self.write_indents()
@@ -76,7 +94,18 @@ class CSWriter:
         self.write_indents()
 
     def count_lines(self):
-        return self.text.count("\n") + 1
+        return self.line
+
+    def flush(self):
+        if self.sink is None or not self.chunks:
+            return
+
+        self.sink.write("".join(self.chunks))
+        self.chunks.clear()
 
     def build(self):
-        return self.text
+        if self.sink is not None:
+            self.flush()
+            return None
+
+        return "".join(self.chunks)
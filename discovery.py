@@ -0,0 +1,145 @@
+# Source discovery with pruned directory walks and a persisted stat snapshot
+
+import os
+
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+
+# Never worth walking: caches, VCS metadata, installed packages, and
+# virtualenvs and Unity's generated trees. A leading / anchors a pattern to
+# the root, those names are legitimate package names deeper down
+DEFAULT_EXCLUDES = [
+    ".*", "__pycache__", "site-packages",
+    "/venv", "/env", "/node_modules",
+    "/Library", "/Temp", "/Logs", "/obj", "/Build", "/Builds",
+]
+
+@dataclass
+class ScanResult:
+    files: list[Path] = field(default_factory=list)
+    # Sources whose mtime and size match the previous snapshot
+    unchanged: set[Path] = field(default_factory=set)
+    # Sources present in the previous snapshot but gone now
+    removed: list[Path] = field(default_factory=list)
+
+class SourceDiscovery:
+    def __init__(self, root, include=None, exclude=None, snapshot=None):
+        self.root = Path(root)
+        self.include = include or ["*.py"]
+        self.exclude = DEFAULT_EXCLUDES + (exclude or [])
+
+        # The snapshot maps every walked directory, relative to root, to its
+        # mtime, subdirectories and matching files with their mtime and size
+        self.patterns = {"include": self.include, "exclude": self.exclude}
+        if snapshot and snapshot.get("patterns") == self.patterns:
+            self.directories = snapshot["directories"]
+        else:
+            self.directories = {}
+
+    @property
+    def snapshot(self):
+        return {"patterns": self.patterns, "directories": self.directories}
+
+    def is_excluded(self, name: str, relative: str):
+        return any(
+            fnmatch(relative, pattern[1:]) if pattern.startswith("/") else fnmatch(name, pattern) or fnmatch(relative, pattern)
+            for pattern in self.exclude
+        )
+
+    def is_included(self, name: str, relative: str):
+        return any(fnmatch(relative if "/" in pattern else name, pattern) for pattern in self.include)
+
+    def matches(self, path):
+        # Whether a path reported by e.g. the watcher is a source we'd discover
+        try:
+            relative = Path(os.path.relpath(path, self.root)).as_posix()
+        except ValueError:
+            return False
+
+        parts = relative.split("/")
+        if parts[0] == "..":
+            return False
+
+        for index, part in enumerate(parts):
+            if self.is_excluded(part, "/".join(parts[:index + 1])):
+                return False
+
+        return self.is_included(parts[-1], relative)
+
+    def scan(self):
+        previous = self.directories
+        directories = {}
+        stack = [""]
+
+        while stack:
+            relative = stack.pop()
+            path = self.root / relative if relative else self.root
+
+            try:
+                stat = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            known = previous.get(relative)
+            if known and known["mtime"] == stat.st_mtime_ns:
+                # No entry was added or removed, only the known files need a stat
+                subdirectories = known["dirs"]
+                files = {}
+                for name in known["files"]:
+                    try:
+                        file_stat = os.stat(path / name)
+                    except FileNotFoundError:
+                        continue
+                    files[name] = [file_stat.st_mtime_ns, file_stat.st_size]
+            else:
+                subdirectories, files = self.list_directory(path, relative)
+
+            directories[relative] = {"mtime": stat.st_mtime_ns, "dirs": subdirectories, "files": files}
+            stack.extend(f"{relative}/{name}" if relative else name for name in reversed(subdirectories))
+
+        self.directories = directories
+        return self.compare(previous, directories)
+
+    def list_directory(self, path: Path, relative: str):
+        subdirectories = []
+        files = {}
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                child = f"{relative}/{entry.name}" if relative else entry.name
+                if self.is_excluded(entry.name, child):
+                    continue
+
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.name)
+                elif entry.is_file() and self.is_included(entry.name, child):
+                    file_stat = entry.stat()
+                    files[entry.name] = [file_stat.st_mtime_ns, file_stat.st_size]
+
+        subdirectories.sort()
+        return subdirectories, files
+
+    def compare(self, previous: dict, directories: dict):
+        result = ScanResult()
+
+        for relative, directory in directories.items():
+            path = self.root / relative if relative else self.root
+            known_files = previous.get(relative, {}).get("files", {})
+
+            for name, stat in sorted(directory["files"].items()):
+                result.files.append(path / name)
+                if known_files.get(name) == stat:
+                    result.unchanged.add(path / name)
+
+        for relative, directory in previous.items():
+            path = self.root / relative if relative else self.root
+            current_files = directories.get(relative, {}).get("files", {})
+
+            for name in directory["files"]:
+                if name not in current_files:
+                    result.removed.append(path / name)
+
+        result.files.sort()
+        result.removed.sort()
+        return result
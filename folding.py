@@ -0,0 +1,210 @@
+# Compile-time folding of literal expressions, run over the tree before
+# emission. Results follow what the emitted C# would compute, so anything
+# C# would reject or evaluate differently is left as written
+
+import ast
+import copy
+import math
+import operator
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def truncating_div(a: int, b: int):
+    # C# integer division rounds toward zero
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+def truncating_mod(a: int, b: int):
+    # C# remainders take the sign of the dividend
+    return a - b * truncating_div(a, b)
+
+def shift_left(a: int, b: int):
+    # Shifts wrap around instead of overflowing
+    result = (a << b) & 0xFFFFFFFF
+    return result - 2 ** 32 if result > INT_MAX else result
+
+# Floor division and powers are emitted through System.Math, which keeps the
+# Python meaning
+INT_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: truncating_div,
+    ast.Mod: truncating_mod,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+    ast.LShift: shift_left,
+    ast.RShift: operator.rshift,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+}
+
+FLOAT_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: math.fmod,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+
+BOOL_BINOPS = {ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor}
+
+CMPOPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+def fold_binop(op: ast.operator, left, right):
+    op_type = type(op)
+
+    if isinstance(left, bool) and isinstance(right, bool):
+        function = BOOL_BINOPS.get(op_type)
+        return function(left, right) if function else None
+    elif isinstance(left, str) and isinstance(right, str):
+        return left + right if op_type is ast.Add else None
+    elif not is_number(left) or not is_number(right):
+        return None
+
+    if isinstance(left, int) and isinstance(right, int):
+        function = INT_BINOPS.get(op_type)
+        if function is None or not (INT_MIN <= left <= INT_MAX and INT_MIN <= right <= INT_MAX):
+            return None
+        elif op_type in (ast.Div, ast.Mod, ast.FloorDiv) and right == 0:
+            return None
+        elif op_type in (ast.LShift, ast.RShift) and not 0 <= right < 32:
+            return None
+        elif op_type is ast.Pow and (right < 0 or right > 31 and abs(left) > 1):
+            return None
+
+        result = function(left, right)
+        # Overflowing constant expressions don't compile
+        return result if INT_MIN <= result <= INT_MAX else None
+
+    function = FLOAT_BINOPS.get(op_type)
+    if function is None:
+        return None
+
+    try:
+        result = float(function(left, right))
+    except (ArithmeticError, ValueError):
+        return None
+
+    return result if math.isfinite(result) else None
+
+def fold_unaryop(op: ast.unaryop, operand):
+    match op:
+        case ast.Not() if isinstance(operand, bool):
+            return not operand
+        case ast.USub() if is_number(operand):
+            result = -operand
+        case ast.UAdd() if is_number(operand):
+            result = operand
+        case ast.Invert() if is_number(operand) and isinstance(operand, int):
+            result = ~operand
+        case _:
+            return None
+
+    if isinstance(result, int) and not INT_MIN <= result <= INT_MAX:
+        return None
+
+    return result
+
+def fold_compare(left, ops: list[ast.cmpop], comparators: list):
+    # Numbers compare with any operator, strings and bools only for equality
+    values = [left, *comparators]
+    if all(is_number(value) for value in values):
+        allowed = CMPOPS
+    elif all(isinstance(value, str) for value in values) or all(isinstance(value, bool) for value in values):
+        allowed = {ast.Eq: operator.eq, ast.NotEq: operator.ne}
+    else:
+        return None
+
+    if not all(type(op) in allowed for op in ops):
+        return None
+
+    return all(allowed[type(op)](a, b) for op, a, b in zip(ops, values, values[1:]))
+
+# Folded nodes are new, and so are their ancestors, everything else is
+# shared with the input tree, which is never modified. A tree with nothing
+# left to fold is returned as-is
+
+FOLDERS = {}
+
+def folds(node_type):
+    def register(function):
+        FOLDERS[node_type] = function
+        return function
+
+    return register
+
+@folds(ast.BinOp)
+def fold_binop_node(node: ast.BinOp):
+    if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant):
+        return fold_binop(node.op, node.left.value, node.right.value)
+
+    return None
+
+@folds(ast.UnaryOp)
+def fold_unaryop_node(node: ast.UnaryOp):
+    if isinstance(node.operand, ast.Constant):
+        return fold_unaryop(node.op, node.operand.value)
+
+    return None
+
+@folds(ast.BoolOp)
+def fold_boolop_node(node: ast.BoolOp):
+    values = [value.value for value in node.values if isinstance(value, ast.Constant)]
+    if len(values) == len(node.values) and all(isinstance(value, bool) for value in values):
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+
+    return None
+
+@folds(ast.Compare)
+def fold_compare_node(node: ast.Compare):
+    operands = [node.left, *node.comparators]
+    if all(isinstance(operand, ast.Constant) for operand in operands):
+        return fold_compare(node.left.value, node.ops, [operand.value for operand in node.comparators])
+
+    return None
+
+def fold_children(node: ast.AST):
+    changes = {}
+    for name, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            folded = fold_constants(value)
+            if folded is not value:
+                changes[name] = folded
+        elif isinstance(value, list):
+            folded = [fold_constants(item) if isinstance(item, ast.AST) else item for item in value]
+            if any(new is not old for new, old in zip(folded, value)):
+                changes[name] = folded
+
+    if not changes:
+        return node
+
+    node = copy.copy(node)
+    for name, value in changes.items():
+        setattr(node, name, value)
+
+    return node
+
+def fold_constants(tree: ast.AST):
+    node = fold_children(tree)
+
+    folder = FOLDERS.get(type(node))
+    value = folder(node) if folder else None
+    if value is None:
+        return node
+
+    return ast.copy_location(ast.Constant(value=value), node)
@@ -0,0 +1,261 @@
+# Decorator and class body analysis, done in a single pass per definition
+
+import ast
+import csast
+
+from cstypes import CsType, literal_type, type_from_annotation, type_size, unwrap_final
+from dataclasses import dataclass, field
+from util import find_keyword
+
+ACCESS_MODIFIERS = {
+    "public": "public",
+    "protected": "protected",
+    "internal": "internal",
+    "private": "private",
+    "protected_internal": "protected internal",
+    "private_protected": "private protected",
+}
+
+@dataclass(slots=True)
+class FunctionInfo:
+    node: ast.FunctionDef
+    name: str
+    access_modifier: str | None = None
+    static: bool = False
+    overrides: bool = False
+    attributes: list[ast.Call] = field(default_factory=list)
+    returns: CsType | None = None
+    receiver: str | None = None
+
+    @property
+    def constructor(self):
+        return self.name == "__init__"
+
+    @property
+    def return_type(self):
+        return str(self.returns) if self.returns else "void"
+
+    @property
+    def parameters(self):
+        # The receiver is implicit in C#
+        args = self.node.args.args
+        return args[1:] if self.receiver else args
+
+@dataclass(slots=True)
+class ClassInfo:
+    node: ast.ClassDef
+    name: str
+    access_modifier: str | None = None
+    static: bool = False
+    struct: bool = False
+    readonly: bool = False
+    attributes: list[ast.Call] = field(default_factory=list)
+    namespace: str | None = None
+    base: str | None = None
+    implementations: list[str] = field(default_factory=list)
+    fields: list[csast.FieldDef] = field(default_factory=list)
+    methods: list[FunctionInfo] = field(default_factory=list)
+
+    def field_type(self, name: str):
+        for field_def in self.fields:
+            if field_def.target.id == name:
+                return field_def_type(field_def)
+
+        return None
+
+    def method_returns(self, name: str):
+        for method in self.methods:
+            if method.name == name:
+                return method.returns
+
+        return None
+
+    def method_parameters(self, name: str):
+        for method in self.methods:
+            if method.name == name:
+                return [arg.annotation and type_from_annotation(arg.annotation) for arg in method.parameters]
+
+        return None
+
+    @property
+    def inheritance(self):
+        if self.base:
+            return [self.base, *self.implementations]
+
+        return self.implementations
+
+def analyze_function(node: ast.FunctionDef, method: bool = False):
+    info = FunctionInfo(node, node.name)
+
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name):
+            apply_flag_decorator(info, decorator.id)
+        elif is_named_call(decorator, "attribute"):
+            info.attributes.append(decorator)
+
+    if node.returns:
+        info.returns = type_from_annotation(node.returns) or CsType(ast.unparse(node.returns))
+
+    # Only methods have a receiver, other functions keep every parameter
+    if method and not info.static and node.args.args:
+        info.receiver = node.args.args[0].arg
+
+    info.access_modifier = info.access_modifier or "internal"
+    return info
+
+def analyze_class(node: ast.ClassDef):
+    info = ClassInfo(node, node.name)
+
+    if node.bases:
+        info.base = node.bases[0].id
+
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name):
+            apply_flag_decorator(info, decorator.id)
+            continue
+
+        if not isinstance(decorator, ast.Call) or not isinstance(decorator.func, ast.Name):
+            continue
+
+        match decorator.func.id:
+            case "attribute":
+                info.attributes.append(decorator)
+            case "namespace":
+                if info.namespace is None:
+                    info.namespace = decorator.args[0].value
+            case "implements":
+                info.implementations.append(decorator.args[0].id)
+            case "field":
+                info.fields.append(field_from_decorator(decorator))
+
+    for child in node.body:
+        if isinstance(child, ast.FunctionDef):
+            info.methods.append(analyze_function(child, method=True))
+        elif isinstance(child, ast.AnnAssign):
+            const, annotation = unwrap_final(child.annotation)
+            info.fields.append(csast.FieldDef(
+                target=child.target,
+                type=annotation,
+                visibility="public",
+                static=False,
+                value=child.value,
+                const=const
+            ))
+
+    info.access_modifier = info.access_modifier or "internal"
+    return info
+
+def apply_flag_decorator(info, name: str):
+    # Access modifiers are non-call decorators only, the first one wins
+    if name in ACCESS_MODIFIERS:
+        if info.access_modifier is None:
+            info.access_modifier = ACCESS_MODIFIERS[name]
+    elif name == "static":
+        info.static = True
+    elif name == "override" and isinstance(info, FunctionInfo):
+        info.overrides = True
+    elif name == "struct" and isinstance(info, ClassInfo):
+        info.struct = True
+    elif name == "readonly" and isinstance(info, ClassInfo):
+        info.readonly = True
+
+def struct_sizes(classes: list[ClassInfo], known: dict[str, int]):
+    # Sizes of the structs among `classes`, which may contain each other
+    structs = {info.name: info for info in classes if info.struct}
+    sizes = dict(known)
+
+    def size(info: ClassInfo, visiting: set):
+        if info.name not in sizes:
+            visiting.add(info.name)
+            for field_def in info.fields:
+                field_type = type_from_annotation(field_def.type)
+                nested = field_type and structs.get(field_type.name)
+                if nested and nested.name not in visiting:
+                    size(nested, visiting)
+
+            sizes[info.name] = sum(
+                type_size(type_from_annotation(field_def.type), sizes)
+                for field_def in info.fields if not field_def.static and not field_def.const
+            )
+
+        return sizes[info.name]
+
+    return {name: size(info, set()) for name, info in structs.items()}
+
+def field_def_type(field_def: csast.FieldDef):
+    # Fields annotated with a bare `Final` take the type of their literal
+    if field_def.type is None and isinstance(field_def.value, ast.Constant):
+        return literal_type(field_def.value.value)
+
+    return type_from_annotation(field_def.type)
+
+FIELD_KEYWORDS = {"value", "static", "const"}
+
+def definition_errors(node: ast.ClassDef | ast.FunctionDef):
+    # Malformed decorators and bases analyze_class and analyze_function
+    # can't read, as (node, message) pairs
+    if isinstance(node, ast.ClassDef) and node.bases and not isinstance(node.bases[0], ast.Name):
+        yield node.bases[0], "base classes must be plain names"
+
+    for decorator in node.decorator_list:
+        if not isinstance(decorator, ast.Call) or not isinstance(decorator.func, ast.Name):
+            continue
+
+        name, args = decorator.func.id, decorator.args
+        if name == "attribute" and not args:
+            yield decorator, "@attribute needs the attribute to apply, e.g. @attribute(SerializeField)"
+        elif not isinstance(node, ast.ClassDef):
+            continue
+        elif name == "namespace" and not (len(args) == 1 and is_string(args[0]) and not decorator.keywords):
+            yield decorator, "@namespace takes a single string, e.g. @namespace(\"Game.Physics\")"
+        elif name == "implements" and not (len(args) == 1 and isinstance(args[0], ast.Name) and not decorator.keywords):
+            yield decorator, "@implements takes a single interface name, e.g. @implements(IComparable)"
+        elif name == "field":
+            yield from field_errors(decorator)
+
+def field_errors(decorator: ast.Call):
+    args = decorator.args
+    usage = '@field takes an optional access modifier, a type and a name, e.g. @field("public", int, "health")'
+    if len(args) not in (2, 3) or not is_string(args[-1]) or len(args) == 3 and not is_string(args[0]):
+        yield decorator, usage
+
+    for keyword in decorator.keywords:
+        if keyword.arg not in FIELD_KEYWORDS:
+            yield keyword.value, f"unknown @field argument {keyword.arg}, expected one of {', '.join(sorted(FIELD_KEYWORDS))}"
+        elif keyword.arg != "value" and not (isinstance(keyword.value, ast.Constant) and isinstance(keyword.value.value, bool)):
+            yield keyword.value, f"@field {keyword.arg} has to be True or False"
+
+def is_string(node: ast.expr):
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+def field_from_decorator(decorator: ast.Call):
+    access_modifier = "internal"
+
+    if len(decorator.args) > 2:
+        access_modifier = decorator.args[0].value
+        field_type = decorator.args[1]
+        field_name = decorator.args[2].value
+    else:
+        field_type = decorator.args[0]
+        field_name = decorator.args[1].value
+
+    value_keyword = find_keyword(decorator.keywords, "value")
+    value = (value_keyword or None) and value_keyword.value # TODO: add support for literals
+
+    static_keyword = find_keyword(decorator.keywords, "static")
+    static = (static_keyword or False) and static_keyword.value.value
+
+    const_keyword = find_keyword(decorator.keywords, "const")
+    const = (const_keyword or False) and const_keyword.value.value
+
+    return csast.FieldDef(
+        target=ast.Name(id=field_name),
+        static=static,
+        visibility=access_modifier,
+        value=value,
+        type=field_type,
+        const=const
+    )
+
+def is_named_call(node: ast.expr, name: str):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
@@ -0,0 +1,69 @@
+# C# operator precedence, higher binds tighter. The Python AST already encodes
+# Python's grouping, so emitting an expression only needs parentheses where C#
+# would otherwise group the operands differently
+
+import ast
+
+ASSIGNMENT = 1
+CONDITIONAL = 2
+COALESCING = 3
+CONDITIONAL_OR = 4
+CONDITIONAL_AND = 5
+BITWISE_OR = 6
+BITWISE_XOR = 7
+BITWISE_AND = 8
+EQUALITY = 9
+RELATIONAL = 10
+SHIFT = 11
+ADDITIVE = 12
+MULTIPLICATIVE = 13
+UNARY = 14
+PRIMARY = 15
+
+BINOP_PRECEDENCE = {
+    ast.Add: ADDITIVE,
+    ast.Sub: ADDITIVE,
+    ast.Mult: MULTIPLICATIVE,
+    ast.Div: MULTIPLICATIVE,
+    ast.Mod: MULTIPLICATIVE,
+    ast.LShift: SHIFT,
+    ast.RShift: SHIFT,
+    ast.BitAnd: BITWISE_AND,
+    ast.BitXor: BITWISE_XOR,
+    ast.BitOr: BITWISE_OR,
+}
+
+BOOLOP_PRECEDENCE = {ast.And: CONDITIONAL_AND, ast.Or: CONDITIONAL_OR}
+
+# Identity and membership tests are emitted as written, like the relational ones
+CMPOP_PRECEDENCE = {ast.Eq: EQUALITY, ast.NotEq: EQUALITY}
+
+def expression_precedence(node):
+    match node:
+        case ast.BinOp(op=ast.FloorDiv() | ast.Pow()):
+            # Emitted as a System.Math call, behind a cast when typed
+            return UNARY
+        case ast.BinOp(op=op):
+            # Operators C# lacks are rejected once emitted
+            return BINOP_PRECEDENCE.get(type(op), PRIMARY)
+        case ast.BoolOp(op=op):
+            return BOOLOP_PRECEDENCE[type(op)]
+        case ast.Compare(ops=[op, *_]):
+            return CMPOP_PRECEDENCE.get(type(op), RELATIONAL)
+        case ast.UnaryOp():
+            return UNARY
+        case ast.Constant(value=int() | float() as value) if value < 0:
+            # Written with a leading minus, which C# reads as a unary minus
+            return UNARY
+        case ast.IfExp():
+            return CONDITIONAL
+        case ast.Lambda() | ast.NamedExpr():
+            return ASSIGNMENT
+
+    return PRIMARY
+
+def needs_parentheses(node, precedence: int, right: bool = False):
+    # Every C# binary operator is left associative, so an operand on the right
+    # of an operator with the same precedence has to stay grouped
+    operand = expression_precedence(node)
+    return operand < precedence or (right and operand == precedence)
@@ -0,0 +1,125 @@
+# Opt-in instrumentation of the transpiler's hot paths. Only ProfilingTranspiler
+# wraps its dispatch tables, so a plain Transpiler pays nothing for it
+
+import json
+
+from collections import Counter
+from dataclasses import dataclass, field
+from time import perf_counter
+from transpiler import Transpiler
+
+@dataclass(slots=True)
+class HandlerStats:
+    calls: int = 0
+    cumulative: float = 0.0
+    own: float = 0.0
+    active: int = 0
+
+@dataclass(slots=True)
+class FileTimings:
+    file: str
+    parse: float = 0.0
+    emit: float = 0.0
+    write: float = 0.0
+    nodes: int = 0
+
+@dataclass
+class Profile:
+    handlers: dict[str, HandlerStats] = field(default_factory=dict)
+    nodes: Counter = field(default_factory=Counter)
+    files: list[FileTimings] = field(default_factory=list)
+    # Time spent in nested handlers, one accumulator per running handler
+    stack: list[float] = field(default_factory=list)
+
+    def merge(self, other: "Profile"):
+        for name, stats in other.handlers.items():
+            total = self.handlers.setdefault(name, HandlerStats())
+            total.calls += stats.calls
+            total.cumulative += stats.cumulative
+            total.own += stats.own
+
+        self.nodes.update(other.nodes)
+        self.files.extend(other.files)
+
+    def sorted_handlers(self):
+        return sorted(self.handlers.items(), key=lambda item: item[1].own, reverse=True)
+
+    def to_json(self):
+        return {
+            "handlers": [
+                {"name": name, "calls": stats.calls, "cumulative": stats.cumulative, "own": stats.own}
+                for name, stats in self.sorted_handlers()
+            ],
+            "nodes": dict(self.nodes.most_common()),
+            "files": [
+                {"file": timings.file, "parse": timings.parse, "emit": timings.emit, "write": timings.write, "nodes": timings.nodes}
+                for timings in sorted(self.files, key=lambda timings: timings.file)
+            ],
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def summary(self, limit: int = 20):
+        lines = [f"{'handler':<28} {'calls':>9} {'cumulative ms':>14} {'own ms':>10} {'own us/call':>12}"]
+        for name, stats in self.sorted_handlers()[:limit]:
+            lines.append(
+                f"{name:<28} {stats.calls:>9} {stats.cumulative * 1000:>14.2f} "
+                f"{stats.own * 1000:>10.2f} {stats.own * 1e6 / stats.calls:>12.2f}"
+            )
+
+        lines.append("")
+        lines.append(f"{'file':<48} {'nodes':>8} {'parse ms':>9} {'emit ms':>9} {'write ms':>9}")
+        slowest = sorted(self.files, key=lambda timings: timings.parse + timings.emit + timings.write, reverse=True)
+        for timings in slowest[:limit]:
+            lines.append(
+                f"{timings.file:<48} {timings.nodes:>8} {timings.parse * 1000:>9.2f} "
+                f"{timings.emit * 1000:>9.2f} {timings.write * 1000:>9.2f}"
+            )
+
+        return "\n".join(lines)
+
+def timed(name: str, handler):
+    def profiled(self, node):
+        profile = self.profile
+        stats = profile.handlers.get(name)
+        if stats is None:
+            stats = profile.handlers[name] = HandlerStats()
+
+        profile.nodes[type(node).__name__] += 1
+        profile.stack.append(0.0)
+        stats.active += 1
+        start = perf_counter()
+        try:
+            handler(self, node)
+        finally:
+            elapsed = perf_counter() - start
+            nested = profile.stack.pop()
+            stats.active -= 1
+            stats.calls += 1
+            stats.own += elapsed - nested
+            # Recursive calls are already covered by the outermost one
+            if not stats.active:
+                stats.cumulative += elapsed
+            if profile.stack:
+                profile.stack[-1] += elapsed
+
+    return profiled
+
+class ProfilingTranspiler(Transpiler):
+    def __init__(self, sink=None, profile: Profile | None = None, structs=None, readonly_structs=None):
+        super().__init__(sink, structs, readonly_structs=readonly_structs)
+        self.profile = profile or Profile()
+
+    @classmethod
+    def build_dispatch(cls):
+        super().build_dispatch()
+        cls.dispatch = {
+            node_type: timed(f"visit_{node_type.__name__}", handler)
+            for node_type, handler in cls.dispatch.items()
+        }
+        cls.cs_dispatch = {
+            node_type: timed(f"visit_Cs{node_type.__name__}", handler)
+            for node_type, handler in cls.cs_dispatch.items()
+        }
@@ -0,0 +1,178 @@
+# Project-wide index of what every module defines and references, used to
+# find the modules that have to be rebuilt when another one changes
+
+import ast
+
+from metadata import analyze_class, struct_sizes
+
+# The parts of a definition other modules' emission reads, changes to
+# anything else leave their output as it was
+EMITTED_FIELDS = ("struct", "readonly")
+
+def index_module(tree: ast.Module):
+    defines = {}
+    classes = []
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            info = analyze_class(node)
+            classes.append(info)
+            defines[info.name] = {
+                "namespace": info.namespace,
+                "base": info.base,
+                "implementations": info.implementations,
+            }
+            if info.struct and info.readonly:
+                defines[info.name]["readonly"] = True
+
+    # Users of a struct pass it differently once its size or readonly changes
+    for name, size in struct_sizes(classes, {}).items():
+        defines[name]["struct"] = size
+
+    return {
+        "defines": defines,
+        "uses": sorted(free_names(tree.body) - defines.keys()),
+    }
+
+def scope_names(nodes: list[ast.AST]):
+    # Names bound and loaded directly in a scope, and the functions nested
+    # in it, whose bodies are scopes of their own
+    bound, loaded, functions = set(), set(), []
+    stack = list(nodes)
+
+    while stack:
+        node = stack.pop()
+        match node:
+            case ast.FunctionDef(name=name) | ast.AsyncFunctionDef(name=name):
+                # Decorators and the return annotation belong to the enclosing scope
+                bound.add(name)
+                functions.append(node)
+                stack.extend(node.decorator_list)
+                if node.returns:
+                    stack.append(node.returns)
+                    loaded.update(forward_reference(node.returns))
+                continue
+            case ast.Lambda():
+                functions.append(node)
+                continue
+            case ast.ClassDef(name=name):
+                bound.add(name)
+            case ast.Name(id=name, ctx=ast.Load()):
+                loaded.add(name)
+            case ast.Name(id=name):
+                bound.add(name)
+            case ast.Import(names=names):
+                # Imported modules are references too, to their namespace
+                loaded.update(alias.name for alias in names)
+                continue
+            case ast.ImportFrom(names=names):
+                bound.update(alias.asname or alias.name for alias in names)
+                continue
+            case ast.ExceptHandler(name=str(name)) | ast.MatchAs(name=str(name)) | ast.MatchStar(name=str(name)):
+                bound.add(name)
+            case ast.arg(arg=name, annotation=annotation):
+                bound.add(name)
+                loaded.update(forward_reference(annotation))
+            case ast.AnnAssign(annotation=annotation):
+                loaded.update(forward_reference(annotation))
+
+        stack.extend(ast.iter_child_nodes(node))
+
+    return bound, loaded, functions
+
+def forward_reference(annotation: ast.expr | None):
+    # A class named by a string annotation
+    if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str) and annotation.value.isidentifier():
+        return {annotation.value}
+
+    return set()
+
+def free_names(nodes: list[ast.AST], outer: frozenset = frozenset()):
+    # Names referenced but bound by neither the scope nor its enclosing ones,
+    # so a local that happens to share a class's name is not a reference
+    bound, loaded, functions = scope_names(nodes)
+    visible = outer | bound
+    names = loaded - visible
+
+    for function in functions:
+        body = function.body if isinstance(function.body, list) else [function.body]
+        names |= free_names([function.args, *body], visible)
+
+    return names
+
+def changed_symbols(old: dict | None, new: dict | None):
+    old_defines = old["defines"] if old else {}
+    new_defines = new["defines"] if new else {}
+
+    return {
+        name for name in old_defines.keys() | new_defines.keys()
+        if emitted_fields(old_defines.get(name)) != emitted_fields(new_defines.get(name))
+    }
+
+def emitted_fields(definition: dict | None):
+    return tuple((definition or {}).get(name) for name in EMITTED_FIELDS)
+
+class ProjectIndex:
+    def __init__(self, modules: dict | None = None):
+        self.modules = modules or {}
+        self.dirty = False
+
+        # Reverse lookup from a referenced name to the modules referencing it
+        self.users = {}
+        for key, entry in self.modules.items():
+            self.add_uses(key, entry)
+
+    def add_uses(self, key, entry):
+        for name in entry["uses"]:
+            self.users.setdefault(name, set()).add(key)
+
+    def remove_uses(self, key, entry):
+        for name in entry["uses"]:
+            users = self.users.get(name)
+            if users:
+                users.discard(key)
+
+    def update(self, key, entry: dict):
+        # Returns the symbols whose definition changed with this entry
+        old = self.modules.get(key)
+        if old == entry:
+            return set()
+
+        if old:
+            self.remove_uses(key, old)
+        self.modules[key] = entry
+        self.add_uses(key, entry)
+        self.dirty = True
+
+        return changed_symbols(old, entry)
+
+    def remove(self, key):
+        old = self.modules.pop(key, None)
+        if old is None:
+            return set()
+
+        self.remove_uses(key, old)
+        self.dirty = True
+
+        return changed_symbols(old, None)
+
+    def struct_sizes(self):
+        return {
+            name: definition["struct"]
+            for entry in self.modules.values()
+            for name, definition in entry["defines"].items() if "struct" in definition
+        }
+
+    def readonly_structs(self):
+        return {
+            name
+            for entry in self.modules.values()
+            for name, definition in entry["defines"].items() if definition.get("readonly")
+        }
+
+    def dependents(self, symbols):
+        keys = set()
+        for symbol in symbols:
+            keys.update(self.users.get(symbol, ()))
+
+        return sorted(keys)
@@ -0,0 +1,212 @@
+# Long-running transpiler daemon speaking JSON lines over stdin/stdout or a
+# Unix socket. Every request is a JSON object with a "method":
+#
+#   {"id": 1, "method": "transpile_source", "source": "x = 1"}
+#   {"id": 2, "method": "transpile_paths", "paths": ["Assets/Scripts/Player.py"]}
+#   {"id": 3, "method": "transpile_paths", "paths": ["Player.py"], "root": "Assets/Scripts"}
+#   {"id": 4, "method": "stats"}
+#   {"id": 5, "method": "shutdown"}
+#
+# and gets exactly one JSON line back with the same "id", "ok", the method's
+# result or an "error", and the request's "latency_ms".
+
+import json
+import logging
+import sys
+import threading
+import time
+import build
+
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+from api import Builder, common_root, discover, transpile_source
+from cache import content_hash
+
+class Server:
+    MAX_OUTPUTS = 1024
+    # Parsed and analyzed modules kept warm, per process
+    MAX_MODULES = 4096
+
+    def __init__(self, jobs=1, debug=False, root=None):
+        self.jobs = jobs
+        self.debug = debug
+        # Project root for requests that don't name one, so every file of the
+        # project shares one build cache and dependency index
+        self.root = root and Path(root).resolve()
+        # Builders keep their build cache loaded between requests, one per root
+        self.builders = {}
+        # Started on the first parallel build and kept for the server's
+        # lifetime, so its workers' warm modules survive between requests
+        self.executor = None
+        build.keep_warm(self.MAX_MODULES)
+        # Transpiled source texts by content hash, least recently used first
+        self.outputs = OrderedDict()
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.output_hits = 0
+        self.total_latency = 0.0
+        self.running = True
+
+        self.methods = {
+            "transpile_source": self.transpile_source,
+            "transpile_paths": self.transpile_paths,
+            "stats": self.stats,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, request):
+        start = perf_counter()
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+
+        try:
+            if not isinstance(request, dict) or request.get("method") not in self.methods:
+                raise ValueError(f"unknown request: {request!r}")
+
+            with self.lock:
+                response.update(self.methods[request["method"]](request))
+            response["ok"] = True
+        except Exception as e:
+            logging.exception("Caught error while handling request:", exc_info=e)
+            response["ok"] = False
+            response["error"] = str(e)
+
+        latency = perf_counter() - start
+        response["latency_ms"] = latency * 1000
+        self.requests += 1
+        self.total_latency += latency
+
+        return response
+
+    def handle_line(self, line: str):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"id": None, "ok": False, "error": f"invalid JSON: {e}"}
+
+        return self.handle(request)
+
+    def builder(self, root):
+        root = str(Path(root).resolve())
+        builder = self.builders.get(root)
+        if builder is None:
+            builder = self.builders[root] = Builder(root, jobs=self.jobs, debug=self.debug, executor=self.pool())
+
+        return builder
+
+    def known_root(self, paths):
+        # Without a project root, the widest root already built that holds
+        # every path, instead of a new cache per directory
+        roots = [Path(root) for root in self.builders]
+        roots = [root for root in roots if all(path.is_relative_to(root) for path in paths)]
+        return min(roots, key=lambda root: len(root.parts), default=None)
+
+    def pool(self):
+        if self.executor is None and self.jobs != 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(self.jobs or None, initializer=build.init_worker, initargs=(self.MAX_MODULES,))
+
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def transpile_source(self, request):
+        source = request["source"]
+        digest = content_hash(source.encode())
+
+        output = self.outputs.get(digest)
+        if output is not None:
+            self.outputs.move_to_end(digest)
+            self.output_hits += 1
+            return {"output": output, "cached": True}
+
+        output = transpile_source(source)
+        self.outputs[digest] = output
+        if len(self.outputs) > self.MAX_OUTPUTS:
+            self.outputs.popitem(last=False)
+
+        return {"output": output, "cached": False}
+
+    def transpile_paths(self, request):
+        paths = [Path(path).resolve() for path in request["paths"]]
+        root = Path(request.get("root") or self.root or self.known_root(paths) or common_root(paths)).resolve()
+        for path in paths:
+            if not path.is_relative_to(root):
+                raise ValueError(f"{path} is outside the project root {root}")
+
+        builder = self.builder(root)
+
+        existing = [path for path in paths if path.exists()]
+        removed_symbols = set()
+        for path in paths:
+            if not path.exists():
+                removed_symbols |= builder.remove_output(path)
+
+        results = builder.transpile_files(discover(existing), removed_symbols)
+        builder.cache.save()
+
+        return {"files": [
+            {"source": str(result.source_file), "status": result.status, "written": result.written, "error": result.error}
+            for result in results
+        ]}
+
+    def stats(self, request):
+        return {
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "average_latency_ms": self.total_latency * 1000 / max(self.requests, 1),
+            "cached_outputs": len(self.outputs),
+            "warm_modules": len(build.warm_modules or ()),
+            "output_hits": self.output_hits,
+            "roots": sorted(self.builders),
+        }
+
+    def shutdown(self, request):
+        self.running = False
+        return {}
+
+def serve_stdio(server: Server, stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        if not line.strip():
+            continue
+
+        stdout.write(json.dumps(server.handle_line(line)) + "\n")
+        stdout.flush()
+
+        if not server.running:
+            break
+
+def serve_unix(server: Server, path):
+    import os
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+
+                response = server.handle_line(line.decode())
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+
+                if not server.running:
+                    # shutdown() waits for serve_forever, which runs on another thread
+                    threading.Thread(target=unix_server.shutdown).start()
+                    return
+
+    # A socket file left over by a crashed daemon would make bind() fail
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as unix_server:
+        logging.info(f"Listening on {path}...")
+        try:
+            unix_server.serve_forever()
+        finally:
+            os.unlink(path)
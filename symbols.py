@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+class SymbolTable:
+    """
+    Variables visible at the current point of emission.
+
+    Shadowing is forbidden, so every visible name is defined exactly once
+    along the scope chain and a single dict answers lookups. Each scope only
+    remembers which names it introduced to drop them again when it's popped.
+    """
+
+    def __init__(self):
+        self.visible = {}
+        self.scopes = [[]]
+
+    def push_scope(self):
+        self.scopes.append([])
+
+    def pop_scope(self):
+        for name in self.scopes.pop():
+            del self.visible[name]
+
+    @contextmanager
+    def scope(self):
+        self.push_scope()
+        try:
+            yield
+        finally:
+            self.pop_scope()
+
+    def is_defined(self, name: str):
+        return name in self.visible
+
+    def define(self, name: str, type=None):
+        self.visible[name] = type
+        self.scopes[-1].append(name)
+
+    def lookup(self, name: str):
+        # Returns the type the variable was defined with, if known
+        return self.visible.get(name)
@@ -0,0 +1,7 @@
+# The tool is a flat set of modules run as `python <repo>`, make them
+# importable the same way
+import sys
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,18 @@
+import ast
+
+from transpiler import Transpiler
+
+def transpile_method(*lines: str, parameters: str = "", header: str = ""):
+    # A public method of a MonoBehaviour, with optional class body lines
+    source = (
+        "@public\n"
+        "class A(MonoBehaviour):\n"
+        + "".join(f"    {line}\n" for line in header.splitlines())
+        + "    @public\n"
+        f"    def Run(self{', ' if parameters else ''}{parameters}) -> None:\n"
+        + "".join(f"        {line}\n" for line in lines)
+    )
+    return Transpiler().transpile(ast.parse(source))
+
+def statements(output: str):
+    return [text.strip() for text in output.splitlines() if text.strip().endswith(";")]
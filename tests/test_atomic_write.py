@@ -0,0 +1,86 @@
+import os
+import stat
+
+import pytest
+
+from util import atomic_write, current_umask, same_contents
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_replaces_target_and_leaves_no_temp_file(tmp_path):
+    path = tmp_path / "A.cs"
+    path.write_text("old")
+
+    with atomic_write(path) as f:
+        f.write("new")
+
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["A.cs"]
+
+def test_failed_write_keeps_target(tmp_path):
+    path = tmp_path / "A.cs"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write("partial")
+            raise RuntimeError
+
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["A.cs"]
+
+def test_new_file_follows_umask(tmp_path):
+    path = tmp_path / "A.cs"
+    with atomic_write(path) as f:
+        f.write("new")
+
+    assert mode(path) == 0o666 & ~current_umask()
+
+def test_replaced_file_keeps_its_mode(tmp_path):
+    path = tmp_path / "A.cs"
+    path.write_text("old")
+    path.chmod(0o640)
+
+    with atomic_write(path) as f:
+        f.write("new")
+
+    assert mode(path) == 0o640
+
+def test_unchanged_contents_are_not_rewritten(tmp_path):
+    path = tmp_path / "A.cs"
+    path.write_text("same")
+    os.utime(path, ns=(0, 0))
+
+    writer = atomic_write(path, only_if_changed=True)
+    with writer as f:
+        f.write("same")
+
+    assert not writer.changed
+    assert os.stat(path).st_mtime_ns == 0
+    assert os.listdir(tmp_path) == ["A.cs"]
+
+@pytest.mark.parametrize("old, new", [
+    ("a" * 100_000 + "b", "a" * 100_000 + "c"),
+    ("short", "longer"),
+])
+def test_changed_contents_are_rewritten(tmp_path, old, new):
+    path = tmp_path / "A.cs"
+    path.write_text(old)
+
+    writer = atomic_write(path, only_if_changed=True)
+    with writer as f:
+        f.write(new)
+
+    assert writer.changed
+    assert path.read_text() == new
+
+def test_same_contents_compares_in_chunks(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_bytes(b"x" * 200_000)
+    second.write_bytes(b"x" * 200_000)
+    assert same_contents(first, second)
+
+    second.write_bytes(b"x" * 199_999 + b"y")
+    assert not same_contents(first, second)
+    assert not same_contents(first, tmp_path / "missing")
@@ -0,0 +1,16 @@
+import json
+
+from benchmarks.run import main
+
+def test_corpus_is_left_untouched(tmp_path, capsys):
+    corpus = tmp_path / "corpus"
+    (corpus / "sub").mkdir(parents=True)
+    (corpus / "sub" / "a.py").write_text("@public\nclass A:\n    @public\n    def Run(self, n: int) -> int:\n        return n * 2\n")
+    (corpus / "bad.py").write_text('x = f"{1:^5}"\n')
+
+    main(["--corpus", str(corpus), "--repeat", "1"])
+    result = json.loads(capsys.readouterr().out)
+
+    assert result["files"] == 1
+    assert result["failed_files"] == 1
+    assert sorted(path.name for path in corpus.rglob("*")) == ["a.py", "bad.py", "sub"]
@@ -0,0 +1,89 @@
+import json
+
+import build
+
+from cache import CACHE_FILE, BuildCache, content_hash
+
+def test_entries_survive_save_and_load(tmp_path):
+    source = tmp_path / "a.py"
+    cache = BuildCache(tmp_path, options={})
+    cache.update(source, "digest")
+    cache.save()
+
+    loaded = BuildCache(tmp_path, options={})
+    loaded.load()
+    assert loaded.get(source) == "digest"
+
+def test_changed_options_invalidate_the_cache(tmp_path):
+    source = tmp_path / "a.py"
+    cache = BuildCache(tmp_path, options={})
+    cache.update(source, "digest")
+    cache.save()
+
+    loaded = BuildCache(tmp_path, options={"debug": True})
+    loaded.load()
+    assert loaded.get(source) is None
+    assert loaded.dirty
+
+def test_changed_tool_invalidates_the_cache(tmp_path):
+    cache = BuildCache(tmp_path, options={})
+    cache.update(tmp_path / "a.py", "digest")
+    cache.save()
+
+    manifest = json.loads((tmp_path / CACHE_FILE).read_text())
+    manifest["fingerprint"] = "older transpiler"
+    (tmp_path / CACHE_FILE).write_text(json.dumps(manifest))
+
+    loaded = BuildCache(tmp_path, options={})
+    loaded.load()
+    assert loaded.entries == {}
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    (tmp_path / CACHE_FILE).write_text("{not json")
+
+    cache = BuildCache(tmp_path, options={})
+    cache.load()
+    assert cache.entries == {}
+
+def test_matching_digest_skips_transpiling(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("x = 1\n")
+
+    first = build.transpile_file(source)
+    assert first.status == "transpiled"
+    assert first.digest == content_hash(source.read_bytes())
+
+    second = build.transpile_file(source, cached_digest=first.digest)
+    assert second.status == "up-to-date"
+    assert not second.written
+
+def test_missing_output_is_rebuilt(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("x = 1\n")
+    digest = content_hash(source.read_bytes())
+
+    result = build.transpile_file(source, cached_digest=digest)
+    assert result.status == "transpiled"
+    assert source.with_suffix(".cs").exists()
+
+def test_tool_modules_cover_the_transpiler_imports():
+    # Every local module the emitted C# depends on has to be fingerprinted
+    import ast
+    from pathlib import Path
+
+    from cache import TOOL_MODULES
+
+    root = Path(build.__file__).parent
+    seen, pending = set(), ["transpiler.py"]
+    while pending:
+        module = pending.pop()
+        seen.add(module)
+        for node in ast.walk(ast.parse((root / module).read_text())):
+            names = [alias.name for alias in node.names] if isinstance(node, ast.Import) else []
+            if isinstance(node, ast.ImportFrom) and node.module:
+                names.append(node.module)
+            for name in names:
+                if (root / f"{name}.py").exists() and f"{name}.py" not in seen:
+                    pending.append(f"{name}.py")
+
+    assert seen <= set(TOOL_MODULES)
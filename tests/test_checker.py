@@ -0,0 +1,111 @@
+import pytest
+
+import checker
+
+from api import check_paths
+from checker import check_file, check_source
+
+def messages(source: str):
+    return [diagnostic.message for diagnostic in check_source(source)]
+
+def in_method(*lines: str):
+    return (
+        "@public\nclass A(MonoBehaviour):\n"
+        "    @public\n    def Run(self, n: int, items: list[int]) -> None:\n"
+        + "".join(f"        {line}\n" for line in lines)
+    )
+
+@pytest.mark.parametrize("line, message", [
+    ("while n > 0:\n            n -= 1", "while loops are not supported"),
+    ("value = 1 if n else 2", "conditional expressions are not supported"),
+    ("a = b = 1", "chained assignments are not supported"),
+    ("first, *rest = items", "starred unpacking targets are not supported"),
+    ("part = items[1:3]", "subslices are not supported"),
+    ("empty = ()", "empty tuples are not supported"),
+    ("for i in range(1, 2, 3, 4):\n            pass", "unknown args for range in for loop"),
+    ("for i, j in range(3):\n            pass", "range loops need a single loop variable"),
+    ("for i in range(0, 10, 0):\n            pass", "range step can't be zero"),
+    ("for i in items:\n            pass\n        else:\n            pass", "for/else is not supported"),
+    ('text = f"{n!r}"', "conversion !r in f-strings is not supported"),
+    ("c = cast(n, list[int])", "target cast type should be identifier"),
+    ("ok = 1 < n < 3", "chained comparisons are not supported"),
+    ("ok = n in items", "membership tests are not supported, call Contains"),
+    ("merged = {**other}", "dict unpacking is not supported"),
+    ("m = n @ n", "matrix multiplication is not supported"),
+    ("n @= n", "matrix multiplication is not supported"),
+])
+def test_reports_unsupported_constructs(line, message):
+    assert messages(in_method(line)) == [message]
+
+@pytest.mark.parametrize("line", [
+    # Lowered to System.Math calls
+    "m = n // 2",
+    "m = n ** 2",
+    "n //= 2",
+    "n **= 2",
+    # Folded before emission
+    "ok = 1 < 2 < 3",
+    "total = sum(x for x in items)",
+])
+def test_accepts_supported_constructs(line):
+    assert messages(in_method(line)) == []
+
+def test_reports_class_rules():
+    assert messages("@readonly\nclass Bad(A, B):\n    pass\n") == [
+        "classes can only have a single base class, implement interfaces with @implements",
+        "@readonly only applies to structs, Bad is a class",
+    ]
+    assert messages("@struct\nclass Point(Base):\n    x: int = 1\n") == [
+        "struct Point can't inherit from Base, implement interfaces with @implements",
+        "instance fields of struct Point can't have initializers",
+    ]
+
+@pytest.mark.parametrize("decorator, message", [
+    ("@namespace()", '@namespace takes a single string, e.g. @namespace("Game.Physics")'),
+    ("@namespace(Game)", '@namespace takes a single string, e.g. @namespace("Game.Physics")'),
+    ("@implements(foo.Bar)", "@implements takes a single interface name, e.g. @implements(IComparable)"),
+    ("@field(int)", '@field takes an optional access modifier, a type and a name, e.g. @field("public", int, "health")'),
+    ("@field(int, health)", '@field takes an optional access modifier, a type and a name, e.g. @field("public", int, "health")'),
+    ('@field(int, "health", static=1)', "@field static has to be True or False"),
+    ('@field(int, "health", default=1)', "unknown @field argument default, expected one of const, static, value"),
+    ("@attribute()", "@attribute needs the attribute to apply, e.g. @attribute(SerializeField)"),
+])
+def test_reports_malformed_decorators(decorator, message):
+    assert messages(f"{decorator}\nclass A:\n    pass\n") == [message]
+
+def test_reports_dotted_bases():
+    assert messages("class A(B.C):\n    pass\n") == ["base classes must be plain names"]
+
+def test_reports_malformed_method_decorators():
+    assert messages("class A:\n    @attribute()\n    def f(self) -> None:\n        pass\n") == [
+        "@attribute needs the attribute to apply, e.g. @attribute(SerializeField)",
+    ]
+
+def test_imports():
+    assert messages("from typing import Final\nimport UnityEngine\n") == []
+    assert messages("from UnityEngine import Vector3\n") == ["from imports are not supported, use import"]
+
+def test_diagnostics_are_sorted_with_positions():
+    diagnostics = check_source("x = 1\nwhile x:\n    y = 1 if x else 2\n")
+    assert [(diagnostic.line, diagnostic.column) for diagnostic in diagnostics] == [(2, 1), (3, 9)]
+
+def test_syntax_errors_are_reported():
+    message, = messages("def f(:\n")
+    assert message.startswith("syntax error")
+
+def test_unreadable_file(tmp_path):
+    result = check_file(tmp_path / "missing.py")
+    assert result.diagnostics[0].message.startswith("can't read file")
+
+def test_checker_errors_stay_in_their_file(tmp_path, monkeypatch):
+    def fail(self, node):
+        raise IndexError("list index out of range")
+
+    monkeypatch.setattr(checker.Checker, "visit_ClassDef", fail)
+    (tmp_path / "a.py").write_text("class A:\n    pass\n")
+    (tmp_path / "b.py").write_text("x = 1\nwhile x:\n    x = 0\n")
+
+    results = check_paths([tmp_path], jobs=1)
+    diagnostics = {result.source_file.name: [d.message for d in result.diagnostics] for result in results}
+    assert diagnostics["a.py"] == ["internal checker error, please report it: IndexError: list index out of range"]
+    assert diagnostics["b.py"] == ["while loops are not supported"]
@@ -0,0 +1,64 @@
+import pytest
+
+from snippets import statements, transpile_method
+from transpiler import TranspilerException
+
+HEADER = (
+    "def f(self) -> int:\n"
+    "    return 1\n"
+    "def g(self, x: int) -> int:\n"
+    "    return x\n"
+)
+
+def lowered(*lines: str):
+    output = transpile_method(*lines, parameters="xs: list[int], grid: list[list[int]]", header=HEADER)
+    return statements(output[output.index("void Run"):])
+
+def test_sum_is_lowered_to_a_loop():
+    assert lowered("total = sum(x * 2 for x in xs)") == [
+        "int __sum0 = 0;",
+        "var x = xs[__i1];",
+        "__sum0 += x * 2;",
+        "var total = __sum0;",
+    ]
+
+def test_calls_evaluated_first_are_hoisted_in_order():
+    result = lowered("total = self.f() + sum(self.g(x) for x in xs)")
+    assert result[0] == "var __value0 = this.f();"
+    assert result[-1] == "var total = __value0 + __sum1;"
+
+def test_arguments_of_an_enclosing_call_are_not_hoisted():
+    result = lowered("Debug.Log(sum(x for x in xs))")
+    assert result[-1] == "Debug.Log(__sum0);"
+
+def test_augmented_assignment_target_is_evaluated_first():
+    result = lowered("xs[self.f()] += sum(x for x in xs)")
+    assert result[0] == "var __value0 = this.f();"
+    assert result[-1] == "xs[__value0] += __sum1;"
+
+def test_pure_operands_stay_in_place():
+    result = lowered("n = len(xs) + sum(x for x in xs)")
+    assert result[-1] == "var n = xs.Count + __sum0;"
+
+def test_conditional_calls_before_a_comprehension_are_rejected():
+    with pytest.raises(TranspilerException, match="conditional branches"):
+        lowered("n = (xs or self.f()) + sum(x for x in xs)")
+
+@pytest.mark.parametrize("call, decided", [("any(c > 3", "if(__any0)"), ("all(c > 3", "if(!__all0)")])
+def test_nested_any_and_all_leave_every_loop(call, decided):
+    output = transpile_method(f"hit = {call} for row in grid for c in row)", parameters="grid: list[list[int]]")
+    lines = [line.strip() for line in output.splitlines()]
+    # Tested once, after the inner loop, inside the outer one
+    assert lines.count(decided) == 1
+    assert lines[lines.index(decided) + 2] == "break;"
+    assert lines.count("break;") == 2
+
+def test_elif_comprehension_is_lowered_in_the_else_block():
+    result = lowered(
+        "if len(xs) > 3:",
+        "    n = 1",
+        "elif sum(x for x in xs) > 2:",
+        "    n = 2",
+    )
+    assert result[-1] == "var n = 2;"
+    assert "int __sum0 = 0;" in result
@@ -0,0 +1,37 @@
+import io
+
+from cswriter import CSWriter
+
+def test_tracks_lines_and_columns_while_writing():
+    writer = CSWriter()
+    writer.write("class A")
+    assert (writer.line, writer.column) == (1, 7)
+
+    writer.write("\n{\n    int x")
+    assert (writer.line, writer.column) == (3, 9)
+    assert writer.count_lines() == 3
+
+def test_empty_writes_are_ignored():
+    writer = CSWriter()
+    writer.write("")
+    writer.write_indents()
+    assert writer.build() == ""
+
+def test_block_indents_its_contents():
+    writer = CSWriter()
+    writer.write("class A")
+    with writer.block():
+        writer.write_indented("int x;")
+
+    assert writer.build() == "class A\n{\n    int x;\n}"
+
+def test_sink_receives_chunks_on_flush():
+    sink = io.StringIO()
+    writer = CSWriter(sink)
+    writer.write("using UnityEngine;")
+    assert sink.getvalue() == ""
+
+    writer.flush()
+    writer.write("\nclass A {}")
+    assert writer.build() is None
+    assert sink.getvalue() == "using UnityEngine;\nclass A {}"
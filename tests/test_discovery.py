@@ -0,0 +1,71 @@
+import logging
+import os
+
+from api import Builder
+from discovery import SourceDiscovery
+
+def touch(root, *paths):
+    for path in paths:
+        path = root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+
+def relative(root, files):
+    return sorted(path.relative_to(root).as_posix() for path in files)
+
+def test_default_excludes(tmp_path):
+    touch(
+        tmp_path,
+        "Player.py", ".git/hook.py", "__pycache__/a.py", "lib/site-packages/pkg.py",
+        "Library/cache.py", "Temp/a.py", "venv/lib.py", "env/lib.py",
+    )
+    assert relative(tmp_path, SourceDiscovery(tmp_path).scan().files) == ["Player.py"]
+
+def test_unity_folder_names_deeper_down_are_sources(tmp_path):
+    touch(tmp_path, "Scripts/Build/Builder.py", "Scripts/env/Settings.py", "Scripts/Library/Books.py")
+    assert relative(tmp_path, SourceDiscovery(tmp_path).scan().files) == [
+        "Scripts/Build/Builder.py", "Scripts/Library/Books.py", "Scripts/env/Settings.py",
+    ]
+
+def test_include_and_exclude_globs(tmp_path):
+    touch(tmp_path, "a.py", "b.pyx", "tests/test_a.py", "Editor/Tool.py", "Game/Editor/Tool.py")
+
+    discovery = SourceDiscovery(tmp_path, include=["*.py", "*.pyx"], exclude=["tests", "/Editor"])
+    assert relative(tmp_path, discovery.scan().files) == ["Game/Editor/Tool.py", "a.py", "b.pyx"]
+    assert discovery.matches(tmp_path / "Game/Editor/Tool.py")
+    assert not discovery.matches(tmp_path / "Editor/Tool.py")
+    assert not discovery.matches(tmp_path.parent / "a.py")
+
+def test_snapshot_reports_unchanged_and_removed(tmp_path):
+    touch(tmp_path, "a.py", "pkg/b.py", "pkg/c.py")
+    first = SourceDiscovery(tmp_path)
+    assert first.scan().unchanged == set()
+
+    os.unlink(tmp_path / "pkg/c.py")
+    (tmp_path / "a.py").write_text("x = 2\n")
+    os.utime(tmp_path / "a.py", ns=(1, 1))
+
+    scan = SourceDiscovery(tmp_path, snapshot=first.snapshot).scan()
+    assert relative(tmp_path, scan.files) == ["a.py", "pkg/b.py"]
+    assert relative(tmp_path, scan.unchanged) == ["pkg/b.py"]
+    assert relative(tmp_path, scan.removed) == ["pkg/c.py"]
+
+def test_changed_patterns_discard_the_snapshot(tmp_path):
+    touch(tmp_path, "a.py")
+    first = SourceDiscovery(tmp_path)
+    first.scan()
+
+    scan = SourceDiscovery(tmp_path, exclude=["a.py"], snapshot=first.snapshot).scan()
+    assert scan.files == [] and scan.removed == []
+
+def test_deleted_outputs_are_logged(tmp_path, caplog):
+    touch(tmp_path, "a.py", "b.py")
+    Builder(tmp_path).transpile()
+    os.unlink(tmp_path / "b.py")
+
+    with caplog.at_level(logging.WARNING):
+        Builder(tmp_path).transpile()
+
+    assert not (tmp_path / "b.cs").exists()
+    assert (tmp_path / "a.cs").exists()
+    assert any("deleted" in message and "b.cs" in message for message in caplog.messages)
@@ -0,0 +1,28 @@
+import pytest
+
+from api import transpile_source
+from transpiler import TranspilerException
+
+@pytest.mark.parametrize("source, line", [
+    ("@namespace()\nclass A:\n    pass\n", 2),
+    ("x = 1\n\nclass A(B.C):\n    pass\n", 3),
+    ("@struct\nclass A:\n    pass\n\nclass B(C.D):\n    pass\n", 5),
+])
+def test_class_analysis_errors_point_at_the_class(source, line):
+    with pytest.raises(TranspilerException) as info:
+        transpile_source(source)
+    assert info.value.py_line == line
+
+def test_errors_report_the_python_line():
+    with pytest.raises(TranspilerException) as info:
+        transpile_source("x = 1\ny = 2\nz = 1 @ 2\n")
+    assert info.value.py_line == 3
+    assert "Py line: 3" in str(info.value)
+
+def test_malformed_decorators_are_reported_by_name():
+    with pytest.raises(TranspilerException, match="@namespace takes a single string") as info:
+        transpile_source("@namespace()\nclass A:\n    pass\n")
+    assert info.value.py_line == 2
+
+    with pytest.raises(TranspilerException, match="@attribute needs"):
+        transpile_source("class A:\n    @attribute()\n    def f(self) -> None:\n        pass\n")
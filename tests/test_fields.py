@@ -0,0 +1,30 @@
+import ast
+
+import pytest
+
+from transpiler import Transpiler
+
+def declaration(decorator: str = "", body: str = "pass"):
+    source = f"{decorator}\n@public\nclass A(MonoBehaviour):\n    {body}\n"
+    output = Transpiler().transpile(ast.parse(source))
+    line, = [line.strip() for line in output.splitlines() if line.strip().endswith(";")]
+    return line
+
+@pytest.mark.parametrize("decorator, expected", [
+    ('@field(int, "Seconds", value=60 * 60, const=True)', "const int Seconds = 3600;"),
+    ('@field(Vector3, "Up", value=Vector3.up, const=True)', "static readonly Vector3 Up = Vector3.up;"),
+    ('@field(int, "Seed", const=True)', "readonly int Seed;"),
+    ('@field(int, "Seed", const=True, static=True)', "static readonly int Seed;"),
+    ('@field(float, "Ratio", value=1.5, const=True, static=True)', "const float Ratio = 1.5f;"),
+    ('@field(int, "Count", static=True)', "static int Count;"),
+])
+def test_field_modifiers(decorator, expected):
+    assert declaration(decorator).endswith(expected)
+
+@pytest.mark.parametrize("body, expected", [
+    ("Limit: Final[int] = 7", "const int Limit = 7;"),
+    ('Name: Final = "player"', 'const string Name = "player";'),
+    ("Origin: Final[Vector3] = Vector3.zero", "static readonly Vector3 Origin = Vector3.zero;"),
+])
+def test_final_annotations(body, expected):
+    assert declaration(body=body).endswith(expected)
@@ -0,0 +1,102 @@
+import ast
+
+import pytest
+
+from folding import fold_constants
+from transpiler import Transpiler
+
+def fold(source: str):
+    return fold_constants(ast.parse(source, mode="eval")).body
+
+def folded_value(source: str):
+    node = fold(source)
+    assert isinstance(node, ast.Constant), ast.dump(node)
+    return node.value
+
+@pytest.mark.parametrize("source, value", [
+    ("60 * 60 * 24", 86400),
+    ("1 << 5 | 1 << 2", 36),
+    # C# integer division and remainder truncate toward zero
+    ("7 / 2", 3),
+    ("-7 / 2", -3),
+    ("-7 % 3", -1),
+    ("7 % -3", 1),
+    # Emitted through System.Math, the Python meaning is kept
+    ("-7 // 2", -4),
+    ("2 ** 10", 1024),
+    # Shifts wrap instead of overflowing
+    ("1 << 31", -2 ** 31),
+    ("-8 >> 1", -4),
+    # Doubles use fmod like C#
+    ("-7.5 % 2.0", -1.5),
+    ("1.5 * 2", 3.0),
+    ('"pl" + "ayer"', "player"),
+    ("1 < 2 < 3", True),
+    ('"a" == "b"', False),
+    ("True and not False", True),
+    ("True ^ True", False),
+    ("-(3)", -3),
+    ("~0", -1),
+])
+def test_folds_like_csharp(source, value):
+    result = folded_value(source)
+    assert result == value and type(result) is type(value)
+
+@pytest.mark.parametrize("source", [
+    # Overflowing constant expressions don't compile in C#
+    "2147483647 + 1",
+    "65536 * 65536",
+    "2 ** 40",
+    "-(-2147483647 - 1)",
+    # Division by zero, shift counts C# would mask
+    "1 / 0",
+    "1 % 0",
+    "1.0 / 0.0",
+    "1 << 32",
+    "1 << -1",
+    # Operations C# doesn't define on these types
+    "True + 1",
+    '"a" * 3',
+    '"a" + 1',
+    '"a" < "b"',
+    "not 1",
+    "~1.5",
+    "1 in 2",
+])
+def test_leaves_what_csharp_would_reject(source):
+    assert not isinstance(fold(source), ast.Constant)
+
+def test_folds_nested_operands_only():
+    node = fold("x * (4 + 5)")
+    assert ast.unparse(node) == "x * 9"
+
+def test_input_tree_is_unchanged():
+    tree = ast.parse("x = 60 * 60\nif 1 < 2:\n    y = -(3) + z\n")
+    before = ast.dump(tree, include_attributes=True)
+
+    folded = fold_constants(tree)
+    assert ast.unparse(folded) == "x = 3600\nif True:\n    y = -3 + z"
+    assert ast.dump(tree, include_attributes=True) == before
+
+def test_tree_without_constants_is_returned_as_is():
+    tree = ast.parse("x = y + z\n")
+    assert fold_constants(tree) is tree
+
+def test_transpiling_leaves_the_input_tree_unchanged():
+    source = (
+        "@public\n"
+        "class A(MonoBehaviour):\n"
+        "    limit: Final[int] = 60 * 60\n"
+        "    @public\n"
+        "    def Run(self, items: list[int]) -> int:\n"
+        "        total = sum(x * 2 for x in items if x > 1 + 1)\n"
+        "        for i, item in enumerate(items):\n"
+        "            total += item << 2\n"
+        "        return total\n"
+    )
+    tree = ast.parse(source)
+    before = ast.dump(tree, include_attributes=True)
+
+    first = Transpiler().transpile(tree)
+    assert ast.dump(tree, include_attributes=True) == before
+    assert Transpiler().transpile(tree) == first
@@ -0,0 +1,77 @@
+import pytest
+
+from checker import check_source
+from snippets import statements, transpile_method
+from transpiler import TranspilerException
+from util import dotnet_format, string_format
+
+INVARIANT = "System.Globalization.CultureInfo.InvariantCulture"
+
+@pytest.mark.parametrize("spec, expected", [
+    ("", (None, None, None)),
+    (".2f", ("F2", None, None)),
+    (",.1f", ("N1", None, None)),
+    (",", ("N0", None, None)),
+    (".3", ("G3", None, None)),
+    ("x", ("x", None, None)),
+    ("05", ("D5", None, None)),
+    ("08x", ("x8", None, None)),
+    (">6.2f", ("F2", ">", 6)),
+])
+def test_dotnet_format(spec, expected):
+    assert dotnet_format(spec) == expected
+
+@pytest.mark.parametrize("spec", ["^5", "+d", "e", "05.2f", "<05", "%"])
+def test_dotnet_format_rejects_specs_without_equivalent(spec):
+    with pytest.raises(ValueError):
+        dotnet_format(spec)
+
+@pytest.mark.parametrize("spec, expected", [
+    ("", (None, None, None)),
+    (".2", (None, None, 2)),
+    (">8", (">", 8, None)),
+    ("<6.1s", ("<", 6, 1)),
+])
+def test_string_format(spec, expected):
+    assert string_format(spec) == expected
+
+@pytest.mark.parametrize("spec", [".2f", "x", ",", "05"])
+def test_string_format_rejects_numeric_specs(spec):
+    with pytest.raises(ValueError):
+        string_format(spec)
+
+def emitted(line: str):
+    output = transpile_method('s: str = "abc"', line, parameters="n: int, x: float")
+    return statements(output)[-1]
+
+@pytest.mark.parametrize("source, expected", [
+    ('z = f"{s:.2}"', "var z = s.Substring(0, System.Math.Min(2, s.Length));"),
+    ('z = f"{s:>8}"', "var z = s.PadLeft(8);"),
+    ('z = f"{s:6.1}"', "var z = s.Substring(0, System.Math.Min(1, s.Length)).PadRight(6);"),
+    ('z = f"{n:5}"', "var z = n.ToString().PadLeft(5);"),
+    ('z = f"{x:.3f}"', f'var z = x.ToString("F3", {INVARIANT});'),
+    ('z = f"{n:,}"', f'var z = n.ToString("N0", {INVARIANT});'),
+    ('z = f"{x}"', f"var z = x.ToString({INVARIANT});"),
+])
+def test_format_specs(source, expected):
+    assert emitted(source) == expected
+
+def test_numeric_spec_on_a_string_is_rejected():
+    with pytest.raises(TranspilerException, match="doesn't apply to strings"):
+        emitted('z = f"{s:.2f}"')
+
+def test_truncating_an_expression_is_rejected():
+    with pytest.raises(TranspilerException, match="assign the value"):
+        emitted('z = f"{s + s:.2}"')
+
+@pytest.mark.parametrize("source, reported", [
+    ('z = f"{s:.2}"', False),
+    ('z = f"{s:10s}"', False),
+    ('z = f"{n:.2f}"', False),
+    ('z = f"{n:^5}"', True),
+    ('z = f"{s:=5}"', True),
+    # Only string specs apply to a string literal
+    ('z = f"{\'abc\':.2f}"', True),
+])
+def test_checker_format_specs(source, reported):
+    assert bool(check_source(source)) == reported
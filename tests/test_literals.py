@@ -0,0 +1,46 @@
+import pytest
+
+from snippets import statements, transpile_method
+
+HEADER = (
+    "weights: list[float] = [1.0, 2.5]\n"
+    "@public\n"
+    "def Scale(self, factor: float, count: int) -> float:\n"
+    "    return factor\n"
+)
+
+def emitted(line: str):
+    output = transpile_method(line, parameters="n: int, f: float", header=HEADER)
+    return statements(output)[-1]
+
+@pytest.mark.parametrize("source, expected", [
+    ("x: float = 1.5", "float x = 1.5f;"),
+    ("x = 1.5", "var x = 1.5;"),
+    ("w: list[float] = [1.0, 2.0]", "List<float> w = new List<float>(2) { 1.0f, 2.0f };"),
+    ("w: array[float] = [1.0]", "float[] w = new float[] { 1.0f };"),
+    ("w: dict[str, float] = {'a': 1.0}", 'Dictionary<string, float> w = new Dictionary<string, float>(1) { ["a"] = 1.0f };'),
+    ("t: tuple[float, int] = (1.0, 2)", "(float, int) t = (1.0f, 2);"),
+    # Stored as a float, the whole arithmetic stays in float
+    ("x: float = n * 2.0 + 1.0", "float x = n * 2.0f + 1.0f;"),
+    # Next to a float operand, the literal is a float too
+    ("x = f * 0.5", "var x = f * 0.5f;"),
+    ("x = n * 0.5", "var x = n * 0.5;"),
+    ("x = n << 2", "var x = n << 2;"),
+    # Compound assignments don't convert double to float either
+    ("f += 0.5", "f += 0.5f;"),
+    ("f *= n * 2.0", "f *= n * 2.0f;"),
+    ("self.weights[0] -= 1.5", "this.weights[0] -= 1.5f;"),
+    ("n += 1", "n += 1;"),
+    # Arguments take their parameter types
+    ("self.Scale(2.0, 3)", "this.Scale(2.0f, 3);"),
+    ("x = self.Scale(0.5, 1) + 1.0", "var x = this.Scale(0.5f, 1) + 1.0f;"),
+    ("self.weights.Add(3.0)", "this.weights.Add(3.0f);"),
+    ("self.weights.Insert(0, 3.0)", "this.weights.Insert(0, 3.0f);"),
+    ("Debug.Log(1.0)", "Debug.Log(1.0);"),
+])
+def test_float_literals_follow_their_target(source, expected):
+    assert emitted(source) == expected
+
+def test_field_initializers_are_floats():
+    output = transpile_method("pass", header=HEADER)
+    assert "public List<float> weights = new List<float>(2) { 1.0f, 2.5f };" in output
@@ -0,0 +1,37 @@
+import pytest
+
+from snippets import statements, transpile_method
+
+def emitted(line: str):
+    statement, = statements(transpile_method(line, parameters="a: int, b: int, x: float, y: float"))
+    return statement
+
+@pytest.mark.parametrize("source, expected", [
+    ("z = a - (b - 1)", "var z = a - (b - 1);"),
+    ("z = (a - b) - 1", "var z = a - b - 1;"),
+    ("z = a * (b + 1)", "var z = a * (b + 1);"),
+    ("z = a << b + 1", "var z = a << b + 1;"),
+    ("z = (a << b) + 1", "var z = (a << b) + 1;"),
+    # Python compares after &, C# before
+    ("z = a & b == 1", "var z = (a & b) == 1;"),
+    ("z = -(-a)", "var z = -(-a);"),
+])
+def test_parentheses_follow_csharp_grouping(source, expected):
+    assert emitted(source) == expected
+
+@pytest.mark.parametrize("source, expected", [
+    # Floor division rounds down, unlike C# integer division
+    ("z = a // b", "var z = (int)System.Math.Floor((double)a / b);"),
+    ("z = -a // b", "var z = (int)System.Math.Floor((double)-a / b);"),
+    ("z = (a + b) // (b - 1)", "var z = (int)System.Math.Floor((double)(a + b) / (b - 1));"),
+    ("z = x // y", "var z = (float)System.Math.Floor(x / y);"),
+    ("z = a ** 2", "var z = (int)System.Math.Pow(a, 2);"),
+    ("z = x ** y", "var z = (float)System.Math.Pow(x, y);"),
+    # The cast binds tighter than any binary operator, but not member access
+    ("z = 1 + a ** b * 2", "var z = 1 + (int)System.Math.Pow(a, b) * 2;"),
+    ("z = (a // b).ToString()", "var z = ((int)System.Math.Floor((double)a / b)).ToString();"),
+    ("a //= b + 1", "a = (int)System.Math.Floor((double)a / (b + 1));"),
+    ("x **= 2", "x = (float)System.Math.Pow(x, 2);"),
+])
+def test_floor_division_and_powers_use_system_math(source, expected):
+    assert emitted(source) == expected
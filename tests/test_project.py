@@ -0,0 +1,91 @@
+import ast
+
+from api import Builder
+from project import ProjectIndex, changed_symbols, index_module
+
+def uses(source: str):
+    return index_module(ast.parse(source))["uses"]
+
+def test_records_free_names_only():
+    source = (
+        "import UnityEngine\n"
+        "limit = 3\n"
+        "class A(MonoBehaviour):\n"
+        "    def Run(self, body: Body, other: 'Small') -> Vector3:\n"
+        "        Helper = 1\n"
+        "        Debug.Log('Log')\n"
+        "        return [item for item in Items if item > limit + Helper]\n"
+        "    def Other(self) -> None:\n"
+        "        Helper.Do()\n"
+    )
+    assert uses(source) == ["Body", "Debug", "Helper", "Items", "MonoBehaviour", "Small", "UnityEngine", "Vector3"]
+
+def test_locals_sharing_a_class_name_are_not_references():
+    assert uses("def f():\n    Body = 1\n    return Body\n") == []
+
+def test_only_emitted_fields_count_as_changes():
+    old = {"defines": {"A": {"namespace": None, "base": None, "implementations": []}, "B": {"struct": 8}}}
+    new = {"defines": {"A": {"namespace": "Game", "base": "C", "implementations": []}, "B": {"struct": 12}}}
+    assert changed_symbols(old, new) == {"B"}
+    assert changed_symbols(old, None) == {"B"}
+
+def test_readonly_structs_are_indexed():
+    module = index_module(ast.parse("@readonly\n@struct\nclass A:\n    pass\n@struct\nclass B:\n    pass\n"))
+    assert module["defines"]["A"]["readonly"] is True
+    assert "readonly" not in module["defines"]["B"]
+
+    index = ProjectIndex()
+    index.update("a.py", module)
+    assert index.readonly_structs() == {"A"}
+    assert changed_symbols(module, index_module(ast.parse("@struct\nclass A:\n    pass\n"))) == {"A", "B"}
+
+def test_dependents_follow_references():
+    index = ProjectIndex()
+    index.update("a.py", {"defines": {"Body": {"struct": 28}}, "uses": []})
+    index.update("b.py", {"defines": {}, "uses": ["Body"]})
+    index.update("c.py", {"defines": {}, "uses": ["Other"]})
+    assert index.dependents({"Body"}) == ["b.py"]
+
+def write(path, text):
+    path.write_text(text)
+    return path
+
+def test_struct_size_change_rebuilds_users_only(tmp_path):
+    struct = write(tmp_path / "body.py", '@field(float, "mass")\n@public\n@struct\nclass Body:\n    pass\n')
+    user = write(tmp_path / "user.py", "@public\nclass User:\n    @public\n    def Use(self, body: Body) -> float:\n        return body.mass\n")
+    write(tmp_path / "other.py", "@public\nclass Other:\n    @public\n    def Body(self) -> int:\n        Body = 1\n        return Body\n")
+
+    builder = Builder(tmp_path)
+    builder.transpile()
+    assert "in Body" not in user.with_suffix(".cs").read_text()
+
+    # Large enough to be passed by reference now
+    write(struct, '@field(Vector3, "position")\n@field(Vector3, "velocity")\n@public\n@readonly\n@struct\nclass Body:\n    pass\n')
+    results = builder.transpile_changed([struct])
+    rebuilt = sorted(result.source_file.name for result in results if result.status == "transpiled")
+    assert rebuilt == ["body.py", "user.py"]
+    assert "in Body body" in user.with_suffix(".cs").read_text()
+
+def test_readonly_change_rebuilds_users(tmp_path):
+    fields = '@field(Vector3, "position")\n@field(Vector3, "velocity")\n'
+    struct = write(tmp_path / "body.py", f"{fields}@public\n@struct\nclass Body:\n    pass\n")
+    user = write(tmp_path / "user.py", "@public\nclass User:\n    @public\n    def Use(self, body: Body) -> float:\n        return body.mass\n")
+
+    builder = Builder(tmp_path)
+    builder.transpile()
+    assert "in Body" not in user.with_suffix(".cs").read_text()
+
+    write(struct, f"{fields}@public\n@readonly\n@struct\nclass Body:\n    pass\n")
+    builder.transpile_changed([struct])
+    assert "in Body body" in user.with_suffix(".cs").read_text()
+
+def test_unemitted_change_rebuilds_nothing_else(tmp_path):
+    base = write(tmp_path / "base.py", "@public\nclass Base:\n    pass\n")
+    write(tmp_path / "user.py", "@public\nclass User(Base):\n    pass\n")
+
+    builder = Builder(tmp_path)
+    builder.transpile()
+
+    write(base, '@namespace("Game")\n@public\nclass Base:\n    pass\n')
+    results = builder.transpile_changed([base])
+    assert [result.source_file.name for result in results] == ["base.py"]
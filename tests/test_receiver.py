@@ -0,0 +1,28 @@
+from api import transpile_source
+
+def test_method_receiver_is_this():
+    output = transpile_source(
+        "@public\nclass A(MonoBehaviour):\n"
+        "    speed: int = 1\n"
+        "    @public\n"
+        "    def Run(me, n: int) -> int:\n"
+        "        return me.speed + n\n"
+    )
+    assert "public int Run(int n)" in output
+    assert "return this.speed + n;" in output
+
+def test_static_methods_keep_every_parameter():
+    output = transpile_source(
+        "@public\nclass A:\n"
+        "    @public\n    @static\n"
+        "    def Add(a: int, b: int) -> int:\n"
+        "        return a + b\n"
+    )
+    assert "public static int Add(int a, int b)" in output
+    assert "return a + b;" in output
+
+def test_module_functions_keep_every_parameter():
+    output = transpile_source("def f(n: int, s: int) -> int:\n    return n + s\n")
+    assert "int f(int n, int s)" in output
+    assert "return n + s;" in output
+    assert "this" not in output
@@ -0,0 +1,104 @@
+import io
+import json
+
+import build
+import pytest
+
+from server import Server, serve_stdio
+
+@pytest.fixture(autouse=True)
+def cold_modules():
+    # The server turns warm modules on for the whole process
+    yield
+    build.keep_warm(0)
+
+def request_lines(*requests):
+    return io.StringIO("".join(json.dumps(request) + "\n" for request in requests))
+
+def test_debug_output_stays_off_the_protocol_stream(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("x = 1\n")
+
+    server = Server(debug=True)
+    stdout = io.StringIO()
+    serve_stdio(server, request_lines(
+        {"id": 1, "method": "transpile_paths", "paths": [str(source)]},
+        {"id": 2, "method": "shutdown"},
+    ), stdout)
+    server.close()
+
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [1, 2]
+    assert responses[0]["ok"] and responses[0]["files"][0]["status"] == "transpiled"
+
+def test_modules_stay_parsed_between_requests(tmp_path, monkeypatch):
+    source = tmp_path / "a.py"
+    source.write_text("@public\nclass A:\n    x: int = 1\n")
+
+    server = Server()
+    request = {"id": 1, "method": "transpile_paths", "paths": [str(source)]}
+    server.handle(request)
+    output = source.with_suffix(".cs").read_text()
+
+    # A forced rebuild of unchanged content reuses the parsed module
+    parses = []
+    parse = build.ast.parse
+    monkeypatch.setattr(build.ast, "parse", lambda *args: parses.append(args) or parse(*args))
+    builder = server.builder(tmp_path)
+    results = builder.transpile_files([source], changed_symbols=())
+    assert results[0].status == "up-to-date"
+
+    builder.run([source], force=True)
+    assert parses == []
+    assert source.with_suffix(".cs").read_text() == output
+    assert server.stats({})["warm_modules"] >= 1
+    server.close()
+
+def test_one_process_pool_for_every_root(tmp_path):
+    server = Server(jobs=2)
+    first = server.builder(tmp_path / "first")
+    second = server.builder(tmp_path / "second")
+
+    assert first.executor is not None and first.executor is second.executor
+    server.close()
+    assert server.executor is None
+
+def test_single_file_requests_share_the_project_root(tmp_path):
+    from cache import CACHE_FILE
+
+    fields = '@field(Vector3, "position")\n@field(Vector3, "velocity")\n'
+    (tmp_path / "physics").mkdir()
+    (tmp_path / "game").mkdir()
+    struct = tmp_path / "physics" / "body.py"
+    user = tmp_path / "game" / "user.py"
+    struct.write_text(f"{fields}@public\n@struct\nclass Body:\n    pass\n")
+    user.write_text("@public\nclass User:\n    @public\n    def Use(self, body: Body) -> float:\n        return body.mass\n")
+
+    server = Server(root=tmp_path)
+    for path in (struct, user):
+        assert server.handle({"id": 1, "method": "transpile_paths", "paths": [str(path)]})["ok"]
+
+    # Saving the struct rebuilds its user in the other directory
+    struct.write_text(f"{fields}@public\n@readonly\n@struct\nclass Body:\n    pass\n")
+    response = server.handle({"id": 2, "method": "transpile_paths", "paths": [str(struct)]})
+    assert sorted(file["source"] for file in response["files"]) == [str(user), str(struct)]
+    assert "in Body body" in user.with_suffix(".cs").read_text()
+
+    assert server.stats({})["roots"] == [str(tmp_path.resolve())]
+    assert sorted(path.parent.name for path in tmp_path.rglob(CACHE_FILE)) == [tmp_path.name]
+
+def test_paths_outside_the_project_root_are_rejected(tmp_path):
+    server = Server(root=tmp_path / "project")
+    response = server.handle({"id": 1, "method": "transpile_paths", "paths": [str(tmp_path / "a.py")]})
+    assert not response["ok"] and "outside the project root" in response["error"]
+
+def test_known_root_is_reused_without_a_project_root(tmp_path):
+    (tmp_path / "sub").mkdir()
+    first, second = tmp_path / "a.py", tmp_path / "sub" / "b.py"
+    first.write_text("x = 1\n")
+    second.write_text("y = 2\n")
+
+    server = Server()
+    server.handle({"id": 1, "method": "transpile_paths", "paths": [str(first), str(second)]})
+    server.handle({"id": 2, "method": "transpile_paths", "paths": [str(second)]})
+    assert server.stats({})["roots"] == [str(tmp_path.resolve())]
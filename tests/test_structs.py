@@ -0,0 +1,57 @@
+import ast
+
+import pytest
+
+from metadata import analyze_class
+from checker import class_violations
+from transpiler import Transpiler
+
+LARGE = '@field(Vector3, "position")\n@field(Vector3, "velocity")\n'
+SMALL = '@field(float, "mass")\n'
+
+def transpile_user(struct: str, *body: str, signature: str = "def Use(self, body: Body) -> float:"):
+    source = (
+        f"{struct}@public\n@struct\nclass Body:\n    pass\n"
+        "@public\nclass User:\n"
+        f"    @public\n    {signature}\n"
+        + "".join(f"        {line}\n" for line in body or ("return body.position.x",))
+    )
+    return Transpiler().transpile(ast.parse(source))
+
+def test_large_readonly_struct_is_passed_in():
+    output = transpile_user(f"{LARGE}@readonly\n")
+    assert "public float Use(in Body body)" in output
+
+@pytest.mark.parametrize("struct", [LARGE, f"{SMALL}@readonly\n"])
+def test_other_structs_are_copied(struct):
+    assert "public float Use(Body body)" in transpile_user(struct)
+
+def test_assigned_parameters_are_copied():
+    output = transpile_user(f"{LARGE}@readonly\n", "body = new(Body())", "return body.position.x")
+    assert "public float Use(Body body)" in output
+
+def test_overrides_keep_the_signature():
+    output = transpile_user(f"{LARGE}@readonly\n", signature="@override\n    def Use(self, body: Body) -> float:")
+    assert "(Body body)" in output
+
+def test_readonly_struct_fields_are_readonly():
+    output = transpile_user(f"{SMALL}@readonly\n")
+    assert "public readonly struct Body" in output
+    assert "internal readonly float mass;" in output
+
+def describe(source: str):
+    return analyze_class(ast.parse(source).body[0])
+
+@pytest.mark.parametrize("source, message", [
+    ("@readonly\nclass A:\n    pass\n", "@readonly only applies to structs, A is a class"),
+    ("@struct\nclass A(B):\n    pass\n", "struct A can't inherit from B, implement interfaces with @implements"),
+    ("@struct\nclass A:\n    x: int = 1\n", "instance fields of struct A can't have initializers"),
+    ("@struct\nclass A:\n    def __init__(self):\n        pass\n", "struct A can't declare a parameterless constructor"),
+    ("@struct\nclass A:\n    @protected\n    def Run(self) -> None:\n        pass\n", "struct A can't have protected members"),
+])
+def test_struct_rules(source, message):
+    assert list(class_violations(describe(source))) == [message]
+
+def test_valid_struct_has_no_violations():
+    source = "@readonly\n@struct\nclass A:\n    def __init__(self, x: int):\n        pass\n"
+    assert list(class_violations(describe(source))) == []
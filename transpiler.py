@@ -2,53 +2,622 @@ import ast
 import logging
 import csast
 
+from checker import class_violations
+from contextlib import contextmanager
+from cstypes import BOOL, CONST_TYPES, DOUBLE, FLOAT, INT, LARGE_STRUCT_SIZE, LITERAL_COLLECTIONS, NUMERIC_TYPES, STRING, TUPLE, CsType, common_type, literal_type, type_from_annotation, unwrap_final
 from cswriter import CSWriter
-from util import cs_constant_repr, find_keyword, flatten, indented, namespacable, statement
+from folding import fold_constants
+from metadata import analyze_class, analyze_function, definition_errors, field_def_type, is_named_call, struct_sizes
+from precedence import BINOP_PRECEDENCE, BOOLOP_PRECEDENCE, MULTIPLICATIVE, PRIMARY, RELATIONAL, UNARY, expression_precedence, needs_parentheses
+from symbols import SymbolTable
+from util import cs_constant_repr, dotnet_format, find_keyword, string_format, indented, namespacable, statement
+
+TRANSPILER_VERSION = "0.1.0"
 
 
 class Transpiler(ast.NodeVisitor):
-    def __init__(self):
-        self.cswriter = CSWriter()
+    def __init__(self, sink=None, structs: dict[str, int] | None = None, metadata: dict | None = None, readonly_structs=None):
+        self.cswriter = CSWriter(sink)
         self.nodes = []
-        self.variable_scopes = []
+        self.symbols = SymbolTable()
+        # Decorator metadata by definition node, may be shared by every
+        # transpile of the same (folded) tree
+        self.metadata = {} if metadata is None else metadata
+        self.receiver = None
+        self.class_info = None
+        self.function = None
+        # Comprehensions and fused calls already emitted as loops, mapped to
+        # the temporary holding their result
+        self.lowered = {}
+        self.temporaries = 0
+        # Strings appended to in the current loops, mapped to their StringBuilder
+        self.builders = {}
+        # Sizes of the structs known from other modules, and this one once visited
+        self.structs = dict(structs or {})
+        self.readonly_structs = set(readonly_structs or ())
     
     def transpile(self, tree):
         try:
-            self.traverse(tree)
+            self.traverse(fold_constants(tree))
         except TranspilerException as exc:
             exc.cs_line = self.cswriter.count_lines()
-            exc.py_line = self.nodes[-1].lineno
+            exc.py_line = self.current_line()
             raise exc
         except Exception as exc:
             new_exc = TranspilerException("encountered an exception")
             new_exc.cs_line = self.cswriter.count_lines()
-            new_exc.py_line = self.nodes[-1].lineno
+            new_exc.py_line = self.current_line()
             raise new_exc from exc
         
         return self.cswriter.build()
 
     # Utility functions
 
+    def current_line(self):
+        # Nodes without a position, e.g. the module, have no line to report
+        for node in reversed(self.nodes):
+            lineno = getattr(node, "lineno", None)
+            if lineno is not None:
+                return lineno
+
+        return None
+
     def is_variable_defined(self, name: str):
-        return name in flatten(self.variable_scopes)
+        return self.symbols.is_defined(name)
 
-    def define_variable(self, name: str):
+    def define_variable(self, name: str, type=None):
         if self.is_variable_defined(name):
             raise TranspilerException("variable has already been defined")
 
-        self.variable_scopes[-1].append(name)
+        self.symbols.define(name, type)
+
+    @contextmanager
+    def block(self):
+        # C# block which also introduces a new variable scope
+        with self.cswriter.block(), self.symbols.scope():
+            yield
+
+    def describe(self, node: ast.ClassDef | ast.FunctionDef):
+        # Decorator metadata, analyzed once per definition and shared by
+        # every part of emission that needs it
+        info = self.metadata.get(node)
+        if info is not None:
+            return info
+
+        definitions = [node]
+        if isinstance(node, ast.ClassDef):
+            # Methods are analyzed with their class
+            definitions += [child for child in node.body if isinstance(child, ast.FunctionDef)]
+
+        for definition in definitions:
+            for _, message in definition_errors(definition):
+                raise TranspilerException(message)
+
+        if isinstance(node, ast.ClassDef):
+            info = analyze_class(node)
+            for method in info.methods:
+                self.metadata[method.node] = method
+        else:
+            info = analyze_function(node)
+
+        self.metadata[node] = info
+        return info
+
+    def infer_type(self, node: ast.expr) -> CsType | None:
+        # Static type of an expression, as far as annotations and literals tell
+        temporary = self.lowered.get(node)
+        if temporary:
+            return self.symbols.lookup(temporary)
+
+        match node:
+            case ast.Constant(value=value):
+                return literal_type(value)
+            case ast.Name(id=name):
+                return self.symbols.lookup(name)
+            case ast.Attribute(value=ast.Name(id=name), attr=attr) if name == self.receiver and self.class_info:
+                return self.class_info.field_type(attr)
+            case ast.Attribute(value=value, attr="Key" | "Value" as attr):
+                pair = self.infer_type(value)
+                if pair and pair.name == "KeyValuePair":
+                    return pair.args[0 if attr == "Key" else 1]
+                return None
+            case ast.Call(func=ast.Name(id="len")):
+                return INT
+            case ast.JoinedStr():
+                return STRING
+            case ast.List(elts=elts):
+                element = common_type(self.infer_type(elt) for elt in elts)
+                return element and CsType("List", (element,))
+            case ast.Set(elts=elts):
+                element = common_type(self.infer_type(elt) for elt in elts)
+                return element and CsType("HashSet", (element,))
+            case ast.Dict(keys=keys, values=values):
+                key = common_type(self.infer_type(key) for key in keys)
+                value = common_type(self.infer_type(value) for value in values)
+                return key and value and CsType("Dictionary", (key, value))
+            case ast.Tuple(elts=elts):
+                elements = [self.infer_type(elt) for elt in elts]
+                return None if None in elements else CsType(TUPLE, tuple(elements))
+            case ast.ListComp() | ast.GeneratorExp() | ast.SetComp():
+                element, = self.comprehension_types(node, node.elt)
+                return element and CsType("HashSet" if isinstance(node, ast.SetComp) else "List", (element,))
+            case ast.DictComp():
+                key, value = self.comprehension_types(node, node.key, node.value)
+                return key and value and CsType("Dictionary", (key, value))
+            case ast.Subscript(value=value, slice=slice):
+                container = self.infer_type(value)
+                if container and container.is_tuple:
+                    index = tuple_index(slice, container)
+                    return None if index is None else container.args[index]
+
+                return container and container.element
+            case ast.Call(func=ast.Name(id="new"), args=[ast.Call(func=ast.Name(id=name))]):
+                return CsType(name)
+            case ast.Call(func=ast.Attribute(value=ast.Name(id=name), attr=attr)) if name == self.receiver and self.class_info:
+                return self.class_info.method_returns(attr)
+            case ast.Call(func=ast.Name(id="cast"), args=[_, annotation]):
+                return type_from_annotation(annotation)
+            case ast.Compare() | ast.BoolOp() | ast.UnaryOp(op=ast.Not()):
+                return BOOL
+            case ast.UnaryOp(operand=operand):
+                return self.infer_type(operand)
+            case ast.BinOp(left=left, right=right):
+                types = [self.infer_type(left), self.infer_type(right)]
+                if FLOAT in types and (is_float_literal(left) or is_float_literal(right)):
+                    # Written as a float literal, see write_binop
+                    return FLOAT
+                return common_type(types)
 
-    def define_variable_parent(self, name: str):
-        if self.is_variable_defined(name):
-            raise TranspilerException("variable has already been defined")
+        return None
+
+    def write_type(self, annotation: ast.expr):
+        cs_type = type_from_annotation(annotation)
+        if cs_type is None:
+            self.traverse(annotation)
+        else:
+            self.cswriter.write(str(cs_type))
+
+    def traverse_value(self, node: ast.expr, cs_type: CsType | None):
+        # Collection literals take their type from where they're stored
+        if isinstance(node, (ast.List, ast.Set, ast.Dict)):
+            self.write_collection(node, cs_type)
+        elif isinstance(node, ast.Tuple):
+            self.write_tuple(node, cs_type)
+        elif is_empty_constructor(node) and cs_type and cs_type.element:
+            # list(), set() and dict()
+            self.write_collection(EMPTY_LITERALS[node.func.id](), cs_type)
+        elif cs_type == FLOAT and is_float_literal(node):
+            # Float literals are double in C#, which doesn't convert implicitly
+            self.cswriter.write(f"{cs_constant_repr(node.value)}f")
+        elif cs_type == FLOAT and isinstance(node, ast.BinOp):
+            self.write_binop(node, cs_type)
+        else:
+            self.traverse(node)
+
+    def write_collection(self, node: ast.List | ast.Set | ast.Dict, cs_type: CsType | None):
+        if cs_type is None or cs_type.name not in LITERAL_COLLECTIONS[type(node)]:
+            cs_type = self.infer_type(node)
+
+        if cs_type is None:
+            example = {ast.List: "list[int]", ast.Set: "set[int]", ast.Dict: "dict[str, int]"}[type(node)]
+            raise TranspilerException(
+                f"can't infer the element type of this {type(node).__name__.lower()} literal, "
+                f"annotate where it's stored, e.g. `values: {example} = ...`"
+            )
+
+        if isinstance(node, ast.Dict):
+            if None in node.keys:
+                raise TranspilerException("dict unpacking is not supported")
+            length = len(node.keys)
+        else:
+            length = len(node.elts)
+
+        if not length:
+            if cs_type.is_array:
+                # Shared empty instance, nothing to allocate
+                self.cswriter.write(f"System.Array.Empty<{cs_type.element}>()")
+            else:
+                self.cswriter.write(f"new {cs_type}()")
+            return
+
+        if cs_type.is_array:
+            self.cswriter.write(f"new {cs_type} ")
+        else:
+            # Pre-sized, filling the initializer never grows the collection
+            self.cswriter.write(f"new {cs_type}({length}) ")
+
+        with self.cswriter.delimit("{ ", " }"):
+            if isinstance(node, ast.Dict):
+                key_type, value_type = cs_type.args
+                for key, value in self.cswriter.enumerate_join(zip(node.keys, node.values), ", "):
+                    with self.cswriter.delimit("[", "]"):
+                        self.traverse_value(key, key_type)
+                    self.cswriter.write(" = ")
+                    self.traverse_value(value, value_type)
+            else:
+                for element in self.cswriter.enumerate_join(node.elts, ", "):
+                    self.traverse_value(element, cs_type.element)
+
+    def write_tuple(self, node: ast.Tuple, cs_type: CsType | None):
+        # C# tuple literals are ValueTuples, stored inline without allocating
+        if any(isinstance(element, ast.Starred) for element in node.elts):
+            raise TranspilerException("starred expressions in tuples are not supported")
+
+        if cs_type is None or not cs_type.is_tuple or len(cs_type.args) != len(node.elts):
+            element_types = [None] * len(node.elts)
+        else:
+            element_types = cs_type.args
+
+        match len(node.elts):
+            case 0:
+                raise TranspilerException("empty tuples are not supported")
+            case 1:
+                # No literal syntax for a single element
+                self.cswriter.write("System.ValueTuple.Create")
+
+        with self.cswriter.delimit("(", ")"):
+            for element, element_type in self.cswriter.enumerate_join(zip(node.elts, element_types), ", "):
+                self.traverse_value(element, element_type)
+
+    def define_targets(self, target: ast.expr, cs_type: CsType | None):
+        # Defines the names a (possibly nested) tuple target introduces
+        if isinstance(target, ast.Name):
+            self.define_variable(target.id, cs_type)
+            return
+
+        if cs_type is None or not cs_type.is_tuple or len(cs_type.args) != len(target.elts):
+            element_types = [None] * len(target.elts)
+        else:
+            element_types = cs_type.args
+
+        for element, element_type in zip(target.elts, element_types):
+            if not isinstance(element, (ast.Name, ast.Tuple, ast.List)):
+                raise TranspilerException(f"forbidden target in tuple unpacking: {ast.unparse(element)}")
+
+            self.define_targets(element, element_type)
 
-        self.variable_scopes[-2].append(name)
+    def write_deconstruction(self, target: ast.Tuple | ast.List, value: ast.expr):
+        # `a, b = f()` declares with `var (a, b) = f()`, swaps and other
+        # unpacking into existing targets use `(a, b) = (b, a)`
+        targets = list(iter_targets(target))
+        new_names = [node.id for node in targets if isinstance(node, ast.Name) and not self.is_variable_defined(node.id)]
+
+        if new_names:
+            if len(new_names) != len(targets):
+                raise TranspilerException(
+                    f"tuple unpacking mixes new and existing targets, declare {', '.join(new_names)} first"
+                )
+
+            self.define_targets(target, self.infer_type(value))
+            self.cswriter.write("var ")
+
+        self.write_targets(target)
+
+    def write_targets(self, target: ast.expr):
+        if isinstance(target, (ast.Tuple, ast.List)):
+            with self.cswriter.delimit("(", ")"):
+                for element in self.cswriter.enumerate_join(target.elts, ", "):
+                    self.write_targets(element)
+        elif isinstance(target, ast.Starred):
+            raise TranspilerException("starred unpacking targets are not supported")
+        else:
+            self.traverse(target)
+
+    def iteration_type(self, node: ast.expr):
+        # Type of the elements a for loop over `node` yields
+        match node:
+            case ast.Call(func=ast.Name(id="range")):
+                return INT
+            case ast.Call(func=ast.Name(id="enumerate"), args=[iterable, *_]):
+                element = self.iteration_type(iterable)
+                return element and CsType(TUPLE, (INT, element))
+            case ast.Call(func=ast.Name(id="zip"), args=iterables):
+                elements = [self.iteration_type(iterable) for iterable in iterables]
+                return None if None in elements else CsType(TUPLE, tuple(elements))
+            case ast.Call(func=ast.Attribute(value=value, attr="items" | "keys" | "values" as method), args=[]):
+                dictionary = self.infer_type(value)
+                if dictionary is None or dictionary.name != "Dictionary":
+                    return None
+                elif method == "items":
+                    return CsType(TUPLE, dictionary.args)
+
+                return dictionary.args[0 if method == "keys" else 1]
+
+        iterable = self.infer_type(node)
+        if iterable and iterable.name == "Dictionary":
+            # Python iterates the keys
+            return iterable.args[0]
+
+        return iterable and iterable.element
+
+    # Comprehensions become plain loops filling a pre-sized collection, and
+    # sum/any/all/min/max over one are fused into the loop, so neither LINQ
+    # nor iterator objects are allocated
+
+    def lower_comprehensions(self, node: ast.stmt):
+        fields = LOWERED_FIELDS.get(type(node))
+        if fields is None:
+            return
+
+        # Calls Python evaluates before a comprehension are hoisted with it,
+        # in order, so their side effects still happen first
+        evaluated = []
+        for field in fields:
+            for candidate in self.find_lowerable(getattr(node, field), evaluated):
+                for call in evaluated:
+                    if isinstance(call, ast.Call):
+                        self.lower_call(call)
+                    else:
+                        raise TranspilerException(
+                            "calls in conditional branches evaluated before a comprehension can't be kept in order, "
+                            "assign the comprehension to a variable first"
+                        )
+
+                evaluated.clear()
+                self.lower(candidate, self.expected_type(node, candidate))
+
+    def find_lowerable(self, node, evaluated: list):
+        # Outermost comprehensions that are always evaluated, ones in lambdas
+        # or conditional branches can't be hoisted in front of the statement.
+        # Calls are collected in `evaluated` once their arguments are
+        if isinstance(node, list):
+            for item in node:
+                yield from self.find_lowerable(item, evaluated)
+        elif isinstance(node, COMPREHENSIONS) or self.is_fused_call(node):
+            yield node
+        elif isinstance(node, ast.BoolOp):
+            yield from self.find_lowerable(node.values[0], evaluated)
+            if any(has_calls(value) for value in node.values[1:]):
+                evaluated.append(node)
+        elif isinstance(node, ast.IfExp):
+            yield from self.find_lowerable(node.test, evaluated)
+            if has_calls(node.body) or has_calls(node.orelse):
+                evaluated.append(node)
+        elif isinstance(node, ast.AST) and not isinstance(node, ast.Lambda):
+            start = len(evaluated)
+            for child in ast.iter_child_nodes(node):
+                yield from self.find_lowerable(child, evaluated)
+
+            if isinstance(node, ast.Call) and not (is_named_call(node, "len") or is_named_call(node, "cast")):
+                # Its arguments are evaluated by the call itself
+                del evaluated[start:]
+                evaluated.append(node)
+
+    def lower_call(self, node: ast.Call):
+        name = self.temporary("value", self.infer_type(node))
+        self.cswriter.write_indented(f"var {name} = ")
+        self.traverse(node)
+        self.cswriter.write(";")
+        self.lowered[node] = name
+
+    def is_fused_call(self, node: ast.expr):
+        return (
+            isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUSED_CALLS
+            and 1 <= len(node.args) <= (2 if node.func.id == "sum" else 1)
+            and isinstance(node.args[0], (ast.ListComp, ast.GeneratorExp))
+            and not self.is_variable_defined(node.func.id)
+        )
+
+    def expected_type(self, statement: ast.stmt, node: ast.expr):
+        # The collection type a comprehension is stored as, if it's the whole value
+        if node is not getattr(statement, "value", None):
+            return None
+
+        match statement:
+            case ast.AnnAssign(annotation=annotation):
+                return type_from_annotation(annotation)
+            case ast.Assign(targets=[target]):
+                return self.infer_type(target)
+            case ast.Return():
+                return self.function and self.function.returns
+
+        return None
+
+    def temporary_name(self, kind: str):
+        name = f"__{kind}{self.temporaries}"
+        self.temporaries += 1
+        return name
+
+    def temporary(self, kind: str, cs_type: CsType | None):
+        name = self.temporary_name(kind)
+        self.define_variable(name, cs_type)
+        return name
+
+    def comprehension_types(self, node, *expressions: ast.expr):
+        # Types of expressions evaluated inside the comprehension's loops
+        with self.symbols.scope():
+            for generator in node.generators:
+                self.define_targets(generator.target, self.iteration_type(generator.iter))
+
+            return [self.infer_type(expression) for expression in expressions]
+
+    def lower(self, node: ast.expr, expected: CsType | None):
+        if isinstance(node, ast.Call):
+            self.lower_fused_call(node)
+        elif isinstance(node, ast.DictComp):
+            self.lower_dict(node, expected)
+        else:
+            self.lower_collection(node, expected)
+
+    def lower_collection(self, node: ast.ListComp | ast.SetComp | ast.GeneratorExp, expected: CsType | None):
+        # Generator expressions that aren't consumed by a fused call are
+        # materialized as lists
+        kind = "HashSet" if isinstance(node, ast.SetComp) else "List"
+
+        if expected and expected.name == kind:
+            cs_type = expected
+        else:
+            element, = self.comprehension_types(node, node.elt)
+            if element is None:
+                raise TranspilerException(
+                    "can't infer the element type of this comprehension, "
+                    f"annotate where it's stored, e.g. `values: {'set' if kind == 'HashSet' else 'list'}[int] = ...`"
+                )
+            cs_type = CsType(kind, (element,))
+
+        name = self.temporary(kind.lower(), cs_type)
+        self.write_declaration(name, cs_type, self.capacity(node))
+
+        add = ast.Expr(value=ast.Call(func=ast.Attribute(value=ast.Name(id=name), attr="Add"), args=[node.elt], keywords=[]))
+        self.traverse(comprehension_loop(node, [add]))
+        self.lowered[node] = name
+
+    def lower_dict(self, node: ast.DictComp, expected: CsType | None):
+        if expected and expected.name == "Dictionary":
+            cs_type = expected
+        else:
+            key, value = self.comprehension_types(node, node.key, node.value)
+            if key is None or value is None:
+                raise TranspilerException(
+                    "can't infer the key or value type of this dict comprehension, "
+                    "annotate where it's stored, e.g. `values: dict[str, int] = ...`"
+                )
+            cs_type = CsType("Dictionary", (key, value))
+
+        name = self.temporary("dict", cs_type)
+        self.write_declaration(name, cs_type, self.capacity(node))
+
+        store = ast.Assign(targets=[ast.Subscript(value=ast.Name(id=name), slice=node.key)], value=node.value)
+        self.traverse(comprehension_loop(node, [store]))
+        self.lowered[node] = name
+
+    def write_declaration(self, name: str, cs_type: CsType, capacity: ast.expr | None):
+        self.cswriter.write_indented(f"var {name} = new {cs_type}(")
+        if capacity is not None:
+            self.traverse(capacity)
+        self.cswriter.write(");")
+
+    def capacity(self, node):
+        # Upper bound of the result's length when it's cheap to tell, the
+        # iterable is evaluated again for it so it has to be side effect free
+        if len(node.generators) != 1:
+            return None
+
+        iterable = node.generators[0].iter
+        match iterable:
+            case ast.Call(func=ast.Name(id="range"), args=[ast.Constant(value=int(count))]) if count >= 0:
+                return ast.Constant(value=count)
+
+        if not is_pure(iterable):
+            return None
+
+        cs_type = self.infer_type(iterable)
+        if cs_type is None:
+            return None
+        elif cs_type.is_array:
+            return ast.Attribute(value=iterable, attr="Length")
+        elif cs_type.name in ("List", "HashSet", "Dictionary"):
+            return ast.Attribute(value=iterable, attr="Count")
+
+        return None
+
+    def lower_fused_call(self, node: ast.Call):
+        function = node.func.id
+        comprehension = node.args[0]
+        element, = self.comprehension_types(comprehension, comprehension.elt)
+        result = ast.Name(id="")
+        decided = None
+
+        match function:
+            case "any" | "all":
+                # Stops at the first element deciding the result
+                result.id = self.temporary(function, BOOL)
+                self.cswriter.write_indented(f"var {result.id} = {'false' if function == 'any' else 'true'};")
+                test = comprehension.elt if function == "any" else ast.UnaryOp(op=ast.Not(), operand=comprehension.elt)
+                body = [ast.If(
+                    test=test,
+                    body=[ast.Assign(targets=[result], value=ast.Constant(value=function == "any")), ast.Break()],
+                    orelse=[]
+                )]
+                # Nested loops stop once the result is decided
+                decided = result if function == "any" else ast.UnaryOp(op=ast.Not(), operand=result)
+                after = []
+            case "sum":
+                if element is None:
+                    raise TranspilerException("can't infer the type of the summed values, annotate the iterated collection")
+
+                result.id = self.temporary(function, element)
+                self.cswriter.write_indented(f"{element} {result.id} = ")
+                if len(node.args) > 1:
+                    self.traverse(node.args[1])
+                else:
+                    self.cswriter.write("0")
+                self.cswriter.write(";")
+                body = [ast.AugAssign(target=result, op=ast.Add(), value=comprehension.elt)]
+                after = []
+            case "min" | "max":
+                if element is None:
+                    raise TranspilerException(f"can't infer the type of the values passed to {function}, annotate the iterated collection")
+
+                default = find_keyword(node.keywords, "default")
+                result.id = self.temporary(function, element)
+                empty = ast.Name(id=self.temporary("empty", BOOL))
+                # Declared by its assignment inside the loop
+                value = ast.Name(id=self.temporary_name("value"))
+
+                self.cswriter.write_indented(f"{element} {result.id} = ")
+                if default:
+                    self.traverse(default.value)
+                else:
+                    self.cswriter.write(f"default({element})")
+                self.cswriter.write(";")
+                self.cswriter.write_indented(f"var {empty.id} = true;")
+
+                # The element is evaluated once, then compared
+                better = ast.Compare(left=value, ops=[ast.Lt() if function == "min" else ast.Gt()], comparators=[result])
+                body = [
+                    ast.Assign(targets=[value], value=comprehension.elt),
+                    ast.If(
+                        test=ast.BoolOp(op=ast.Or(), values=[empty, better]),
+                        body=[ast.Assign(targets=[result], value=value), ast.Assign(targets=[empty], value=ast.Constant(value=False))],
+                        orelse=[]
+                    ),
+                ]
+
+                # Like Python, an empty sequence without default is an error
+                after = [] if default else [ast.If(
+                    test=empty,
+                    body=[ast.Raise(exc=ast.Call(
+                        func=ast.Name(id="new"),
+                        args=[ast.Call(
+                            func=ast.Name(id="System.InvalidOperationException"),
+                            args=[ast.Constant(value=f"{function}() arg is an empty sequence")],
+                            keywords=[]
+                        )],
+                        keywords=[]
+                    ))],
+                    orelse=[]
+                )]
+
+        self.traverse(comprehension_loop(comprehension, body, decided))
+        for statement_node in after:
+            self.traverse(ast.fix_missing_locations(ast.copy_location(statement_node, node)))
+
+        self.lowered[node] = result.id
 
     def dump_current_info(self):
-        return f"CS line: {self.cswriter.count_lines()} / Py line: {self.nodes[-1].lineno}"
+        return f"CS line: {self.cswriter.count_lines()} / Py line: {self.current_line()}"
 
     # Visitors
 
+    def visit_Module(self, node: ast.Module):
+        # Structs may be used before they're defined
+        classes = []
+        for item in node.body:
+            if isinstance(item, ast.ClassDef):
+                # Current while analyzed, so errors point at the class
+                self.nodes.append(item)
+                classes.append(self.describe(item))
+                self.nodes.pop()
+
+        self.structs.update(struct_sizes(classes, self.structs))
+        self.readonly_structs.update(info.name for info in classes if info.struct and info.readonly)
+
+        # Top-level declarations are complete once visited, hand them to the sink
+        for item in node.body:
+            self.traverse(item)
+            self.cswriter.flush()
+
     @statement
     def visit_Import(self, node: ast.Import):
         self.cswriter.write(f"using {node.names[0].name}")
@@ -56,90 +625,147 @@ class Transpiler(ast.NodeVisitor):
     @namespacable
     @indented
     def visit_ClassDef(self, node: ast.ClassDef):
-        access_modifier = get_access_modifier(node.decorator_list)
-        funcs, fields = destructure_class(node)
-        static = is_static(node.decorator_list)
-        name = node.name
-        inheritance = get_class_inheritance(node)
-        attributes = get_attributes(node.decorator_list)
-
-        for attribute in attributes:
+        info = self.describe(node)
+
+        for attribute in info.attributes:
             self.cswriter.write_indents()
             with self.cswriter.delimit("[", "]"):
                 self.traverse(attribute.args[0])
         
-        self.cswriter.write_indented(f"{access_modifier}")
-        if static:
+        self.check_class(info)
+
+        self.cswriter.write_indented(f"{info.access_modifier}")
+        if info.static:
             self.cswriter.write(f" static")
 
-        self.cswriter.write(f" class {name}")
+        if info.struct:
+            self.cswriter.write(f"{' readonly' if info.readonly else ''} struct {info.name}")
+        else:
+            self.cswriter.write(f" class {info.name}")
 
+        inheritance = info.inheritance
         if len(inheritance) > 0:
             self.cswriter.write(f" : {', '.join(inheritance)}")
 
-        with self.cswriter.block():
-            self.traverse(fields)
-            self.traverse(funcs)
+        outer_class, self.class_info = self.class_info, info
+        with self.block():
+            self.traverse(info.fields)
+            for method in info.methods:
+                self.traverse(method.node)
+        self.class_info = outer_class
+
+    def check_class(self, info):
+        for message in class_violations(info):
+            raise TranspilerException(message)
+
+    def by_reference_parameters(self, info):
+        # Large readonly structs are passed as `in` instead of copied, unless
+        # the function assigns to them or has to match an overridden
+        # signature. Calling a method on any other struct through `in` would
+        # copy it defensively first
+        if info.overrides:
+            return set()
+
+        names = set()
+        for arg in info.parameters:
+            name = str(type_from_annotation(arg.annotation))
+            if name in self.readonly_structs and self.structs.get(name, 0) > LARGE_STRUCT_SIZE:
+                names.add(arg.arg)
+
+        if not names:
+            return names
+
+        # `in` parameters are read-only, including their fields and elements
+        for node in ast.walk(info.node):
+            if not isinstance(getattr(node, "ctx", None), (ast.Store, ast.Del)):
+                continue
+
+            target = node
+            while isinstance(target, (ast.Attribute, ast.Subscript)):
+                target = target.value
+            if isinstance(target, ast.Name):
+                names.discard(target.id)
+
+        return names
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
-        access_modifier = get_access_modifier(node.decorator_list)
-        static = is_static(node.decorator_list)
-        overrides = does_method_override(node.decorator_list)
-        name = node.name
-        return_type = get_function_return_type(node)
-        attributes = get_attributes(node.decorator_list)
-
-        for attribute in attributes:
+        info = self.describe(node)
+
+        for attribute in info.attributes:
             self.cswriter.write_indents()
             with self.cswriter.delimit("[", "]"):
                 self.traverse(attribute.args[0])
 
-        self.cswriter.write_indented(f"{access_modifier}")
-        if static:
+        self.cswriter.write_indented(f"{info.access_modifier}")
+        if info.static:
             self.cswriter.write(f" static")
-        else:
-            if overrides:
-                self.cswriter.write(f" override")
-            node.body = replace_all_references(node.body, "self", "this")
+        elif info.overrides:
+            self.cswriter.write(f" override")
 
-        self.cswriter.write(f" {return_type} {name}")
-        with self.cswriter.delimit_args():
-            for arg in self.cswriter.enumerate_join(node.args.args[0 if static else 1:], ", "):
-                self.traverse(arg)
+        if info.constructor and self.class_info:
+            self.cswriter.write(f" {self.class_info.name}")
+        else:
+            self.cswriter.write(f" {info.return_type} {info.name}")
+
+        # Parameters live in the function scope, around the body block.
+        # References to the receiver are emitted as `this` by visit_Name,
+        # functions nested in a method still see the method's
+        by_reference = self.by_reference_parameters(info)
+        outer_receiver, self.receiver = self.receiver, info.receiver or self.receiver
+        outer_function, self.function = self.function, info
+        with self.symbols.scope():
+            with self.cswriter.delimit_args():
+                for arg in self.cswriter.enumerate_join(info.parameters, ", "):
+                    if arg.arg in by_reference:
+                        self.cswriter.write("in ")
+                    self.traverse(arg)
 
-        with self.cswriter.block():
-            self.traverse(node.body)
+            with self.block():
+                self.traverse(node.body)
+        self.receiver = outer_receiver
+        self.function = outer_function
 
     @statement
     def visit_Assign(self, node: ast.Assign):        
-        if isinstance(node.value, ast.Tuple):
-            raise TranspilerException("assignment value can't be a tuple")
-
         target = node.targets[0]
 
-        if isinstance(target, ast.Attribute) or isinstance(target, ast.Subscript):
-            pass
+        if isinstance(target, ast.Tuple) or isinstance(target, ast.List):
+            self.write_deconstruction(target, node.value)
+            self.cswriter.write(" = ")
+            self.traverse_value(node.value, self.infer_type(target))
+            return
+        elif isinstance(target, ast.Attribute) or isinstance(target, ast.Subscript):
+            target_type = self.infer_type(target)
         elif isinstance(target, ast.Name):
-            if not self.is_variable_defined(target.id):
+            if self.is_variable_defined(target.id):
+                target_type = self.symbols.lookup(target.id)
+            else:
+                target_type = self.infer_type(node.value)
                 self.cswriter.write("var ")
-                self.define_variable_parent(target.id)
+                self.define_variable(target.id, target_type)
         else:
             raise TranspilerException(f"forbidden assignment target: {target}")
 
         self.traverse(node.targets[0])
         self.cswriter.write(" = ")
-        self.traverse(node.value)
+        self.traverse_value(node.value, target_type)
 
     def visit_arg(self, node: ast.arg):
-        self.traverse(node.annotation)
+        self.define_variable(node.arg, type_from_annotation(node.annotation))
+        self.write_type(node.annotation)
         self.cswriter.write(" ")
         self.cswriter.write(node.arg)
 
     def visit_Attribute(self, node: ast.Attribute):
-        self.traverse(node.value)
+        self.traverse_operand(node.value, PRIMARY)
         self.cswriter.write(f".{node.attr}")
 
     def visit_Call(self, node: ast.Call):
+        temporary = self.lowered.get(node)
+        if temporary:
+            self.cswriter.write(temporary)
+            return
+
         generics, args = destructure_args(node.args)
 
         if isinstance(node.func, ast.Name):
@@ -151,6 +777,17 @@ class Transpiler(ast.NodeVisitor):
                     self.cswriter.write("new ")
                     self.traverse(node.args[0])
                     return
+                case "len" if len(node.args) == 1 and not self.is_variable_defined("len"):
+                    # Length and Count are plain property reads
+                    cs_type = self.infer_type(node.args[0])
+                    if cs_type is not None and (cs_type.is_array or cs_type.name == "string"):
+                        self.traverse_operand(node.args[0], PRIMARY)
+                        self.cswriter.write(".Length")
+                        return
+                    elif cs_type is not None and cs_type.name in ("List", "HashSet", "Dictionary"):
+                        self.traverse_operand(node.args[0], PRIMARY)
+                        self.cswriter.write(".Count")
+                        return
                 case "cast":
                     if len(node.args) != 2:
                         raise TranspilerException("forbidden argument count for cast special function")
@@ -163,33 +800,80 @@ class Transpiler(ast.NodeVisitor):
                             self.traverse(node.args[1])
 
                         self.cswriter.write(" ")
-                        self.traverse(node.args[0])
+                        self.traverse_operand(node.args[0], UNARY)
                     return
 
-        self.traverse(node.func)
+        self.traverse_operand(node.func, PRIMARY)
 
         if len(generics) > 0:
             with self.cswriter.delimit_generic():
                 self.cswriter.write(", ".join(generics))
 
+        parameters = self.parameter_types(node.func)
+        if parameters is None or len(parameters) != len(args):
+            parameters = [None] * len(args)
+
         with self.cswriter.delimit_args():
-            for arg in self.cswriter.enumerate_join(args, ", "):
-                self.traverse(arg)
+            for arg, cs_type in self.cswriter.enumerate_join(zip(args, parameters), ", "):
+                self.traverse_value(arg, cs_type)
 
             for keyword in self.cswriter.enumerate_join(node.keywords, ", "):
                 self.cswriter.write(f"{keyword.arg}=")
                 self.traverse(keyword.value)
 
+    def parameter_types(self, func: ast.expr):
+        # Known for the class's own methods and for collection methods
+        match func:
+            case ast.Attribute(value=ast.Name(id=name), attr=attr) if name == self.receiver and self.class_info:
+                return self.class_info.method_parameters(attr)
+            case ast.Attribute(value=value, attr=attr):
+                container = self.infer_type(value)
+                if container is None or container.name not in COLLECTION_METHODS or attr not in COLLECTION_METHODS[container.name]:
+                    return None
+
+                return [INT if parameter == "index" else container.args[parameter] for parameter in COLLECTION_METHODS[container.name][attr]]
+
+        return None
+
     def visit_Name(self, node: ast.Name):
-        self.cswriter.write(node.id)
+        if node.id == self.receiver:
+            self.cswriter.write("this")
+        else:
+            self.cswriter.write(node.id)
+
+    # Literals on their own, e.g. call arguments, are typed by their elements
 
     def visit_List(self, node: ast.List):
-        logging.info(f"Using dynamically typed array on ({self.dump_current_info()}")
-        self.cswriter.write("new dynamic[]")
-        with self.cswriter.delimit("{", "}"):
-            for element in self.cswriter.enumerate_join(node.elts, ", "):
-                self.traverse(element)
+        self.write_collection(node, None)
+
+    def visit_Set(self, node: ast.Set):
+        self.write_collection(node, None)
+
+    def visit_Dict(self, node: ast.Dict):
+        self.write_collection(node, None)
     
+    def visit_ListComp(self, node: ast.ListComp):
+        self.write_lowered(node)
+
+    def visit_SetComp(self, node: ast.SetComp):
+        self.write_lowered(node)
+
+    def visit_DictComp(self, node: ast.DictComp):
+        self.write_lowered(node)
+
+    def visit_GeneratorExp(self, node: ast.GeneratorExp):
+        self.write_lowered(node)
+
+    def write_lowered(self, node: ast.expr):
+        temporary = self.lowered.get(node)
+        if temporary is None:
+            raise TranspilerException(
+                "comprehensions in lambdas or conditional branches can't be lowered to loops, "
+                "assign the comprehension to a variable first"
+            )
+
+        self.cswriter.write(temporary)
+
     @statement
     def visit_Expr(self, node: ast.Expr):
         self.traverse(node.value)
@@ -197,7 +881,7 @@ class Transpiler(ast.NodeVisitor):
     @statement
     def visit_Return(self, node: ast.Return):
         self.cswriter.write("return ")
-        self.traverse(node.value)
+        self.traverse_value(node.value, self.function and self.function.returns)
 
     def visit_Constant(self, node: ast.Constant):
         self.cswriter.write(cs_constant_repr(node.value))
@@ -207,35 +891,46 @@ class Transpiler(ast.NodeVisitor):
         self.cswriter.write(f"if(")
         self.traverse(node.test)
         self.cswriter.write(")")
-        with self.cswriter.block():
+        with self.block():
             self.traverse(node.body)
 
-        while node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+        # An elif test with a comprehension needs its loop emitted in the else block
+        while (
+            node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If)
+            and not any(self.find_lowerable(node.orelse[0].test, []))
+        ):
             node = node.orelse[0]
 
             self.cswriter.write_indented(f"else if(")
             self.traverse(node.test)
             self.cswriter.write(")")
-            with self.cswriter.block():
+            with self.block():
                 self.traverse(node.body)
         
         if node.orelse:
             self.cswriter.write_indented("else")
-            with self.cswriter.block():
+            with self.block():
                 self.traverse(node.orelse)
 
     @statement
     def visit_AnnAssign(self, node: ast.AnnAssign):
-        if isinstance(node.value, ast.Tuple):
-            raise TranspilerException("assignment value can't be a tuple")
+        # C# has no readonly locals, only literals of const types stay constant
+        final, annotation = unwrap_final(node.annotation)
+        cs_type = type_from_annotation(annotation) if annotation else self.infer_type(node.value)
 
         if isinstance(node.target, ast.Name):
             if self.is_variable_defined(node.target.id):
                 self.cswriter.line_comment(f"Warning: Used annotated assignment for already defined variable ({self.dump_current_info()})")
                 logging.warn(f"annotated assignment detected for already defined variable ({self.dump_current_info()}")
             else:
-                self.define_variable_parent(node.target.id)
-                self.traverse(node.annotation)
+                if final and is_const_value(node.value, cs_type):
+                    self.cswriter.write("const ")
+
+                self.define_variable(node.target.id, cs_type)
+                if annotation is None:
+                    self.cswriter.write(str(cs_type) if cs_type else "var")
+                else:
+                    self.write_type(annotation)
                 self.cswriter.write(" ")
         elif isinstance(node.target, ast.Attribute):
             pass
@@ -244,145 +939,516 @@ class Transpiler(ast.NodeVisitor):
 
         self.traverse(node.target)        
         self.cswriter.write(" = ")
-        self.traverse(node.value)
+        self.traverse_value(node.value, cs_type)
 
     binop = {
-        "Add": "+",
-        "Sub": "-",
-        "Mult": "*",
-        "MatMult": "@",
-        "Div": "/",
-        "Mod": "%",
-        "LShift": "<<",
-        "RShift": ">>",
-        "BitOr": "|",
-        "BitXor": "^",
-        "BitAnd": "&",
-        "FloorDiv": "//",
-        "Pow": "**",
+        ast.Add: "+",
+        ast.Sub: "-",
+        ast.Mult: "*",
+        ast.Div: "/",
+        ast.Mod: "%",
+        ast.LShift: "<<",
+        ast.RShift: ">>",
+        ast.BitOr: "|",
+        ast.BitXor: "^",
+        ast.BitAnd: "&",
     }
 
     def visit_BinOp(self, node: ast.BinOp):
-        op = self.binop[node.op.__class__.__name__]
-
-        with self.cswriter.delimit("(", ")"):
-            with self.cswriter.delimit("(", ")"):
-                self.traverse(node.left)
-
-            self.cswriter.write(f" {op} ")
-
-            with self.cswriter.delimit("(", ")"):
-                self.traverse(node.right)
+        self.write_binop(node, None)
+
+    def write_binop(self, node: ast.BinOp, cs_type: CsType | None):
+        if isinstance(node.op, (ast.FloorDiv, ast.Pow)):
+            self.write_math_binop(node)
+            return
+
+        # Arithmetic on a float, or stored as one, stays in float, a double
+        # literal operand would widen the result
+        if not isinstance(node.op, ARITHMETIC_OPS):
+            cs_type = None
+        elif FLOAT in (self.infer_type(node.left), self.infer_type(node.right)):
+            cs_type = FLOAT
+
+        op = self.binop.get(type(node.op))
+        if op is None:
+            raise TranspilerException("matrix multiplication is not supported")
+        precedence = BINOP_PRECEDENCE[type(node.op)]
+
+        with self.cswriter.delimit_if("(", ")", needs_parentheses(node.left, precedence)):
+            self.traverse_value(node.left, cs_type)
+        self.cswriter.write(f" {op} ")
+        with self.cswriter.delimit_if("(", ")", needs_parentheses(node.right, precedence, right=True)):
+            self.traverse_value(node.right, cs_type)
 
     @statement
     def visit_AugAssign(self, node: ast.AugAssign):
         if isinstance(node.target, ast.Name) and not self.is_variable_defined(node.target.id):
             raise TranspilerException("AugAssign to nonexistent variable")
 
-        op = self.binop[node.op.__class__.__name__]
+        builder = isinstance(node.target, ast.Name) and self.builders.get(node.target.id)
+        if builder:
+            self.cswriter.write(builder)
+            for part in self.string_parts(node.value):
+                with self.cswriter.delimit(".Append(", ")"):
+                    self.write_string_part(part, appending=True)
+            return
+
+        if isinstance(node.op, (ast.FloorDiv, ast.Pow)):
+            # No compound form, the target is written twice
+            self.traverse(node.target)
+            self.cswriter.write(" = ")
+            self.write_math_binop(ast.BinOp(left=node.target, op=node.op, right=node.value))
+            return
+
+        op = self.binop.get(type(node.op))
+        if op is None:
+            raise TranspilerException("matrix multiplication is not supported")
 
         self.traverse(node.target)
         self.cswriter.write(f" {op}= ")
-        self.traverse(node.value)
+        self.traverse_value(node.value, self.infer_type(node.target))
+
+    def write_math_binop(self, node: ast.BinOp):
+        # Floor division and powers have no C# operator. System.Math computes
+        # them in double, which holds any int exactly, so the result is cast
+        # back when the operands are typed and the Python result is kept
+        cs_type = self.infer_type(node)
+        if cs_type in (INT, FLOAT):
+            self.cswriter.write(f"({cs_type})")
+
+        if isinstance(node.op, ast.Pow):
+            with self.cswriter.delimit("System.Math.Pow(", ")"):
+                self.traverse(node.left)
+                self.cswriter.write(", ")
+                self.traverse(node.right)
+            return
 
-    unaryops = {"Invert": "~", "Not": "!", "UAdd": "+", "USub": "-"}
+        with self.cswriter.delimit("System.Math.Floor(", ")"):
+            # Integer division would round toward zero
+            if cs_type in (FLOAT, DOUBLE):
+                self.traverse_operand(node.left, MULTIPLICATIVE)
+            else:
+                self.cswriter.write("(double)")
+                self.traverse_operand(node.left, UNARY)
+
+            self.cswriter.write(" / ")
+            self.traverse_operand(node.right, MULTIPLICATIVE, right=True)
+
+    unaryops = {ast.Invert: "~", ast.Not: "!", ast.UAdd: "+", ast.USub: "-"}
 
     def visit_UnaryOp(self, node: ast.UnaryOp):
-        op = self.unaryops[node.op.__class__.__name__]
+        op = self.unaryops[type(node.op)]
         self.cswriter.write(op)
-        self.traverse(node.operand)
 
-    boolops = {"And": "&&", "Or": "||"}
+        # A nested sign would merge into ++ or --
+        sign = op in ("+", "-") and expression_precedence(node.operand) == UNARY
+        with self.cswriter.delimit_if("(", ")", sign or needs_parentheses(node.operand, UNARY)):
+            self.traverse(node.operand)
 
-    def visit_BoolOp(self, node: ast.BoolOp):
-        op = self.boolops[node.op.__class__.__name__]
-        left, right = node.values[0], node.values[1]
+    boolops = {ast.And: "&&", ast.Or: "||"}
 
-        with self.cswriter.delimit_if("(", ")", is_comparer_node(left)):
-            self.traverse(left)
-
-        self.cswriter.write(f" {op} ")
+    def visit_BoolOp(self, node: ast.BoolOp):
+        op = self.boolops[type(node.op)]
+        precedence = BOOLOP_PRECEDENCE[type(node.op)]
 
-        with self.cswriter.delimit_if("(", ")", is_comparer_node(right)):
-            self.traverse(right)
+        # `a and b and c` is a single node with three values
+        self.traverse_operand(node.values[0], precedence)
+        for value in node.values[1:]:
+            self.cswriter.write(f" {op} ")
+            self.traverse_operand(value, precedence, right=True)
 
     cmpops = {
-        "Eq": "==",
-        "NotEq": "!=",
-        "Lt": "<",
-        "LtE": "<=",
-        "Gt": ">",
-        "GtE": ">=",
-        "Is": "is",
-        "IsNot": "is not",
-        "In": "in",
-        "NotIn": "not in",
+        ast.Eq: "==",
+        ast.NotEq: "!=",
+        ast.Lt: "<",
+        ast.LtE: "<=",
+        ast.Gt: ">",
+        ast.GtE: ">=",
+        ast.Is: "is",
+        ast.IsNot: "is not",
+        ast.In: "in",
+        ast.NotIn: "not in",
     }
 
     def visit_Compare(self, node: ast.Compare):
-        op = self.cmpops[node.ops[0].__class__.__name__]
-        self.traverse(node.left)
+        op = self.cmpops[type(node.ops[0])]
+        precedence = expression_precedence(node)
+
+        self.traverse_operand(node.left, precedence)
         self.cswriter.write(f" {op} ")
-        self.traverse(node.comparators[0])
+        self.traverse_operand(node.comparators[0], precedence, right=True)
 
     def visit_Subscript(self, node: ast.Subscript):
         if isinstance(node.slice, ast.Slice):
             raise TranspilerException("subslices are not supported")
 
-        self.traverse(node.value)
+        self.traverse_operand(node.value, PRIMARY)
+
+        # ValueTuple has no indexer, elements are fields
+        container = self.infer_type(node.value)
+        if container and container.is_tuple:
+            index = tuple_index(node.slice, container)
+            if index is None:
+                raise TranspilerException("tuples can only be indexed by an integer literal")
+
+            self.cswriter.write(f".Item{index + 1}")
+            return
+
         with self.cswriter.delimit("[", "]"):
             self.traverse(node.slice)
 
     @indented
     def visit_For(self, node: ast.For):
-        if isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and node.iter.func.id == "range":
-            self.cswriter.write("for")
-            with self.cswriter.delimit_args():
-                if node.iter.func.id == "range":
-                    range_func = node.iter
-
-                    begin = ast.Constant(value=0)
-                    end = ast.Constant(value=0)
-                    step = ast.Constant(value=1)
-
-                    match len(range_func.args):
-                        case 1:
-                            end = range_func.args[0]
-                        case 2:
-                            begin = range_func.args[0]
-                            end = range_func.args[1]
-                        case 3:
-                            begin = range_func[0]
-                            end = range_func[1]
-                            step = range_func[2]
-                        case _:
-                            raise TranspilerException("unknown args for range in for loop")
-
-                    # we have to assume type is int since there 
-                    # are no type annotations for loops in Python
-                    self.cswriter.write("var ") 
-                    self.traverse(node.target)
-                    self.cswriter.write(" = ")
-                    self.traverse(begin)
-                    self.cswriter.write("; ")
-                    self.traverse(node.target)
-                    self.cswriter.write(" < ")
-                    self.traverse(end)
-                    self.cswriter.write("; ")
-                    self.traverse(node.target)
-                    self.cswriter.write(" += ")
-                    self.traverse(step)
+        # Strings only ever appended to in the loop are built in a single
+        # StringBuilder instead of allocating a new string every iteration
+        builders = self.find_string_builders(node)
+        for name, builder in builders:
+            self.cswriter.write(f"var {builder} = new System.Text.StringBuilder({name});")
+            self.cswriter.write_indents()
+            self.builders[name] = builder
+
+        # The loop variable is scoped to the loop, like in C#. Loops over
+        # arrays and lists are indexed, enumerate and zip included, so no
+        # enumerator or iterator object is created
+        with self.symbols.scope():
+            match node.iter:
+                case ast.Call(func=ast.Name(id="range")) if not self.is_variable_defined("range"):
+                    prologue = self.write_range_loop(node)
+                case ast.Call(func=ast.Name(id="enumerate")) if not self.is_variable_defined("enumerate"):
+                    prologue = self.write_enumerate_loop(node)
+                case ast.Call(func=ast.Name(id="zip")) if not self.is_variable_defined("zip"):
+                    prologue = self.write_zip_loop(node)
+                case ast.Call(func=ast.Attribute(value=value, attr="items" | "keys" | "values"), args=[]) if self.is_dictionary(value):
+                    prologue = self.write_dictionary_loop(node, value, node.iter.func.attr)
+                case _ if self.is_indexable(node.iter):
+                    elements = self.write_indexed_loop([node.iter])
+                    prologue = [ast.Assign(targets=[node.target], value=elements[0])]
+                case _ if self.is_dictionary(node.iter):
+                    prologue = self.write_dictionary_loop(node, node.iter, "keys")
+                case _:
+                    # `for a, b in pairs` deconstructs each element
+                    self.write_foreach(node.target, node.iter)
+                    prologue = []
+
+            with self.block():
+                for statement_node in prologue:
+                    self.traverse(ast.fix_missing_locations(ast.copy_location(statement_node, node)))
+                self.traverse(node.body)
+
+        for name, builder in builders:
+            del self.builders[name]
+            self.cswriter.write_indented(f"{name} = {builder}.ToString();")
+
+    def find_string_builders(self, node: ast.For):
+        appends = {}
+        for child in ast.walk(ast.Module(body=node.body, type_ignores=[])):
+            if isinstance(child, ast.AugAssign) and isinstance(child.op, ast.Add) and isinstance(child.target, ast.Name):
+                appends.setdefault(child.target.id, set()).add(child.target)
+
+        names = {
+            name for name in appends
+            if name not in self.builders and self.symbols.lookup(name) == STRING
+        }
+
+        # Any other use would need the string built so far
+        for child in ast.walk(ast.Module(body=node.body, type_ignores=[])):
+            if isinstance(child, ast.Name) and child.id in names and child not in appends[child.id]:
+                names.discard(child.id)
+
+        return [(name, self.temporary_name("builder")) for name in sorted(names)]
+
+    # f-strings become string.Concat over the parts, values are converted by
+    # their own ToString so numbers are never boxed
+
+    def visit_JoinedStr(self, node: ast.JoinedStr):
+        parts = self.string_parts(node)
+
+        if not parts:
+            self.cswriter.write("\"\"")
+        elif len(parts) == 1:
+            self.write_string_part(parts[0])
         else:
-            self.cswriter.write("foreach")
+            self.cswriter.write("string.Concat")
             with self.cswriter.delimit_args():
-                self.cswriter.write("var ")
-                self.traverse(node.target)
-                self.cswriter.write(" in ")
-                self.traverse(node.iter)
+                for part in self.cswriter.enumerate_join(parts, ", "):
+                    self.write_string_part(part)
 
+    def string_parts(self, node: ast.expr):
+        # Pieces concatenated into a string, f-strings and string + chains split up
+        if isinstance(node, ast.JoinedStr):
+            return merge_constants(node.values)
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add) and self.infer_type(node) == STRING:
+            return self.string_parts(node.left) + self.string_parts(node.right)
 
-        with self.cswriter.block():
-            self.traverse(node.body)
+        return [node]
+
+    def write_string_part(self, node: ast.expr, appending: bool = False):
+        if not isinstance(node, ast.FormattedValue):
+            self.traverse(node)
+            return
+
+        if node.conversion not in (-1, ord("s")):
+            raise TranspilerException(f"conversion !{chr(node.conversion)} in f-strings is not supported")
+
+        spec = ""
+        if node.format_spec:
+            if not all(isinstance(value, ast.Constant) for value in node.format_spec.values):
+                raise TranspilerException("expressions in f-string format specs are not supported")
+            spec = "".join(value.value for value in node.format_spec.values)
+
+        value_type = self.infer_type(node.value)
+        if value_type == STRING:
+            self.write_string_value(node.value, spec)
+            return
+
+        try:
+            dotnet, align, width = dotnet_format(spec)
+        except ValueError as e:
+            raise TranspilerException(str(e))
+
+        floating = value_type in (FLOAT, DOUBLE)
+        if dotnet is None and width is None and appending and value_type in APPENDABLE_TYPES and not floating:
+            # StringBuilder.Append has overloads for these, no conversion needed
+            self.traverse(node.value)
+            return
+
+        # Formats and decimal points follow the current culture unless told
+        # otherwise, Python always writes them the same way
+        arguments = [cs_constant_repr(dotnet)] if dotnet else []
+        if dotnet or floating:
+            arguments.append(INVARIANT_CULTURE)
+
+        self.traverse_operand(node.value, PRIMARY)
+        self.cswriter.write(f".ToString({', '.join(arguments)})")
+        self.write_padding(align, width, value_type in NUMERIC_TYPES)
+
+    def write_string_value(self, node: ast.expr, spec: str):
+        try:
+            align, width, precision = string_format(spec)
+        except ValueError as e:
+            raise TranspilerException(str(e))
+
+        if precision is None and not width:
+            self.traverse(node)
+        elif precision is None:
+            self.traverse_operand(node, PRIMARY)
+        elif is_pure(node):
+            # Truncated to at most `precision` characters
+            self.traverse_operand(node, PRIMARY)
+            self.cswriter.write(f".Substring(0, System.Math.Min({precision}, ")
+            self.traverse_operand(node, PRIMARY)
+            self.cswriter.write(".Length))")
+        else:
+            raise TranspilerException("truncating format specs need a variable, assign the value to one first")
+
+        self.write_padding(align, width, False)
+
+    def write_padding(self, align: str | None, width: int | None, numeric: bool):
+        if width:
+            # Python right aligns numbers and left aligns everything else by default
+            right = align == ">" or align is None and numeric
+            self.cswriter.write(f".{'PadLeft' if right else 'PadRight'}({width})")
+
+    def is_indexable(self, node: ast.expr):
+        cs_type = self.infer_type(node)
+        return cs_type is not None and (cs_type.is_array or cs_type.is_list)
+
+    def is_dictionary(self, node: ast.expr):
+        cs_type = self.infer_type(node)
+        return cs_type is not None and cs_type.name == "Dictionary"
+
+    def write_foreach(self, target: ast.expr, iterable: ast.expr, element_type: CsType | None = None):
+        self.define_targets(target, element_type or self.iteration_type(iterable))
+
+        self.cswriter.write("foreach")
+        with self.cswriter.delimit_args():
+            self.cswriter.write("var ")
+            self.write_targets(target)
+            self.cswriter.write(" in ")
+            self.traverse_operand(iterable, PRIMARY)
+
+    def write_range_loop(self, node: ast.For):
+        if not isinstance(node.target, ast.Name):
+            raise TranspilerException("range loops need a single loop variable")
+
+        args = node.iter.args
+        match len(args):
+            case 1:
+                begin, end, step = ast.Constant(value=0), args[0], ast.Constant(value=1)
+            case 2:
+                begin, end, step = args[0], args[1], ast.Constant(value=1)
+            case 3:
+                begin, end, step = args
+            case _:
+                raise TranspilerException("unknown args for range in for loop")
+
+        step_value = constant_int(step)
+        if step_value == 0:
+            raise TranspilerException("range step can't be zero")
+
+        name = node.target.id
+        if self.is_variable_defined(name):
+            raise TranspilerException("variable has already been defined")
+
+        # Like Python, the bounds are evaluated once, unless they can't change
+        declarators = []
+        if not is_loop_invariant(end, node.body):
+            end = self.hoist_declarator(declarators, "end", end)
+        if step_value is None and not is_loop_invariant(step, node.body):
+            step = self.hoist_declarator(declarators, "step", step)
+        self.define_variable(name, INT)
+
+        self.cswriter.write("for")
+        with self.cswriter.delimit_args():
+            self.cswriter.write(f"int {name} = ")
+            self.traverse(begin)
+            for declarator, value in declarators:
+                self.cswriter.write(f", {declarator} = ")
+                self.traverse(value)
+            self.cswriter.write("; ")
+
+            # The direction of an unknown step is only known at runtime
+            if step_value is None:
+                self.traverse_operand(step, RELATIONAL)
+                self.cswriter.write(f" > 0 ? {name} < ")
+                self.traverse_operand(end, RELATIONAL, right=True)
+                self.cswriter.write(f" : {name} > ")
+                self.traverse_operand(end, RELATIONAL, right=True)
+            else:
+                self.cswriter.write(f"{name} {'<' if step_value > 0 else '>'} ")
+                self.traverse_operand(end, RELATIONAL, right=True)
+            self.cswriter.write("; ")
+
+            if step_value == 1:
+                self.cswriter.write(f"{name}++")
+            elif step_value == -1:
+                self.cswriter.write(f"{name}--")
+            elif step_value is not None and step_value < 0:
+                self.cswriter.write(f"{name} -= {-step_value}")
+            else:
+                self.cswriter.write(f"{name} += ")
+                self.traverse(step)
+
+        return []
+
+    def hoist_declarator(self, declarators: list, kind: str, value: ast.expr):
+        name = self.temporary(kind, INT)
+        declarators.append((name, value))
+        return ast.Name(id=name)
+
+    def hoist_iterable(self, node: ast.expr):
+        # Indexed loops read the iterable every iteration, anything but a
+        # plain name or attribute is stored in a local first
+        if is_pure(node):
+            return node
+
+        name = self.temporary("items", self.infer_type(node))
+        self.cswriter.write(f"var {name} = ")
+        self.traverse(node)
+        self.cswriter.write(";")
+        self.cswriter.write_indents()
+        return ast.Name(id=name)
+
+    def write_indexed_loop(self, iterables: list[ast.expr], index: str | None = None):
+        # Returns the element of every iterable at the current index
+        iterables = [self.hoist_iterable(iterable) for iterable in iterables]
+        index = index or self.temporary_name("i")
+        self.define_variable(index, INT)
+
+        self.cswriter.write("for")
+        with self.cswriter.delimit_args():
+            self.cswriter.write(f"int {index} = 0; ")
+            for iterable in self.cswriter.enumerate_join(iterables, " && "):
+                self.cswriter.write(f"{index} < ")
+                self.traverse_operand(iterable, PRIMARY)
+                self.cswriter.write(".Length" if self.infer_type(iterable).is_array else ".Count")
+            self.cswriter.write(f"; {index}++")
+
+        return [ast.Subscript(value=iterable, slice=ast.Name(id=index)) for iterable in iterables]
+
+    def write_enumerate_loop(self, node: ast.For):
+        args = node.iter.args
+        if not 1 <= len(args) <= 2 or node.iter.keywords:
+            raise TranspilerException("unknown args for enumerate in for loop")
+
+        iterable = args[0]
+        start = args[1] if len(args) > 1 else None
+
+        if isinstance(node.target, (ast.Tuple, ast.List)) and len(node.target.elts) == 2:
+            index_target, value_target = node.target.elts
+        else:
+            index_target = value_target = None
+
+        if self.is_indexable(iterable):
+            # Counting from 0 into a new name, the loop index is the variable itself
+            reuse = (
+                start is None and isinstance(index_target, ast.Name)
+                and not self.is_variable_defined(index_target.id)
+            )
+            element, = self.write_indexed_loop([iterable], index_target.id if reuse else None)
+            index = ast.Name(id=element.slice.id)
+            if start is not None:
+                index = ast.BinOp(left=index, op=ast.Add(), right=start)
+
+            if reuse:
+                return [ast.Assign(targets=[value_target], value=element)]
+            elif index_target is None:
+                return [ast.Assign(targets=[node.target], value=ast.Tuple(elts=[index, element]))]
+
+            return [ast.Assign(targets=[index_target], value=index), ast.Assign(targets=[value_target], value=element)]
+
+        # Anything else is enumerated by a counter next to a foreach
+        if index_target is None:
+            raise TranspilerException("enumerate over a collection of unknown type needs an (index, value) target")
+
+        counter = ast.Name(id=self.temporary("index", INT))
+        self.cswriter.write(f"var {counter.id} = ")
+        self.traverse(start or ast.Constant(value=0))
+        self.cswriter.write(";")
+        self.cswriter.write_indents()
+        self.write_foreach(value_target, iterable)
+
+        return [
+            ast.Assign(targets=[index_target], value=counter),
+            ast.AugAssign(target=counter, op=ast.Add(), value=ast.Constant(value=1)),
+        ]
+
+    def write_zip_loop(self, node: ast.For):
+        iterables = node.iter.args
+        if not iterables or node.iter.keywords:
+            raise TranspilerException("unknown args for zip in for loop")
+
+        for iterable in iterables:
+            if not self.is_indexable(iterable):
+                raise TranspilerException(
+                    f"zip needs arrays or lists of a known type to be lowered to an index loop, "
+                    f"annotate {ast.unparse(iterable)}"
+                )
+
+        elements = self.write_indexed_loop(iterables)
+
+        if isinstance(node.target, (ast.Tuple, ast.List)) and len(node.target.elts) == len(elements):
+            return [ast.Assign(targets=[target], value=element) for target, element in zip(node.target.elts, elements)]
+
+        return [ast.Assign(targets=[node.target], value=ast.Tuple(elts=elements))]
+
+    def write_dictionary_loop(self, node: ast.For, dictionary: ast.expr, method: str):
+        # Dictionary's KeyCollection, ValueCollection and own enumerators are
+        # structs, iterated without allocating
+        if method == "items":
+            pair = ast.Name(id=self.temporary_name("pair"))
+            self.write_foreach(pair, dictionary, self.infer_type(dictionary).pair)
+            key = ast.Attribute(value=pair, attr="Key")
+            value = ast.Attribute(value=pair, attr="Value")
+
+            if isinstance(node.target, (ast.Tuple, ast.List)) and len(node.target.elts) == 2:
+                return [ast.Assign(targets=[target], value=element) for target, element in zip(node.target.elts, (key, value))]
+
+            return [ast.Assign(targets=[node.target], value=ast.Tuple(elts=[key, value]))]
+
+        collection = ast.Attribute(value=dictionary, attr="Keys" if method == "keys" else "Values")
+        self.write_foreach(node.target, collection, self.iteration_type(node.iter))
+        return []
 
     @indented
     def visit_Match(self, node: ast.Match):
@@ -391,7 +1457,7 @@ class Transpiler(ast.NodeVisitor):
         with self.cswriter.delimit_args():
             self.traverse(node.subject)
         
-        with self.cswriter.block():
+        with self.block():
             self.traverse(node.cases)
 
     def visit_match_case(self, node: ast.match_case):
@@ -427,205 +1493,226 @@ class Transpiler(ast.NodeVisitor):
         self.cswriter.write("continue")
 
     def visit_Tuple(self, node: ast.Tuple):
-        raise TranspilerException("python tuples are not supported by pynet")
+        self.write_tuple(node, None)
 
     # CS SPECIFIC VISITORS
     @statement
     def visit_CsFieldDef(self, node: csast.FieldDef):
         self.cswriter.write(f"{node.visibility} ")
 
-        if node.static:
+        field_type = field_def_type(node)
+        if field_type is None and node.type is None and node.value is not None:
+            field_type = self.infer_type(node.value)
+
+        if field_type is None and node.type is None:
+            raise TranspilerException(f"can't infer the type of {node.target.id}, annotate it as Final[T]")
+        elif field_type is None:
+            raise TranspilerException("invalid field type (expected a name, a subscript or a call with generic arguments)")
+
+        if node.const and node.value is None:
+            # Only the (static) constructor can assign it
+            self.cswriter.write("static readonly " if node.static else "readonly ")
+        elif node.const and is_const_value(node.value, field_type):
+            self.cswriter.write("const ")
+        elif node.const:
+            self.cswriter.write("static readonly ")
+        elif node.static:
             self.cswriter.write("static ")
+        elif self.class_info and self.class_info.readonly:
+            self.cswriter.write("readonly ")
 
-        if isinstance(node.type, ast.Call):
-            generics = []
-            for arg in node.type.args:
-                if not isinstance(arg, ast.Call) or not arg.func.id == "generic":
-                    raise Transpiler("invalid field (found a call and expected it to be a generic)")
-
-                generics.append(arg.args[0].id)
-
-            self.cswriter.write(f"{node.type.func.id}")
-
-            with self.cswriter.delimit_generic():
-                self.cswriter.write(", ".join(generics))
-            self.cswriter.write(" ")
-        else:
-            self.cswriter.write(f"{node.type.id} ")
-        
-        self.cswriter.write(f"{node.target.id}")
+        self.cswriter.write(f"{field_type} {node.target.id}")
 
         if node.value is not None:
             self.cswriter.write(" = ")
-            self.traverse(node.value)
-
-    def cs_visit(self, node: csast.AST):
-        method = 'visit_Cs' + node.__class__.__name__
-        visitor = getattr(self, method)
-        return visitor(node)
+            self.traverse_value(node.value, field_type)
+
+    # Dispatch
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.build_dispatch()
+
+    @classmethod
+    def build_dispatch(cls):
+        # Maps node types straight to their visitor functions, built once
+        # per class instead of formatting and resolving method names per node
+        cls.dispatch = {}
+        cls.cs_dispatch = {}
+
+        for name in dir(cls):
+            if name.startswith("visit_Cs"):
+                node_type = getattr(csast, name.removeprefix("visit_Cs"), None)
+                if isinstance(node_type, type) and issubclass(node_type, csast.AST):
+                    cls.cs_dispatch[node_type] = getattr(cls, name)
+            elif name.startswith("visit_"):
+                node_type = getattr(ast, name.removeprefix("visit_"), None)
+                if isinstance(node_type, type) and issubclass(node_type, ast.AST):
+                    cls.dispatch[node_type] = getattr(cls, name)
 
     def visit(self, node):
-        node.defined_vars = []
-
         self.nodes.append(node)
-        self.variable_scopes.append([])
-
-        super().visit(node)
-
+        self.dispatch.get(type(node), Transpiler.generic_visit)(self, node)
         self.nodes.pop()
-        self.variable_scopes.pop()
+
+    def traverse_operand(self, node, precedence: int, right: bool = False):
+        with self.cswriter.delimit_if("(", ")", needs_parentheses(node, precedence, right)):
+            self.traverse(node)
 
     def traverse(self, node):
-        if isinstance(node, list):
+        node_type = type(node)
+
+        if node_type is list:
             for item in node:
                 self.traverse(item)
+        elif node_type in self.dispatch:
+            self.nodes.append(node)
+            self.dispatch[node_type](self, node)
+            self.nodes.pop()
+        elif node_type in self.cs_dispatch:
+            self.cs_dispatch[node_type](self, node)
+        elif isinstance(node, ast.AST):
+            self.visit(node)
+
+# Statement fields evaluated before the statement runs, where comprehensions
+# are lowered from
+LOWERED_FIELDS = {
+    ast.Assign: ("value", "targets"),
+    ast.AnnAssign: ("value",),
+    ast.AugAssign: ("target", "value"),
+    ast.Expr: ("value",),
+    ast.Return: ("value",),
+    ast.If: ("test",),
+    ast.For: ("iter",),
+    ast.Match: ("subject",),
+    ast.Raise: ("exc",),
+}
+
+# Parameters of collection methods, as indices into the collection's type
+# arguments
+COLLECTION_METHODS = {
+    "List": {"Add": [0], "Contains": [0], "Remove": [0], "IndexOf": [0], "Insert": ["index", 0]},
+    "HashSet": {"Add": [0], "Contains": [0], "Remove": [0]},
+    "Dictionary": {"Add": [0, 1], "ContainsKey": [0], "ContainsValue": [1], "Remove": [0]},
+}
+
+ARITHMETIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod)
+
+INVARIANT_CULTURE = "System.Globalization.CultureInfo.InvariantCulture"
+
+# StringBuilder.Append overloads taking these without boxing
+APPENDABLE_TYPES = [INT, FLOAT, DOUBLE, BOOL, STRING]
+
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+FUSED_CALLS = {"sum", "any", "all", "min", "max"}
+
+def comprehension_loop(node, body: list[ast.stmt], exit: ast.expr | None = None):
+    # Nested for/if statements running `body` once per produced element. A
+    # break in `body` only leaves the innermost loop, `exit` is tested after
+    # each inner loop to leave the enclosing ones too
+    for index, generator in enumerate(reversed(node.generators)):
+        if generator.is_async:
+            raise TranspilerException("async comprehensions are not supported")
+
+        if exit is not None and index > 0:
+            body = [*body, ast.If(test=exit, body=[ast.Break()], orelse=[])]
+
+        if len(generator.ifs) > 1:
+            body = [ast.If(test=ast.BoolOp(op=ast.And(), values=generator.ifs), body=body, orelse=[])]
+        elif generator.ifs:
+            body = [ast.If(test=generator.ifs[0], body=body, orelse=[])]
+
+        body = [ast.For(target=generator.target, iter=generator.iter, body=body, orelse=[])]
+
+    return ast.fix_missing_locations(ast.copy_location(body[0], node))
+
+def merge_constants(values: list[ast.expr]):
+    # Constants in f-strings are formatted by Python, exactly as they would
+    # be at runtime, and joined with the literal text around them
+    parts = []
+    for value in values:
+        if (
+            isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Constant)
+            and value.conversion in (-1, ord("s")) and not value.format_spec
+        ):
+            value = ast.Constant(value=str(value.value.value))
+
+        if isinstance(value, ast.Constant) and parts and isinstance(parts[-1], ast.Constant):
+            parts[-1] = ast.Constant(value=parts[-1].value + value.value)
         else:
-            if isinstance(node, csast.AST):
-                self.cs_visit(node)
-            elif isinstance(node, ast.AST):
-                self.visit(node)
-
-def is_static(decorators: list[ast.expr]): 
-    for decorator in decorators:
-        if not isinstance(decorator, ast.Name):
-            continue
-
-        if decorator.id == "static":
-            return True
-    
-    return False
-
-def is_comparer_node(node: ast.AST):
-    return isinstance(node, ast.Compare) or isinstance(node, ast.BoolOp)
-
-def get_access_modifier(decorators: list[ast.expr]): 
-    ALLOWED_MODIFIERS = [ "public", "protected", "internal", "private" ]
-    EXCEPTIONS = {
-        "protected_internal": "protected internal",
-        "private_protected": "private protected"
-    }
-
-    for decorator in decorators:
-        # Access modifiers are non-call decorators only
-        if not isinstance(decorator, ast.Name):
-            continue
-
-        if decorator.id in ALLOWED_MODIFIERS:
-            return decorator.id
-        elif decorator.id in EXCEPTIONS:
-            return EXCEPTIONS[decorator.id]
-
-    return "internal"
-
-def get_class_inheritance(class_node: ast.ClassDef):
-    inheritance = []
-
-    decorators = class_node.decorator_list
-
-    base = get_class_base(class_node)
-    if base:
-        inheritance.append(base)
-
-    implementations = get_class_implementations(decorators)
-    inheritance.extend(implementations)
-
-    return inheritance
-
-def get_class_base(class_node: ast.ClassDef):
-    bases = class_node.bases
-    if len(bases) == 0:
-        return None
-
-    return bases[0].id
-
-def get_class_implementations(decorators: list[ast.expr]):
-    implementations = []
-
-    for decorator in decorators:
-        if not isinstance(decorator, ast.Call):
-            continue
-
-        if decorator.func.id != "implements":
-            continue
-
-        implementations.append(decorator.args[0].id)
-
-    return implementations
-
-def get_class_fields(node: ast.ClassDef):
-    fields = []
-
-    for decorator in node.decorator_list:
-        if not isinstance(decorator, ast.Call):
-            continue
-
-        if decorator.func.id != "field":
-            continue
-
-        access_modifier = "internal"
-        field_type = None
-        field_name = None
-
-        if len(decorator.args) > 2:
-            access_modifier = decorator.args[0].value
-            field_type = decorator.args[1]
-            field_name = decorator.args[2].value
-        else:
-            field_type = decorator.args[0]
-            field_name = decorator.args[1].value
-
-        value_keyword = find_keyword(decorator.keywords, "value")
-        value = (value_keyword or None) and value_keyword.value # TODO: add support for literals
-
-        static_keyword = find_keyword(decorator.keywords, "static")
-        static = (static_keyword or False) and static_keyword.value.value
-
-        field_def = csast.FieldDef(
-            target=ast.Name(id=field_name),
-            static=static,
-            visibility=access_modifier,
-            value=value,
-            type=field_type
-            
-        )
-
-        fields.append(field_def)
-
-    for node in node.body:
-        if not isinstance(node, ast.AnnAssign):
-            continue
-        
-        field_def = csast.FieldDef(
-            target=node.target,
-            type=node.annotation,
-            visibility="public",
-            static=False,
-            value=node.value
-        )
-
-        fields.append(field_def)
-
-    return fields
-
-def get_attributes(decorators: list[ast.expr]):
-    attributes = []
-
-    for decorator in decorators:
-        if not isinstance(decorator, ast.Call):
-            continue
+            parts.append(value)
+
+    return parts
+
+def is_const_value(node: ast.expr | None, cs_type: CsType | None):
+    # Folding has already reduced literal expressions to a single constant
+    return (
+        isinstance(node, ast.Constant) and node.value is not None
+        and cs_type is not None and not cs_type.args and cs_type.name in CONST_TYPES
+    )
+
+def constant_int(node: ast.expr):
+    match node:
+        case ast.Constant(value=int(value)) if not isinstance(value, bool):
+            return value
+        case ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=int(value))) if not isinstance(value, bool):
+            return -value
+
+    return None
+
+def is_loop_invariant(node: ast.expr, body: list[ast.stmt]):
+    # Constants, and names the loop body never assigns
+    if isinstance(node, ast.Constant) or constant_int(node) is not None:
+        return True
+    elif not isinstance(node, ast.Name):
+        return False
+
+    return not any(
+        isinstance(child, ast.Name) and child.id == node.id and isinstance(child.ctx, (ast.Store, ast.Del))
+        for statement_node in body for child in ast.walk(statement_node)
+    )
+
+def has_calls(node: ast.expr):
+    return any(isinstance(child, ast.Call) for child in ast.walk(node))
+
+def is_pure(node: ast.expr):
+    # Names, constants and attribute chains of them can be evaluated twice
+    while isinstance(node, ast.Attribute):
+        node = node.value
+
+    return isinstance(node, (ast.Name, ast.Constant))
+
+def iter_targets(target: ast.expr):
+    if isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            yield from iter_targets(element)
+    else:
+        yield target
 
-        if decorator.func.id != "attribute":
-            continue
+def tuple_index(node: ast.expr, cs_type: CsType):
+    match node:
+        case ast.Constant(value=int(index)) if -len(cs_type.args) <= index < len(cs_type.args):
+            return index % len(cs_type.args)
+        case ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=int(index))) if 0 < index <= len(cs_type.args):
+            return len(cs_type.args) - index
 
-        attributes.append(decorator)
+    return None
 
-    return attributes
+EMPTY_LITERALS = {
+    "list": lambda: ast.List(elts=[]),
+    "set": lambda: ast.Set(elts=[]),
+    "dict": lambda: ast.Dict(keys=[], values=[]),
+}
 
-def get_function_return_type(function_node: ast.FunctionDef):
-    if not function_node.returns:
-        return "void"
+def is_float_literal(node: ast.expr):
+    return isinstance(node, ast.Constant) and type(node.value) is float
 
-    return function_node.returns.id
+def is_empty_constructor(node: ast.expr):
+    return (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in EMPTY_LITERALS
+        and not node.args and not node.keywords
+    )
 
 def destructure_args(nodes: list[ast.expr]):
     generics = []
@@ -642,39 +1729,8 @@ def destructure_args(nodes: list[ast.expr]):
 
     return generics, args
 
-def does_method_override(decorators: list[ast.expr]): 
-    for decorator in decorators:
-        if not isinstance(decorator, ast.Name):
-            continue
-
-        if decorator.id == "override":
-            return True
-    
-    return False
-
-def get_class_funcs(node: ast.ClassDef):
-    return list(filter(lambda node: isinstance(node, ast.FunctionDef), node.body))
+Transpiler.build_dispatch()
 
-def destructure_class(node: ast.ClassDef):
-    return get_class_funcs(node), get_class_fields(node)
-
-
-class ReferenceReplacer(ast.NodeTransformer):
-    def __init__(self, old, new):
-        self.old = old
-        self.new = new
-
-    def visit_Name(self, node: ast.Name):
-        if node.id == self.old:
-            return ast.Name(id=self.new)
-        return node
-
-def replace_all_references(node, old, new):
-    if isinstance(node, list):
-        return [replace_all_references(item, old, new) for item in node]
-    else:
-        return ReferenceReplacer(old, new).visit(node)
-        
 class TranspilerException(Exception):
     cs_line = None
     py_line = None
@@ -1,6 +1,12 @@
 import ast
-import itertools
 import logging
+import math
+import os
+import re
+import stat
+import tempfile
+
+from functools import cache
 
 def fullname(o):
     klass = o.__class__
@@ -13,10 +19,13 @@ def cs_constant_repr(constant):
     if isinstance(constant, bool):
         return "true" if constant else "false"
     elif isinstance(constant, str):
-        escaped = constant.replace("\\", "\\\\")
+        escaped = constant.translate(CS_STRING_ESCAPES)
         return f"\"{escaped}\""
     elif isinstance(constant, int):
         return str(constant)
+    elif isinstance(constant, float) and math.isfinite(constant):
+        # Python's shortest round-trip repr reads back as the same double
+        return repr(constant)
     elif constant is None:
         return "null"
 
@@ -24,6 +33,120 @@ def cs_constant_repr(constant):
 
     return repr(constant)
 
+CS_STRING_ESCAPES = str.maketrans({"\\": "\\\\", "\"": "\\\"", "\n": "\\n", "\r": "\\r", "\t": "\\t", "\0": "\\0"})
+
+# Subset of Python's format spec mini-language with a .NET equivalent:
+# [<>][0][width][,][.precision][dfFxX]
+FORMAT_SPEC = re.compile(r"(?P<align>[<>])?(?P<zero>0)?(?P<width>[1-9][0-9]*)?(?P<grouping>,)?(?:\.(?P<precision>[0-9]+))?(?P<type>[dfFxX])?")
+
+def dotnet_format(spec: str):
+    # Returns the ToString() format, the alignment and the width to pad to,
+    # raises ValueError for specs without an equivalent
+    match = FORMAT_SPEC.fullmatch(spec)
+    if match is None:
+        raise ValueError(f"unsupported format spec {spec!r}")
+
+    align, zero, width, grouping, precision, kind = match.group("align", "zero", "width", "grouping", "precision", "type")
+    width = width and int(width)
+    dotnet = None
+
+    if kind in ("f", "F"):
+        dotnet = f"{'N' if grouping else 'F'}{precision or 6}"
+    elif kind in ("x", "X"):
+        dotnet = kind
+    elif precision:
+        dotnet = f"G{precision}"
+    elif grouping:
+        dotnet = "N0"
+
+    if zero:
+        # Zero padding only maps to integer formats
+        if kind not in (None, "d", "x", "X") or precision or grouping or align or not width:
+            raise ValueError(f"unsupported format spec {spec!r}")
+
+        return f"{dotnet or 'D'}{width}", None, None
+
+    return dotnet, align, width
+
+# The part of the mini-language that applies to strings: [<>][width][.precision][s]
+STRING_FORMAT_SPEC = re.compile(r"(?P<align>[<>])?(?P<width>[1-9][0-9]*)?(?:\.(?P<precision>[0-9]+))?s?")
+
+def string_format(spec: str):
+    # Returns the alignment, the width to pad to and the length to truncate
+    # to, raises ValueError for specs Python itself rejects on strings
+    match = STRING_FORMAT_SPEC.fullmatch(spec)
+    if match is None:
+        raise ValueError(f"format spec {spec!r} doesn't apply to strings")
+
+    align, width, precision = match.group("align", "width", "precision")
+    return align, width and int(width), precision and int(precision)
+
+# Writes to a temp file next to `path` and os.replace()s it over `path` once
+# the with block succeeds, so readers never see a partial file. With
+# only_if_changed the target is left untouched (mtime included) when the new
+# contents are identical, `changed` tells which case happened
+class atomic_write:
+    def __init__(self, path, only_if_changed=False):
+        self.path = os.fspath(path)
+        self.only_if_changed = only_if_changed
+        self.changed = False
+
+    def __enter__(self):
+        # Same directory keeps os.replace on one filesystem, dot prefix and
+        # .tmp suffix keep Unity from importing the temp file meanwhile
+        directory, name = os.path.split(self.path)
+        fd, self.temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory or ".")
+        self.file = os.fdopen(fd, "w")
+        return self.file
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+
+        if exc_type is None and not (self.only_if_changed and same_contents(self.temp_path, self.path)):
+            os.chmod(self.temp_path, target_mode(self.path))
+            os.replace(self.temp_path, self.path)
+            self.changed = True
+            return
+
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+def target_mode(path):
+    # mkstemp creates the temp file 0600, the replaced file keeps the mode of
+    # the one it replaces, or gets what a plain open() would give it
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~current_umask()
+
+@cache
+def current_umask():
+    # Can only be read by setting it, so it's read once and restored
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+COMPARE_CHUNK_SIZE = 64 * 1024
+
+def same_contents(path, other_path):
+    # Sizes first, they settle most changes without reading either file
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+    except FileNotFoundError:
+        return False
+
+    # Chunk by chunk, stopping at the first difference
+    with open(path, "rb") as f, open(other_path, "rb") as other:
+        while True:
+            chunk = f.read(COMPARE_CHUNK_SIZE)
+            if chunk != other.read(COMPARE_CHUNK_SIZE):
+                return False
+            elif not chunk:
+                return True
+
 def find_keyword(keywords: list[ast.keyword], name):
     for keyword in keywords:
         if keyword.arg == name:
@@ -31,51 +154,38 @@ def find_keyword(keywords: list[ast.keyword], name):
 
     return None
 
-def get_class_namespace(decorators: list[ast.expr]):
-    for decorator in decorators:
-        if not isinstance(decorator, ast.Call):
-            continue
-
-        if decorator.func.id != "namespace":
-            continue
-
-        return decorator.args[0].value
-
-    return None
+# Visitor wrappers take (self, node) explicitly, they run for every
+# statement so they avoid packing *args/**kwargs. Comprehensions a statement
+# evaluates are lowered to loops emitted right before it
 
 def statement(func):
-    def helper(*args, **kwargs):
-        self = args[0]
+    def helper(self, node):
+        self.lower_comprehensions(node)
         self.cswriter.write_indents()
-        func(*args, **kwargs)
+        func(self, node)
         self.cswriter.write(";")
         
 
     return helper
 
 def namespacable(func):
-    def helper(*args, **kwargs):
-        self, node = args
-        
-        namespace = get_class_namespace(node.decorator_list)
+    def helper(self, node):
+        namespace = self.describe(node).namespace
         if namespace:
             self.cswriter.write_indented(f"namespace {namespace}")
             with self.cswriter.block():
-                func(*args, **kwargs)
+                func(self, node)
         else:
-            func(*args, **kwargs)
+            func(self, node)
         
 
     return helper
 
 def indented(func):
-    def helper(*args, **kwargs):
-        self = args[0]
+    def helper(self, node):
+        self.lower_comprehensions(node)
         self.cswriter.write_indents()
-        func(*args, **kwargs)
+        func(self, node)
         
 
     return helper
-
-def flatten(l):
-    return list(itertools.chain.from_iterable(l))
\ No newline at end of file
@@ -1,9 +1,52 @@
+import logging
+import threading
+import time
+
+from pathlib import Path
 from watchdog.events import PatternMatchingEventHandler
 
 class Watcher(PatternMatchingEventHandler):
-    def __init__(self, action):
-        super().__init__(patterns=["*.py"])
+    EVENT_TYPES = ("created", "modified", "deleted", "moved")
+
+    def __init__(self, action, delay=0.2):
+        super().__init__(patterns=["*.py"], ignore_directories=True)
         self.action = action
+        self.delay = delay
+        self.pending = set()
+        self.last_event = 0.0
+        self.condition = threading.Condition()
+
+        # Events are only collected here, the worker runs the action once
+        # no new event arrived for `delay` seconds
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
 
     def on_any_event(self, event):
-        self.action()
\ No newline at end of file
+        if event.event_type not in self.EVENT_TYPES:
+            return
+
+        paths = [event.src_path]
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            paths.append(dest_path)
+
+        with self.condition:
+            self.pending.update(Path(path) for path in paths)
+            self.last_event = time.monotonic()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                while (remaining := self.last_event + self.delay - time.monotonic()) > 0:
+                    self.condition.wait(remaining)
+
+                changed, self.pending = self.pending, set()
+
+            try:
+                self.action(changed)
+            except Exception as e:
+                logging.exception("Caught error while handling changes:", exc_info=e)